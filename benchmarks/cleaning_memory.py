@@ -0,0 +1,121 @@
+"""
+Compares the peak memory and time of handle_missing_data with the previous
+cleaning path, which built a new frame at every step, on the deaths dataset
+with its date axis tiled to 1x, 10x and 100x. Peak memory is what tracemalloc
+saw allocated above the raw frame while cleaning, and is shown relative to the
+size of the cleaned frame. The stages of handle_missing_data are printed from
+its report_stage hook.
+
+Run with:
+    uv run python -m benchmarks.cleaning_memory
+"""
+
+import tracemalloc
+
+import pandas as pd
+
+from src.utils.enums import DatasetType
+from src.utils.constants import DATASET_FILES
+from src.utils.utils import profile_stage
+from src.pipeline.data_loader import read_typed_csv
+from src.pipeline.data_cleaner import (
+    METADATA_COLUMNS,
+    METADATA_DTYPES,
+    get_date_columns,
+    replace_empty_province,
+    drop_non_existing_provinces,
+    handle_missing_data,
+)
+
+WIDTHS = [1, 10, 100]
+
+
+def _previous_fix_datatypes(raw_df, date_dtype):
+    metadata_df = raw_df[METADATA_COLUMNS].astype(METADATA_DTYPES)
+    dates_df = raw_df[get_date_columns(raw_df)].astype(date_dtype)
+
+    return pd.concat([metadata_df, dates_df], axis=1)
+
+
+def _previous_handle_missing_data(raw_df, data_type):
+    # The typed frame has its real header, so no first row is renamed
+    date_dtype = "int32" if (raw_df.dtypes == "int32").any() else int
+
+    cleaned_df = replace_empty_province(raw_df)
+    cleaned_df = drop_non_existing_provinces(cleaned_df)
+    cleaned_df.dropna(inplace=True, subset=["Lat", "Long"])
+    cleaned_df = pd.concat(
+        [
+            cleaned_df[METADATA_COLUMNS],
+            cleaned_df[get_date_columns(cleaned_df)].ffill(axis=1),
+        ],
+        axis=1,
+    )
+    cleaned_df = drop_non_existing_provinces(cleaned_df)
+
+    return _previous_fix_datatypes(cleaned_df, date_dtype)
+
+
+def _widen(raw_df, width):
+    dates_df = raw_df[get_date_columns(raw_df)]
+    tiled_df = pd.concat([dates_df] * width, axis=1)
+    tiled_df.columns = [
+        f"{month}/{day}/{year}"
+        for year in range(20, 20 + width * 2)
+        for month in range(1, 13)
+        for day in range(1, 29)
+    ][: tiled_df.shape[1]]
+
+    return pd.concat([raw_df[METADATA_COLUMNS], tiled_df], axis=1)
+
+
+def _measure(clean, raw_df):
+    stages = []
+    with profile_stage("total", lambda *stage: stages.append(stage)):
+        cleaned_df = clean(raw_df)
+
+    _, seconds, peak = stages[0]
+    return cleaned_df, seconds * 1000, peak
+
+
+def main():
+    raw_df = read_typed_csv(DATASET_FILES[DatasetType.DEATHS])
+
+    print(
+        f"{'width':>6}{'final MiB':>11}{'before MiB':>12}{'after MiB':>11}"
+        f"{'before ms':>11}{'after ms':>10}"
+    )
+    for width in WIDTHS:
+        widened_df = _widen(raw_df, width)
+
+        expected, before_ms, before_peak = _measure(
+            lambda df: _previous_handle_missing_data(df, DatasetType.DEATHS),
+            widened_df,
+        )
+        cleaned_df, after_ms, after_peak = _measure(
+            lambda df: handle_missing_data(df, DatasetType.DEATHS), widened_df
+        )
+        pd.testing.assert_frame_equal(expected, cleaned_df)
+
+        final = cleaned_df.memory_usage(deep=True).sum()
+        print(
+            f"{width:>5}x{final / 2**20:>11.1f}"
+            f"{before_peak / 2**20:>8.1f} ({before_peak / final:.1f}x)"
+            f"{after_peak / 2**20:>7.1f} ({after_peak / final:.1f}x)"
+            f"{before_ms:>11.1f}{after_ms:>10.1f}"
+        )
+
+    print("\nstages of handle_missing_data at 100x:")
+    tracemalloc.start()
+    handle_missing_data(
+        widened_df,
+        DatasetType.DEATHS,
+        report_stage=lambda name, seconds, peak: print(
+            f"  {name:<14}{seconds * 1000:>8.1f} ms{peak / 2**20:>8.1f} MiB peak"
+        ),
+    )
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Fits a logistic growth curve to the cumulative confirmed cases of every
+country with fit_block, in this process and with process pools of 2, 4, ...
+workers up to the number of CPUs, and reports how the fitting time scales.
+The pools are started before they are timed, as the app keeps them running.
+
+Run with:
+    uv run python -m benchmarks.fitting_scaling
+"""
+
+import os
+
+import numpy as np
+
+from src.utils.enums import DatasetType
+from src.utils.utils import timer
+from src.utils.constants import DATASET_FILES
+from src.pipeline.data_loader import read_typed_csv
+from src.pipeline.data_cleaner import handle_missing_data
+from src.pipeline.cube import build_cube
+from src.pipeline.rollup import build_rollup
+from src.pipeline.fitting import fit_block
+
+
+def _best_ms(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        with timer() as timing:
+            function()
+        best = min(best, timing["seconds"])
+
+    return best * 1000
+
+
+def main(repeats=3, max_workers=None):
+    cleaned = {
+        data_type: handle_missing_data(read_typed_csv(path), data_type)
+        for data_type, path in DATASET_FILES.items()
+    }
+    rollup = build_rollup(
+        build_cube(
+            cleaned[DatasetType.CONFIRMED_CASES],
+            cleaned[DatasetType.DEATHS],
+            cleaned[DatasetType.RECOVERED],
+        )
+    )
+    block = rollup.metric("country", DatasetType.CONFIRMED_CASES)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != max_workers:
+        worker_counts.append(max_workers)
+
+    expected = fit_block(block, max_workers=1)
+    print(f"{block.shape[0]} countries x {block.shape[1]} dates, {os.cpu_count()} CPUs")
+
+    serial_ms = None
+    for workers in worker_counts:
+        # Starts the pool and checks the parallel fits match the serial ones
+        fits = fit_block(block, max_workers=workers)
+        assert np.array_equal(
+            np.array(fits, dtype=float), np.array(expected, dtype=float), equal_nan=True
+        )
+
+        fit_ms = _best_ms(lambda: fit_block(block, max_workers=workers), repeats)
+        serial_ms = serial_ms or fit_ms
+        print(
+            f"{f'{workers} worker(s)':<16}{fit_ms:>9.1f} ms"
+            f"{serial_ms / fit_ms:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
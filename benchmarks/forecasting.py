@@ -0,0 +1,128 @@
+"""
+Forecasts the confirmed cases, deaths and recoveries of every region and
+country by Holt's linear exponential smoothing, once smoothing one series at a
+time, the way one model object per series would, and once with
+build_forecasts, which smooths every series of a level at once. The series at
+a time run is timed on a sample of the series and extrapolated. A daily update
+is then timed as a full rebuild against extend_forecasts, which only smooths
+the new date.
+
+Run with:
+    uv run python -m benchmarks.forecasting
+"""
+
+from types import MappingProxyType
+
+import numpy as np
+
+from src.utils.enums import DatasetType
+from src.utils.utils import timer
+from src.utils.constants import DATASET_FILES
+from src.pipeline.data_loader import read_typed_csv
+from src.pipeline.data_cleaner import handle_missing_data
+from src.pipeline.cube import build_cube
+from src.pipeline.rollup import Rollup, RollupLevel, build_rollup
+from src.pipeline.forecast import (
+    build_forecasts,
+    extend_forecasts,
+    log_window_means,
+    start_smoothing,
+)
+
+LEVELS = ("province", "country")
+SAMPLED_SERIES = 60
+
+
+def _series_at_a_time(series, pairs):
+    return [
+        start_smoothing(series[unit : unit + 1, :, metric : metric + 1])
+        for unit, metric in pairs
+    ]
+
+
+def _without_last_date(rollup):
+    levels = {
+        level: RollupLevel(
+            rollup_level.labels,
+            rollup_level.values[:, :-1],
+            rollup_level.order,
+            rollup_level.offsets,
+        )
+        for level, rollup_level in rollup.levels.items()
+    }
+
+    return Rollup(dates=rollup.dates[:-1], levels=MappingProxyType(levels))
+
+
+def _best_ms(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        with timer() as timing:
+            function()
+        best = min(best, timing["seconds"])
+
+    return best * 1000
+
+
+def main(repeats=3):
+    cleaned = {
+        data_type: handle_missing_data(read_typed_csv(path), data_type)
+        for data_type, path in DATASET_FILES.items()
+    }
+    rollup = build_rollup(
+        build_cube(
+            cleaned[DatasetType.CONFIRMED_CASES],
+            cleaned[DatasetType.DEATHS],
+            cleaned[DatasetType.RECOVERED],
+        )
+    )
+
+    all_series = {
+        level: log_window_means(rollup.levels[level].values) for level in LEVELS
+    }
+    series_count = sum(
+        series.shape[0] * series.shape[2] for series in all_series.values()
+    )
+    series = all_series["province"]
+    generator = np.random.default_rng(0)
+    pairs = list(
+        zip(
+            generator.integers(series.shape[0], size=SAMPLED_SERIES),
+            generator.integers(series.shape[2], size=SAMPLED_SERIES),
+        )
+    )
+
+    batched_state = start_smoothing(series)
+    for (unit, metric), state in zip(pairs, _series_at_a_time(series, pairs)):
+        assert np.allclose(state.errors[:, 0, 0], batched_state.errors[:, unit, metric])
+
+    looped_ms = (
+        _best_ms(lambda: _series_at_a_time(series, pairs), repeats)
+        * series_count
+        / SAMPLED_SERIES
+    )
+    batched_ms = _best_ms(lambda: build_forecasts(rollup, LEVELS), repeats)
+
+    previous_forecasts = build_forecasts(_without_last_date(rollup), LEVELS)
+    extended = extend_forecasts(previous_forecasts, rollup)
+    rebuilt = build_forecasts(rollup, LEVELS)
+    for level in LEVELS:
+        assert np.allclose(extended.levels[level].mean, rebuilt.levels[level].mean)
+    extend_ms = _best_ms(lambda: extend_forecasts(previous_forecasts, rollup), repeats)
+
+    print(f"{series_count} series x {len(rollup.dates)} dates")
+    print(f"{'series at a time, extrapolated':<34}{looped_ms:>9.1f} ms")
+    print(
+        f"{'batched build_forecasts':<34}{batched_ms:>9.1f} ms"
+        f"{looped_ms / batched_ms:>8.1f}x"
+    )
+    print("one new date")
+    print(f"{'full rebuild':<34}{batched_ms:>9.1f} ms")
+    print(
+        f"{'extend_forecasts':<34}{extend_ms:>9.1f} ms"
+        f"{batched_ms / extend_ms:>8.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
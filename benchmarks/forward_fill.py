@@ -0,0 +1,107 @@
+"""
+Compares the previous forward fill of handle_missing_data, DataFrame.ffill over
+the date columns, with the forward_fill kernel filling the date columns as one
+float array and concatenating them back, and with the kernel alone filling a
+float array in place. The date axis of the deaths dataset is tiled to 1x, 10x
+and 100x its width, both as read by pd.read_csv (object date columns) and as
+read by read_typed_csv (int32 and float64 date columns).
+
+Run with:
+    uv run python -m benchmarks.forward_fill
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.utils.enums import DatasetType
+from src.utils.utils import timer
+from src.utils.constants import DATASET_FILES
+from src.pipeline.data_loader import read_typed_csv
+from src.pipeline.data_cleaner import (
+    METADATA_COLUMNS,
+    get_date_columns,
+    forward_fill,
+)
+
+WIDTHS = [1, 10, 100]
+
+
+def _previous_ffill(wide_df):
+    return pd.concat(
+        [
+            wide_df[METADATA_COLUMNS],
+            wide_df[get_date_columns(wide_df)].ffill(axis=1),
+        ],
+        axis=1,
+    )
+
+
+def _forward_fill_dates(wide_df):
+    date_columns = get_date_columns(wide_df)
+    dates_df = pd.DataFrame(
+        forward_fill(wide_df[date_columns].to_numpy(dtype=float), inplace=True),
+        index=wide_df.index,
+        columns=date_columns,
+    )
+
+    return pd.concat([wide_df[METADATA_COLUMNS], dates_df], axis=1)
+
+
+def _widen(wide_df, width):
+    dates_df = wide_df[get_date_columns(wide_df)]
+    tiled_df = pd.concat([dates_df] * width, axis=1)
+    tiled_df.columns = [f"day {position}" for position in range(tiled_df.shape[1])]
+
+    return pd.concat([wide_df[METADATA_COLUMNS], tiled_df], axis=1)
+
+
+def _best_ms(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        with timer() as timing:
+            function()
+        best = min(best, timing["seconds"])
+
+    return best * 1000
+
+
+def main(repeats=3):
+    path = DATASET_FILES[DatasetType.DEATHS]
+    inputs = {
+        # The real header is the second line of the csv
+        "object": pd.read_csv(path, skiprows=1, dtype=object),
+        "typed": read_typed_csv(path),
+    }
+
+    print(
+        f"{'input':<8}{'width':>6}{'dates':>8}{'ffill ms':>11}"
+        f"{'frame ms':>11}{'kernel ms':>11}{'speedup':>9}"
+    )
+    for name, wide_df in inputs.items():
+        for width in WIDTHS:
+            widened_df = _widen(wide_df, width)
+            values = widened_df[get_date_columns(widened_df)].to_numpy(dtype=float)
+
+            expected = _previous_ffill(widened_df)
+            filled = _forward_fill_dates(widened_df)
+            assert np.array_equal(
+                expected.iloc[:, 4:].to_numpy(dtype=float),
+                filled.iloc[:, 4:].to_numpy(),
+                equal_nan=True,
+            )
+
+            # The object frames take seconds at 100x, one run is enough there
+            runs = 1 if name == "object" and width > 10 else repeats
+            ffill_ms = _best_ms(lambda: _previous_ffill(widened_df), runs)
+            frame_ms = _best_ms(lambda: _forward_fill_dates(widened_df), runs)
+            kernel_ms = _best_ms(
+                lambda: forward_fill(values.copy(), inplace=True), repeats
+            )
+            print(
+                f"{name:<8}{width:>5}x{values.shape[1]:>8}{ffill_ms:>11.1f}"
+                f"{frame_ms:>11.1f}{kernel_ms:>11.1f}{ffill_ms / frame_ms:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
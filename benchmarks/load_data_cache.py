@@ -0,0 +1,54 @@
+"""
+Compares cold (csv parse) and warm (feather cache) load times of the datasets,
+both for the raw pd.read_csv parse and for the typed pyarrow parse.
+
+Run with:
+    uv run python -m benchmarks.load_data_cache
+"""
+
+import tempfile
+
+from src.utils.constants import DATASET_DIR
+from src.utils.utils import timer
+from src.pipeline.data_loader import read_csv_cached
+
+DATASET_FILES = [
+    "covid_19_confirmed_v1.csv",
+    "covid_19_deaths_v1.csv",
+    "covid_19_recovered_v1.csv",
+]
+
+
+def main(repeats=5):
+    print(f"{'file':<30}{'mode':>6}{'cold ms':>10}{'warm ms':>10}{'speedup':>10}")
+
+    for file_name in DATASET_FILES:
+        for typed in (False, True):
+            benchmark_file(file_name, typed, repeats)
+
+
+def benchmark_file(file_name, typed, repeats):
+    cold_times, warm_times = [], []
+
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with timer() as cold:
+                read_csv_cached(DATASET_DIR / file_name, cache_dir, typed)
+            with timer() as warm:
+                _, cache_hit = read_csv_cached(DATASET_DIR / file_name, cache_dir, typed)
+
+        assert cache_hit, "second read should have been served from the cache"
+        cold_times.append(cold["seconds"])
+        warm_times.append(warm["seconds"])
+
+    mode = "typed" if typed else "raw"
+    cold_ms = min(cold_times) * 1000
+    warm_ms = min(warm_times) * 1000
+    print(
+        f"{file_name:<30}{mode:>6}{cold_ms:>10.1f}{warm_ms:>10.1f}"
+        f"{cold_ms / warm_ms:>9.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares the previous merge_datasets, which melted the three datasets, grouped
+each of them by country and date and joined the results on string keys, with
+the array based merge_datasets and with build_country_grid alone, which stops
+before the long merged frame is built.
+
+Run with:
+    uv run python -m benchmarks.merge_datasets
+"""
+
+import pandas as pd
+
+from src.utils.enums import DatasetType
+from src.utils.utils import timer
+from src.utils.constants import DATASET_FILES
+from src.pipeline.data_loader import read_typed_csv
+from src.pipeline.data_cleaner import (
+    VALUE_COLUMN_TITLES,
+    handle_missing_data,
+    transform_from_wide_to_long,
+    build_country_grid,
+    merge_datasets,
+)
+
+
+def _previous_merge_datasets(
+    deaths_cleaned, confirmed_cases_cleaned, recovered_cleaned
+):
+    cleaned_dfs = {
+        DatasetType.CONFIRMED_CASES: confirmed_cases_cleaned,
+        DatasetType.DEATHS: deaths_cleaned,
+        DatasetType.RECOVERED: recovered_cleaned,
+    }
+
+    merged_df = None
+    for data_type, cleaned_df in cleaned_dfs.items():
+        value_column_title = VALUE_COLUMN_TITLES[data_type]
+        grouped_df = (
+            transform_from_wide_to_long(cleaned_df, data_type, categorical=False)
+            .groupby(["Country/Region", "Date"])[value_column_title]
+            .sum()
+            .reset_index()
+        )
+        merged_df = (
+            grouped_df
+            if merged_df is None
+            else merged_df.merge(grouped_df, on=["Country/Region", "Date"])
+        )
+
+    return merged_df
+
+
+def _best_ms(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        with timer() as timing:
+            function()
+        best = min(best, timing["seconds"])
+
+    return best * 1000
+
+
+def main(repeats=5):
+    cleaned = {
+        data_type: handle_missing_data(read_typed_csv(path), data_type)
+        for data_type, path in DATASET_FILES.items()
+    }
+    arguments = (
+        cleaned[DatasetType.DEATHS],
+        cleaned[DatasetType.CONFIRMED_CASES],
+        cleaned[DatasetType.RECOVERED],
+    )
+
+    expected = _previous_merge_datasets(*arguments)
+    pd.testing.assert_frame_equal(expected, merge_datasets(*arguments))
+
+    previous_ms = _best_ms(lambda: _previous_merge_datasets(*arguments), repeats)
+    merged_ms = _best_ms(lambda: merge_datasets(*arguments), repeats)
+    grid_ms = _best_ms(lambda: build_country_grid(*arguments), repeats)
+
+    print(f"merged frame: {expected.shape[0]} rows")
+    print(f"{'previous merge_datasets':<28}{previous_ms:>9.1f} ms")
+    print(
+        f"{'merge_datasets':<28}{merged_ms:>9.1f} ms"
+        f"{previous_ms / merged_ms:>8.1f}x"
+    )
+    print(
+        f"{'build_country_grid only':<28}{grid_ms:>9.1f} ms"
+        f"{previous_ms / grid_ms:>8.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
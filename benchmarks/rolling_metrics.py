@@ -0,0 +1,99 @@
+"""
+Computes 7-day averages and week over week growth of the daily new confirmed
+cases, deaths and recoveries of all regions at all dates, once with pandas
+groupby().rolling() over a long frame of the increments and once with the
+cumulative sum window kernels of build_rolling_metrics, which also compute
+the reproduction proxy and doubling times of every region and country.
+
+Run with:
+    uv run python -m benchmarks.rolling_metrics
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.utils.enums import DatasetType
+from src.utils.utils import timer
+from src.utils.constants import DATASET_FILES
+from src.pipeline.data_loader import read_typed_csv
+from src.pipeline.data_cleaner import handle_missing_data
+from src.pipeline.cube import CUBE_METRICS, build_cube
+from src.pipeline.rollup import build_rollup
+from src.pipeline.increments import build_daily_increments
+from src.pipeline.rolling import build_rolling_metrics
+
+WINDOW = 7
+
+
+def _grouped_rolling(long_df):
+    grouped = long_df.groupby("Region", sort=False)
+    sums = grouped[long_df.columns[2:]].rolling(WINDOW).sum()
+    previous_sums = sums.groupby(level="Region", sort=False).shift(WINDOW)
+
+    return sums / WINDOW, (sums / previous_sums.where(previous_sums > 0)) - 1
+
+
+def _best_ms(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        with timer() as timing:
+            function()
+        best = min(best, timing["seconds"])
+
+    return best * 1000
+
+
+def main(repeats=5):
+    cleaned = {
+        data_type: handle_missing_data(read_typed_csv(path), data_type)
+        for data_type, path in DATASET_FILES.items()
+    }
+    rollup = build_rollup(
+        build_cube(
+            cleaned[DatasetType.CONFIRMED_CASES],
+            cleaned[DatasetType.DEATHS],
+            cleaned[DatasetType.RECOVERED],
+        )
+    )
+    increments = build_daily_increments(rollup)
+    daily = increments.levels["province"]
+    regions, dates = daily.shape[:2]
+
+    long_df = pd.DataFrame(
+        {
+            "Region": np.arange(regions).repeat(dates),
+            "Date": np.tile(rollup.dates, regions),
+            **{
+                data_type.name: daily[:, :, position].ravel().astype(float)
+                for position, data_type in enumerate(CUBE_METRICS)
+            },
+        }
+    )
+
+    means, growth = _grouped_rolling(long_df)
+    rolling_metrics = build_rolling_metrics(rollup, increments)
+    for name, expected in [("rolling_mean", means), ("growth", growth)]:
+        assert np.allclose(
+            expected.to_numpy().reshape(daily.shape),
+            rolling_metrics.levels["province"][name],
+            equal_nan=True,
+        )
+
+    grouped_ms = _best_ms(lambda: _grouped_rolling(long_df), repeats)
+    kernel_ms = _best_ms(
+        lambda: build_rolling_metrics(rollup, increments, levels=("province",)),
+        repeats,
+    )
+    all_ms = _best_ms(lambda: build_rolling_metrics(rollup, increments), repeats)
+
+    print(f"{regions} regions x {dates} dates x {len(CUBE_METRICS)} metrics")
+    print(f"{'groupby().rolling()':<32}{grouped_ms:>9.1f} ms")
+    print(
+        f"{'window kernels, regions':<32}{kernel_ms:>9.1f} ms"
+        f"{grouped_ms / kernel_ms:>8.1f}x"
+    )
+    print(f"{'window kernels, all levels':<32}{all_ms:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
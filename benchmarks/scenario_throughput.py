@@ -0,0 +1,127 @@
+"""
+Runs what-if scenario ensembles seeded from the latest state of every country,
+once with simulate_ensemble, which advances all scenarios and countries as one
+array per day, and once looping over the scenarios in Python, every scenario
+still vectorized over the countries. The loop is timed on a sample of the
+scenarios and extrapolated, and both report scenarios per second for the
+bands of the few countries a chart shows. Finding the percentiles takes most
+of the time when every country is banded, which is timed as well.
+
+Run with:
+    uv run python -m benchmarks.scenario_throughput
+"""
+
+import numpy as np
+
+from src.utils.enums import DatasetType
+from src.utils.utils import timer
+from src.utils.constants import DATASET_FILES
+from src.pipeline.data_loader import read_typed_csv
+from src.pipeline.data_cleaner import handle_missing_data, merge_datasets
+from src.pipeline.scenarios import (
+    SCENARIO_COMPARTMENTS,
+    latest_states,
+    sample_scenarios,
+    run_ensemble,
+)
+
+SCENARIOS = 10000
+LOOPED_SCENARIOS = 200
+DAYS = 60
+PERCENTILES = (5, 50, 95)
+CHART_COUNTRIES = ["US", "India", "Brazil", "France", "Italy"]
+
+
+def _looped_ensemble(seeds, parameters, days, countries):
+    positions = seeds.countries.get_indexer(countries)
+    populations = seeds.populations[positions]
+    active = np.empty((parameters.shape[1], days, len(positions)))
+    for scenario, (transmission, recovery, death) in enumerate(parameters.T):
+        state = seeds.states[:, positions].copy()
+        for day in range(days):
+            new_cases = np.minimum(
+                transmission * state[0] * (1 - state[1] / populations),
+                populations - state[1],
+            )
+            recoveries = recovery * state[0]
+            deaths = death * state[0]
+            state[0] += new_cases - recoveries - deaths
+            state[1] += new_cases
+            state[2] += deaths
+            state[3] += recoveries
+            active[scenario, day] = state[0]
+
+    return np.percentile(active, PERCENTILES, axis=0).transpose(1, 0, 2)
+
+
+def _best_ms(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        with timer() as timing:
+            function()
+        best = min(best, timing["seconds"])
+
+    return best * 1000
+
+
+def main(repeats=3):
+    cleaned = {
+        data_type: handle_missing_data(read_typed_csv(path), data_type)
+        for data_type, path in DATASET_FILES.items()
+    }
+    seeds = latest_states(
+        merge_datasets(
+            cleaned[DatasetType.DEATHS],
+            cleaned[DatasetType.CONFIRMED_CASES],
+            cleaned[DatasetType.RECOVERED],
+        )
+    )
+    parameters = sample_scenarios(SCENARIOS)
+    sample = parameters[:, :LOOPED_SCENARIOS]
+
+    band_options = {"percentiles": PERCENTILES, "countries": CHART_COUNTRIES}
+    _, bands = run_ensemble(seeds, sample, DAYS, **band_options)
+    assert np.allclose(bands, _looped_ensemble(seeds, sample, DAYS, CHART_COUNTRIES))
+
+    # Even scenarios that only grow stay within the population of a country
+    growing = sample_scenarios(LOOPED_SCENARIOS, transmission=(0.3, 0.5))
+    for compartment in SCENARIO_COMPARTMENTS:
+        _, bands = run_ensemble(seeds, growing, 365, compartment=compartment)
+        assert np.all(bands <= seeds.populations), compartment
+
+    looped_ms = (
+        _best_ms(
+            lambda: _looped_ensemble(seeds, sample, DAYS, CHART_COUNTRIES), repeats
+        )
+        * SCENARIOS
+        / LOOPED_SCENARIOS
+    )
+    batched_ms = _best_ms(
+        lambda: run_ensemble(seeds, parameters, DAYS, **band_options), repeats
+    )
+    every_country_ms = _best_ms(
+        lambda: run_ensemble(seeds, parameters, DAYS, percentiles=PERCENTILES),
+        repeats,
+    )
+
+    print(
+        f"{SCENARIOS} scenarios x {len(seeds.countries)} countries x {DAYS} days"
+    )
+    print(f"{len(CHART_COUNTRIES)} countries banded")
+    print(
+        f"{'looped scenarios, extrapolated':<34}{looped_ms:>9.1f} ms"
+        f"{SCENARIOS / looped_ms * 1000:>12.0f} scenarios/s"
+    )
+    print(
+        f"{'batched ensemble':<34}{batched_ms:>9.1f} ms"
+        f"{SCENARIOS / batched_ms * 1000:>12.0f} scenarios/s"
+        f"{looped_ms / batched_ms:>8.1f}x"
+    )
+    print(
+        f"{'batched, every country banded':<34}{every_country_ms:>9.1f} ms"
+        f"{SCENARIOS / every_country_ms * 1000:>12.0f} scenarios/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compares the memory that N worker processes need to hold the cube when each
+one copies it into its own memory versus when all of them memory-map the file
+written by save_cube. Memory is measured as the proportional set size (PSS) each
+worker gained, which splits shared pages evenly between the processes mapping
+them, so the totals show what the machine actually pays. Linux only.
+
+Run with:
+    uv run python -m benchmarks.shared_cube_memory
+"""
+
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+
+from src.pipeline.cube import load_shared_cube, save_cube, open_cube, _assemble_cube
+
+REGION_REPEATS = 40
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def _pss_kib():
+    with open("/proc/self/smaps_rollup", "r") as file:
+        for line in file:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+
+
+def _worker(directory, copy, barrier, results):
+    before = _pss_kib()
+    values = open_cube(directory).values
+    if copy:
+        # The copy keeps no reference to the mapping, so it is unmapped here
+        values = np.array(values)
+
+    # Touch every page, then wait until all workers hold the data
+    values.sum(dtype=np.int64)
+    barrier.wait()
+    results.put(_pss_kib() - before)
+    barrier.wait()
+
+
+def _run(directory, workers, copy):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(directory, copy, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    total_kib = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+
+    return total_kib / 1024
+
+
+def main():
+    cube = load_shared_cube.__wrapped__()
+    values = np.repeat(cube.values, REGION_REPEATS, axis=0)
+    regions = cube.regions.loc[cube.regions.index.repeat(REGION_REPEATS)]
+    large_cube = _assemble_cube(
+        values,
+        np.repeat(cube.present, REGION_REPEATS, axis=0),
+        regions.reset_index(drop=True),
+        list(cube.date_labels),
+    )
+    print(f"cube size: {values.nbytes / 2**20:.1f} MiB, shape {values.shape}")
+    print(f"{'workers':>8}{'copied MiB':>14}{'mapped MiB':>14}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = Path(tmp_dir) / "cube"
+        save_cube(large_cube, directory)
+
+        for workers in WORKER_COUNTS:
+            copied = _run(directory, workers, copy=True)
+            mapped = _run(directory, workers, copy=False)
+            print(f"{workers:>8}{copied:>14.1f}{mapped:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Ranks the 10 countries with the most deaths at every date of the dataset,
+once by grouping the cleaned frame by country and sorting it for each date,
+and once with top_units over the rollup, which selects the 10 countries of
+every date in one np.argpartition call. The 7-day new deaths ranking is
+timed with top_units too.
+
+Run with:
+    uv run python -m benchmarks.top_k
+"""
+
+import numpy as np
+
+from src.utils.enums import DatasetType
+from src.utils.utils import timer
+from src.utils.constants import DATASET_FILES
+from src.pipeline.data_loader import read_typed_csv
+from src.pipeline.data_cleaner import handle_missing_data, get_date_columns
+from src.pipeline.cube import build_cube
+from src.pipeline.rollup import build_rollup
+from src.pipeline.top_k import top_units
+
+TOP_K = 10
+
+
+def _sorted_rankings(deaths_cleaned):
+    country_deaths = deaths_cleaned.groupby("Country/Region", observed=True)[
+        list(get_date_columns(deaths_cleaned))
+    ].sum()
+
+    return [
+        country_deaths[date].sort_values(ascending=False).head(TOP_K)
+        for date in country_deaths.columns
+    ]
+
+
+def _best_ms(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        with timer() as timing:
+            function()
+        best = min(best, timing["seconds"])
+
+    return best * 1000
+
+
+def main(repeats=5):
+    cleaned = {
+        data_type: handle_missing_data(read_typed_csv(path), data_type)
+        for data_type, path in DATASET_FILES.items()
+    }
+    rollup = build_rollup(
+        build_cube(
+            cleaned[DatasetType.CONFIRMED_CASES],
+            cleaned[DatasetType.DEATHS],
+            cleaned[DatasetType.RECOVERED],
+        )
+    )
+    deaths_cleaned = cleaned[DatasetType.DEATHS]
+
+    expected = np.concatenate(
+        [ranking.to_numpy() for ranking in _sorted_rankings(deaths_cleaned)]
+    )
+    ranked = top_units(rollup, DatasetType.DEATHS, TOP_K)
+    assert np.array_equal(expected, ranked["Deaths"].to_numpy())
+
+    sorted_ms = _best_ms(lambda: _sorted_rankings(deaths_cleaned), repeats)
+    top_k_ms = _best_ms(lambda: top_units(rollup, DatasetType.DEATHS, TOP_K), repeats)
+    window_ms = _best_ms(
+        lambda: top_units(rollup, DatasetType.DEATHS, TOP_K, window=7), repeats
+    )
+
+    print(f"top {TOP_K} countries at each of {len(rollup.dates)} dates")
+    print(f"{'groupby and sort per date':<28}{sorted_ms:>9.1f} ms")
+    print(
+        f"{'top_units':<28}{top_k_ms:>9.1f} ms"
+        f"{sorted_ms / top_k_ms:>8.1f}x"
+    )
+    print(f"{'top_units, 7-day window':<28}{window_ms:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,13 @@ import inspect
 import streamlit as st
 
 from src.utils.enums import DatasetType
-from src.utils.constants import DATASET_DIR
-from src.pipeline.data_loader import load_data
+from src.pipeline.context import get_data_context
 from src.pipeline.data_cleaner import (
     handle_missing_data,
-    rename_column_first_row,
     replace_empty_province,
-    drop_non_existing_provinces,
-    fix_datatypes,
+    forward_fill,
 )
 
-confirmed_cases_raw = load_data(DATASET_DIR / "covid_19_confirmed_v1.csv")
-deaths_raw = load_data(DATASET_DIR / "covid_19_deaths_v1.csv")
-recovered_raw = load_data(DATASET_DIR / "covid_19_recovered_v1.csv")
 
 
 st.set_page_config(layout="wide")
@@ -31,11 +25,10 @@ st.markdown(
     "**Q4.1**: Replace blank values in the Province column with `'All Provinces'`."
 )
 
-confirmed_cases_cleaned = handle_missing_data(
-    confirmed_cases_raw, DatasetType.CONFIRMED_CASES
-)
-deaths_cleaned = handle_missing_data(deaths_raw, DatasetType.DEATHS)
-recovered_cleaned = handle_missing_data(recovered_raw, DatasetType.RECOVERED)
+context = get_data_context()
+confirmed_cases_cleaned = context.cleaned[DatasetType.CONFIRMED_CASES]
+deaths_cleaned = context.cleaned[DatasetType.DEATHS]
+recovered_cleaned = context.cleaned[DatasetType.RECOVERED]
 
 code_tab, output_tab = st.tabs(["Code", "Results"])
 
@@ -47,17 +40,11 @@ with code_tab:
     st.markdown(
         "Source code of helper functions and enums used in `handle_missing_data`"
     )
-    with st.expander("View Source Code of `rename_column_first_row`"):
-        st.code(inspect.getsource(rename_column_first_row))
-
     with st.expander("View Source Code of `replace_empty_province`"):
         st.code(inspect.getsource(replace_empty_province))
 
-    with st.expander("View Source Code of `drop_non_existing_provinces`"):
-        st.code(inspect.getsource(drop_non_existing_provinces))
-
-    with st.expander("View Source Code of `fix_datatypes`"):
-        st.code(inspect.getsource(fix_datatypes))
+    with st.expander("View Source Code of `forward_fill`"):
+        st.code(inspect.getsource(forward_fill))
 
     with st.expander("View Source Code of `DatasetType`"):
         st.code(inspect.getsource(DatasetType))
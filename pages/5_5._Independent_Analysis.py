@@ -3,9 +3,7 @@ import inspect
 import streamlit as st
 
 from src.utils.enums import DatasetType
-from src.utils.constants import DATASET_DIR
-from src.pipeline.data_loader import load_data
-from src.pipeline.data_cleaner import handle_missing_data
+from src.pipeline.context import get_data_context
 from src.pipeline.analyzer import (
     peak_daily_cases_by_country,
     compare_recovery_rate,
@@ -21,18 +19,13 @@ from src.llm.prompt import format_prompt
 from src.llm.client import get_ai_insights
 
 
-confirmed_cases_raw = load_data(DATASET_DIR / "covid_19_confirmed_v1.csv")
-deaths_raw = load_data(DATASET_DIR / "covid_19_deaths_v1.csv")
-recovered_raw = load_data(DATASET_DIR / "covid_19_recovered_v1.csv")
-
-confirmed_cases_cleaned = handle_missing_data(
-    confirmed_cases_raw, DatasetType.CONFIRMED_CASES
-)
-deaths_cleaned = handle_missing_data(deaths_raw, DatasetType.DEATHS)
-recovered_cleaned = handle_missing_data(recovered_raw, DatasetType.RECOVERED)
-
 st.set_page_config(layout="wide")
 
+context = get_data_context()
+confirmed_cases_cleaned = context.cleaned[DatasetType.CONFIRMED_CASES]
+deaths_cleaned = context.cleaned[DatasetType.DEATHS]
+recovered_cleaned = context.cleaned[DatasetType.RECOVERED]
+
 st.title("Independent Dataset Analysis")
 st.caption(
     "Deep-dive into specific country metrics and comparisons based on cleaned COVID-19 data."
@@ -42,7 +35,10 @@ st.caption(
 st.markdown("**Q5.1**: Peak daily new cases in Germany, France, and Italy.")
 
 peak_daily_cases = peak_daily_cases_by_country(
-    confirmed_cases_cleaned, ["Germany", "France", "Italy"]
+    confirmed_cases_cleaned,
+    ["Germany", "France", "Italy"],
+    cube=context.cube,
+    increments=context.increments,
 )
 
 prompt = format_prompt(
@@ -81,6 +77,7 @@ recovery_rates = compare_recovery_rate(
     country_one="Australia",
     country_two="Canada",
     date="12/31/20",
+    cube=context.cube,
 )
 prompt = format_prompt(
     question="Compare the recovery rates (recoveries/confirmed cases) between Canada and Australia as of December 31, 2020. Which country showed better management of the pandemic according to this metric?",
@@ -115,6 +112,7 @@ death_rate_distribution = distribution_of_death_rates(
     confirmed_cases_cleaned=confirmed_cases_cleaned,
     country="Canada",
     date="5/29/21",
+    cube=context.cube,
 )
 prompt = format_prompt(
     question="What is the distribution of death rates (deaths/confirmed cases) among provinces in Canada? Identify the province with the highest and lowest death rate as of the latest data point.",
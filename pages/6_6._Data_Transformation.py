@@ -3,12 +3,8 @@ import inspect
 import streamlit as st
 
 from src.utils.enums import DatasetType
-from src.utils.constants import DATASET_DIR
-from src.pipeline.data_loader import load_data
-from src.pipeline.data_cleaner import (
-    handle_missing_data,
-    transform_from_wide_to_long,
-)
+from src.pipeline.context import get_data_context
+from src.pipeline.data_cleaner import transform_from_wide_to_long
 from src.pipeline.analyzer import (
     get_total_deaths_per_country,
     get_highest_avg_daily_deaths,
@@ -23,18 +19,10 @@ from src.llm.prompt import format_prompt
 from src.llm.client import get_ai_insights
 
 
-confirmed_cases_raw = load_data(DATASET_DIR / "covid_19_confirmed_v1.csv")
-deaths_raw = load_data(DATASET_DIR / "covid_19_deaths_v1.csv")
-recovered_raw = load_data(DATASET_DIR / "covid_19_recovered_v1.csv")
-
-confirmed_cases_cleaned = handle_missing_data(
-    confirmed_cases_raw, DatasetType.CONFIRMED_CASES
-)
-deaths_cleaned = handle_missing_data(deaths_raw, DatasetType.DEATHS)
-recovered_cleaned = handle_missing_data(recovered_raw, DatasetType.RECOVERED)
-
 st.set_page_config(layout="wide")
 
+context = get_data_context()
+
 st.title("Data Transformation")
 st.caption(
     "This section is about transforming data and performing function in long format data."
@@ -43,7 +31,7 @@ st.caption(
 # Question 6.1
 st.markdown("**Q6.1**: Transform 'deaths' dataset from wide to long format.")
 
-long_deaths_df = transform_from_wide_to_long(deaths_cleaned, DatasetType.DEATHS)
+long_deaths_df = context.long[DatasetType.DEATHS]
 
 code_tab, output_tab = st.tabs(["Code", "Results"])
 
@@ -54,14 +42,16 @@ with code_tab:
 
 with output_tab:
     st.markdown("### Deaths DataFrame in Long Format")
-    st.dataframe(long_deaths_df)
+    st.dataframe(long_deaths_df.to_frame())
 
 st.markdown("---")
 
 # Question 6.2
 st.markdown("**Q6.2**: Total deaths per country to date.")
 
-total_deaths_per_country = get_total_deaths_per_country(long_deaths_df)
+total_deaths_per_country = get_total_deaths_per_country(
+    long_deaths_df, cube=context.cube
+)
 
 code_tab, output_tab = st.tabs(["Code", "Results"])
 
@@ -84,7 +74,9 @@ st.markdown("---")
 # Question 6.3
 st.markdown("**Q6.3**: Top 5 countries by average daily deaths.")
 
-highest_avg_daily_deaths = get_highest_avg_daily_deaths(long_deaths_df, 5)
+highest_avg_daily_deaths = get_highest_avg_daily_deaths(
+    long_deaths_df, 5, cube=context.cube, increments=context.increments
+)
 prompt = format_prompt(
     question="What are the top 5 countries with the highest average daily deaths?",
     data=highest_avg_daily_deaths.to_markdown(index=False),
@@ -113,7 +105,7 @@ st.markdown("---")
 # Question 6.4
 st.markdown("**Q6.4**: Evolution of total deaths in the US over time.")
 
-deaths_overtime = total_deaths_overtime(long_deaths_df, "US")
+deaths_overtime = total_deaths_overtime(long_deaths_df, "US", cube=context.cube)
 prompt = format_prompt(
     question=" How have the total deaths evolved over time in the United States?",
     data=deaths_overtime.to_markdown(index=False),
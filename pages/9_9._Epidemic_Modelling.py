@@ -0,0 +1,234 @@
+import inspect
+
+import numpy as np
+import streamlit as st
+import matplotlib.pyplot as plt
+
+from src.utils.enums import DatasetType
+from src.pipeline.context import get_data_context
+from src.pipeline.data_cleaner import VALUE_COLUMN_TITLES
+from src.pipeline.fitting import fit_logistic, fit_country_curves, logistic_curve
+from src.pipeline.forecast import build_forecasts, smooth
+from src.pipeline.scenarios import (
+    SCENARIO_COMPARTMENTS,
+    latest_states,
+    sample_scenarios,
+    simulate_ensemble,
+)
+from src.pipeline.visualizer import (
+    plot_logistic_fit,
+    plot_scenario_bands,
+    plot_forecast,
+)
+
+
+st.set_page_config(layout="wide")
+
+context = get_data_context()
+rollup = context.rollup
+
+st.title("Epidemic Modelling")
+st.caption(
+    "This section fits a logistic growth curve to the cumulative counts of every "
+    "country, runs what-if scenarios from the latest state of every country and "
+    "forecasts the next weeks of every country and region."
+)
+
+# Question 9.1
+st.markdown("**Q9.1**: Logistic growth fits of every country over a date range.")
+
+data_type = st.selectbox(
+    "Dataset",
+    [DatasetType.CONFIRMED_CASES, DatasetType.DEATHS],
+    format_func=lambda data_type: VALUE_COLUMN_TITLES[data_type],
+)
+date_range = st.date_input(
+    "Date range",
+    value=(rollup.dates[0].date(), rollup.dates[-1].date()),
+    min_value=rollup.dates[0].date(),
+    max_value=rollup.dates[-1].date(),
+)
+# While only the start is picked the range runs to the last date
+start, end = (*date_range, rollup.dates[-1].date())[:2]
+
+# The fits run in a process pool and are cached per dataset version
+fits = fit_country_curves(rollup, data_type, str(start), str(end))
+
+code_tab, output_tab = st.tabs(["Code", "Results"])
+
+with code_tab:
+    st.markdown("Source code of `fit_logistic` function")
+    with st.expander("View Source Code"):
+        st.code(inspect.getsource(fit_logistic))
+    st.markdown("Source code of `fit_country_curves` function")
+    with st.expander("View Source Code"):
+        st.code(inspect.getsource(fit_country_curves))
+
+with output_tab:
+    st.markdown("### Logistic Fits by Country")
+    st.dataframe(fits.sort_values("Capacity", ascending=False), hide_index=True)
+
+st.markdown("---")
+
+# Question 9.2
+st.markdown("**Q9.2**: Observed counts against the fitted curve of a country.")
+
+countries = list(fits["Country/Region"])
+country_name = st.selectbox(
+    "Country", countries, index=countries.index("US") if "US" in countries else 0
+)
+
+fit = fits.set_index("Country/Region").loc[country_name]
+dates = rollup.dates[(rollup.dates >= str(start)) & (rollup.dates <= str(end))]
+observed = rollup.unit("country", country_name, data_type)[
+    rollup.dates.get_indexer(dates)
+]
+fitted = logistic_curve(fit, dates)
+
+code_tab, output_tab = st.tabs(["Code", "Results"])
+
+with code_tab:
+    st.markdown("Source code of `plot_logistic_fit` function")
+    with st.expander("View Source Code"):
+        st.code(inspect.getsource(plot_logistic_fit))
+
+with output_tab:
+    st.markdown(f"### Logistic Fit for {country_name}")
+    if not fit["Converged"]:
+        st.warning("The fit did not converge, the curve may not describe the data.")
+    st.pyplot(
+        plot_logistic_fit(
+            dates,
+            observed,
+            fitted,
+            country_name,
+            VALUE_COLUMN_TITLES[data_type],
+        )
+    )
+
+st.markdown("---")
+
+# Question 9.3
+st.markdown(
+    "**Q9.3**: What-if scenarios of varying transmission, recovery and death "
+    "rates, seeded from the latest state of every country."
+)
+
+seeds = latest_states(context.merged)
+scenario_countries = list(seeds.countries)
+
+transmission = st.slider("Daily transmission rate", 0.0, 0.5, (0.02, 0.12))
+recovery = st.slider("Daily recovery rate", 0.0, 0.5, (0.05, 0.15))
+death = st.slider("Daily death rate", 0.0, 0.05, (0.001, 0.01), step=0.001)
+scenario_count = st.slider("Scenarios", 100, 20000, 5000, step=100)
+days = st.slider("Days", 7, 180, 60, step=7)
+compartment = st.selectbox("Compartment", SCENARIO_COMPARTMENTS)
+scenario_country = st.selectbox(
+    "Country",
+    scenario_countries,
+    index=scenario_countries.index(country_name),
+    key="scenario_country",
+)
+
+code_tab, output_tab = st.tabs(["Code", "Results"])
+
+with code_tab:
+    st.markdown("Source code of `simulate_ensemble` function")
+    with st.expander("View Source Code"):
+        st.code(inspect.getsource(simulate_ensemble))
+
+with output_tab:
+    st.markdown(f"### Scenario Ensemble for {scenario_country}")
+    st.caption(
+        f"Scenarios start from {seeds.date.date()}. New infections slow down as "
+        "the confirmed cases of a country approach its population. Countries "
+        "that report no recoveries start from the cases of the last two weeks."
+    )
+    if st.button("Run Scenarios", key="run_scenarios_button"):
+        percentiles = (5, 50, 95)
+        parameters = sample_scenarios(scenario_count, transmission, recovery, death)
+        placeholder = st.empty()
+        dates, bands = None, None
+
+        # Every chunk of days is drawn as soon as it is simulated
+        for chunk_dates, chunk_bands in simulate_ensemble(
+            seeds,
+            parameters,
+            days,
+            percentiles,
+            compartment,
+            countries=[scenario_country],
+        ):
+            dates = chunk_dates if dates is None else dates.append(chunk_dates)
+            bands = (
+                chunk_bands[:, :, 0]
+                if bands is None
+                else np.vstack([bands, chunk_bands[:, :, 0]])
+            )
+            fig = plot_scenario_bands(
+                dates, bands, percentiles, scenario_country, compartment
+            )
+            placeholder.pyplot(fig)
+            plt.close(fig)
+
+st.markdown("---")
+
+# Question 9.4
+st.markdown(
+    "**Q9.4**: Forecasts of the next 7, 14 and 28 days of every country and region."
+)
+
+forecasts = context.forecasts
+forecast_level = st.selectbox(
+    "Level",
+    ["country", "province"],
+    format_func=lambda level: {"country": "Countries", "province": "Regions"}[level],
+)
+forecast_type = st.selectbox(
+    "Dataset",
+    [DatasetType.CONFIRMED_CASES, DatasetType.DEATHS],
+    format_func=lambda data_type: VALUE_COLUMN_TITLES[data_type],
+    key="forecast_type",
+)
+forecast_df = forecasts.frame(forecast_level, forecast_type)
+
+unit_names = [
+    label if forecast_level == "country" else " / ".join(label)
+    for label in rollup.labels(forecast_level)
+]
+unit = st.selectbox(
+    "Country or region", range(len(unit_names)), format_func=unit_names.__getitem__
+)
+unit_forecast_df = forecast_df.iloc[
+    unit * len(forecasts.horizons) : (unit + 1) * len(forecasts.horizons)
+]
+recent_dates = rollup.dates[-60:]
+recent_counts = rollup.metric(forecast_level, forecast_type)[unit, -60:]
+
+code_tab, output_tab = st.tabs(["Code", "Results"])
+
+with code_tab:
+    st.markdown("Source code of `build_forecasts` function")
+    with st.expander("View Source Code"):
+        st.code(inspect.getsource(build_forecasts))
+    st.markdown("Source code of `smooth` function")
+    with st.expander("View Source Code"):
+        st.code(inspect.getsource(smooth))
+
+with output_tab:
+    st.markdown(f"### Forecasts from {forecasts.dates[-1].date()}")
+    st.caption(
+        f"Intervals are {forecasts.coverage:.0%} prediction intervals. The "
+        "forecasts are made once per dataset version. When the csvs gain new "
+        "dates the smoothing only steps over those to bring them up to date."
+    )
+    st.dataframe(forecast_df, hide_index=True)
+    st.pyplot(
+        plot_forecast(
+            recent_dates,
+            recent_counts,
+            unit_forecast_df,
+            unit_names[unit],
+            VALUE_COLUMN_TITLES[forecast_type],
+        )
+    )
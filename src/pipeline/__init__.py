@@ -0,0 +1,5 @@
+import pandas as pd
+
+# Analyzers and visualizers never write to the frames they are given, with
+# Copy-on-Write their derived frames share the input buffers until written to
+pd.set_option("mode.copy_on_write", True)
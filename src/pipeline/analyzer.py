@@ -1,9 +1,111 @@
+import numpy as np
 import pandas as pd
 
 from src.logger.logger import logger
+from src.utils.enums import DatasetType
+from src.pipeline.long_view import LongView
+from src.pipeline.row_index import select_country, select_countries
+from src.pipeline.date_index import get_date_index
+from src.pipeline.rates import rates_as_of, cube_rates_as_of
+from src.pipeline.cube import CUBE_METRICS
+from src.pipeline.resample import (
+    build_date_buckets,
+    granularity_titles,
+    resample_values,
+)
+from src.pipeline.result_cache import memoize
+from src.pipeline.top_k import top_k_rows
+from src.pipeline.read_only import read_only_inputs
+
+MERGED_VALUE_COLUMNS = {
+    "Confirmed Cases": DatasetType.CONFIRMED_CASES,
+    "Deaths": DatasetType.DEATHS,
+    "Recovered": DatasetType.RECOVERED,
+}
+
+
+def _present_positions(cube, data_types, countries=None):
+    """
+    Returns the cube positions of the countries that have rows in every one of
+    the given datasets, like a groupby over those datasets would see them.
+    """
+    positions = cube.country_positions(countries)
+    for data_type in data_types:
+        positions = positions[cube.country_present(data_type)[positions]]
+
+    return positions
 
 
-def peak_daily_cases_by_country(confirmed_cases_cleaned, countries):
+def _single_country_rows(cube, country):
+    """
+    Returns the slice of cube regions of one country, or raises KeyError.
+    """
+    positions = cube.country_positions([country])
+    if len(positions) == 0:
+        raise KeyError(f"Country {country} is not in the dataset")
+
+    return cube.country_rows(positions[0])
+
+
+def _country_long_rows(long_df, country_name):
+    """
+    Returns the rows of one country from a long DataFrame or a LongView, which
+    builds only those rows.
+    """
+    if isinstance(long_df, LongView):
+        return long_df.filter(countries=[country_name])
+
+    return select_country(long_df, country_name)
+
+
+def _long_region_order(long_df, cube, rows, country_name):
+    """
+    Returns the cube region positions of one country in the order its
+    provinces come in a long DataFrame or LongView, the order of the wide
+    rows, instead of the cube's province order.
+    """
+    if isinstance(long_df, LongView):
+        metadata = long_df.metadata
+        provinces = metadata.loc[
+            metadata["Country/Region"] == country_name, "Province/State"
+        ]
+    else:
+        provinces = select_country(long_df, country_name)["Province/State"]
+    provinces = pd.unique(provinces.to_numpy(dtype=object))
+
+    region_provinces = pd.Index(
+        cube.regions["Province/State"].iloc[rows].to_numpy(dtype=object)
+    )
+    positions = region_provinces.get_indexer(provinces)
+
+    return rows.start + positions[positions >= 0]
+
+
+def _merged_rows(cube, positions, date_positions):
+    """
+    Builds the merged_df rows of the given cube countries at the given date
+    positions, without materializing the rest of the merged DataFrame.
+    """
+    date_positions = np.atleast_1d(date_positions)
+    merged_rows = pd.DataFrame(
+        {
+            "Country/Region": cube.countries[positions].repeat(len(date_positions)),
+            "Date": cube.dates[np.tile(date_positions, len(positions))],
+        }
+    )
+    for column, data_type in MERGED_VALUE_COLUMNS.items():
+        merged_rows[column] = cube.country_values(
+            data_type, positions, date_positions
+        ).ravel()
+
+    return merged_rows
+
+
+@memoize
+@read_only_inputs
+def peak_daily_cases_by_country(
+    confirmed_cases_cleaned, countries, cube=None, increments=None
+):
     """
     Takes in cleaned confirmed cases dataframe and a list of countries and returns
     a dataframe of their highest single day surge and the date
@@ -11,13 +113,45 @@ def peak_daily_cases_by_country(confirmed_cases_cleaned, countries):
     Parameters:
         confirmed_cases_cleaned: Cleaned DataFrame of confirmed cases
         countries: A list of country names
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
+        increments: Optional DailyIncrements of the cube's rollup, read instead
+            of diffing the cube when both are given
 
     Returns:
         peak_daily_cases: A DataFrame containing peak daily cases of the countries
     """
     try:
+        if cube is not None:
+            positions = _present_positions(
+                cube, [DatasetType.CONFIRMED_CASES], countries
+            )
+            if increments is not None:
+                daily_new_cases = increments.metric(
+                    "country", DatasetType.CONFIRMED_CASES
+                )[positions]
+            else:
+                country_cases = cube.country_values(
+                    DatasetType.CONFIRMED_CASES, positions
+                )
+                daily_new_cases = np.diff(
+                    country_cases, axis=1, prepend=country_cases[:, :1]
+                )
+
+            peak_daily_cases = pd.DataFrame(
+                {
+                    "Max Confirmed Cases Per Day": daily_new_cases.max(axis=1),
+                    "Date": cube.date_labels[daily_new_cases.argmax(axis=1)],
+                },
+                index=cube.countries[positions],
+            )
+            peak_daily_cases.sort_values(
+                by="Max Confirmed Cases Per Day", ascending=False, inplace=True
+            )
+
+            return peak_daily_cases
+
         # Filter for selected countries
-        filtered = confirmed_cases_cleaned[confirmed_cases_cleaned["Country/Region"].isin(countries)]
+        filtered = select_countries(confirmed_cases_cleaned, countries)
         
         # Group by country and sum across provinces
         country_df = filtered.groupby("Country/Region").sum(numeric_only=True)
@@ -43,8 +177,55 @@ def peak_daily_cases_by_country(confirmed_cases_cleaned, countries):
         logger.error(f"An unexpected error occurred: {str(err)}", exc_info=True)
 
 
+@memoize
+@read_only_inputs
+def recovery_rates_by_country(
+    recovered_cleaned, confirmed_cases_cleaned, date, countries=None, cube=None
+):
+    """
+    Takes in cleaned recovered and confirmed cases dataframe, a date and a list of
+    countries and returns the recovery rate of every one of them as of that date in
+    one pass.
+
+    Parameters:
+        recovered_cleaned: Cleaned DataFrame of recovered cases
+        confirmed_cases_cleaned: Cleaned DataFrame of confirmed cases
+        date: Date as of which you want the recovery rates
+        countries: List of country names, None selects every country
+        cube: Optional CaseCube, when given it is used instead of the DataFrames
+
+    Returns:
+        recovery_rates: A DataFrame of Country/Region and its Recovery Rate
+    """
+    try:
+        # Only the requested date is summed up and divided
+        if cube is not None:
+            recovery_rates = cube_rates_as_of(
+                cube,
+                DatasetType.RECOVERED,
+                DatasetType.CONFIRMED_CASES,
+                [date],
+                countries,
+            )
+        else:
+            recovery_rates = rates_as_of(
+                recovered_cleaned, confirmed_cases_cleaned, [date], countries
+            )
+
+        return recovery_rates[date].rename("Recovery Rate").reset_index()
+    except Exception as err:
+        logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
+
+
+@memoize
+@read_only_inputs
 def compare_recovery_rate(
-    recovered_cleaned, confirmed_cases_cleaned, country_one, country_two, date
+    recovered_cleaned,
+    confirmed_cases_cleaned,
+    country_one,
+    country_two,
+    date,
+    cube=None,
 ):
     """
     Takes in cleaned recovered and confirmed cases dataframe, names of two countries
@@ -56,38 +237,74 @@ def compare_recovery_rate(
         confirmed_cases_cleaned: Cleaned DataFrame of confirmed cases
         country_one: Name of first country
         country_two: Name of the second country
+        cube: Optional CaseCube, when given it is used instead of the DataFrames
 
     Returns:
         recovery_rates: A DataFrame containing comparison of recovery rates
     """
     try:
-        filtered_recovered = recovered_cleaned[
-            recovered_cleaned["Country/Region"].isin([country_one, country_two])
-        ]
-        filtered_recovered = filtered_recovered.drop(
-            columns=["Province/State", "Lat", "Long"]
+        recovery_rates = recovery_rates_by_country(
+            recovered_cleaned,
+            confirmed_cases_cleaned,
+            date,
+            [country_one, country_two],
+            cube=cube,
         )
-        filtered_recovered = filtered_recovered.groupby("Country/Region").sum()
 
-        filtered_confirmed = confirmed_cases_cleaned[
-            confirmed_cases_cleaned["Country/Region"].isin([country_one, country_two])
-        ]
-        filtered_confirmed = filtered_confirmed.drop(
-            columns=["Province/State", "Lat", "Long"]
+        return (
+            recovery_rates.set_index("Country/Region")["Recovery Rate"].rename(date)
         )
-        filtered_confirmed = filtered_confirmed.groupby("Country/Region").sum()
+    except Exception as err:
+        logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
-        recovery_rates = (
-            ((filtered_recovered / filtered_confirmed) * 100).fillna(0.0).round(2)
-        )
-        recovery_rates = recovery_rates.loc[:, date]
 
-        return recovery_rates
+@memoize
+@read_only_inputs
+def death_rates_by_province(
+    deaths_cleaned, confirmed_cases_cleaned, date, countries=None, cube=None
+):
+    """
+    Takes in cleaned deaths and confirmed cases dataframe, a date and a list of
+    countries and returns the death rate of every province of those countries as of
+    that date in one pass.
+
+    Parameters:
+        deaths_cleaned: Cleaned DataFrame of death cases
+        confirmed_cases_cleaned: Cleaned DataFrame of confirmed cases
+        date: Date as of which you want the death rates
+        countries: List of country names, None selects every country
+        cube: Optional CaseCube, when given it is used instead of the DataFrames
+
+    Returns:
+        death_rates: A DataFrame of Country/Region, Province/State and Death Rates
+    """
+    try:
+        # Only the requested date is summed up and divided
+        regions = ["Country/Region", "Province/State"]
+        if cube is not None:
+            death_rates = cube_rates_as_of(
+                cube,
+                DatasetType.DEATHS,
+                DatasetType.CONFIRMED_CASES,
+                [date],
+                countries,
+                by=regions,
+            )
+        else:
+            death_rates = rates_as_of(
+                deaths_cleaned, confirmed_cases_cleaned, [date], countries, by=regions
+            )
+
+        return death_rates[date].rename("Death Rates").reset_index()
     except Exception as err:
         logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
 
-def distribution_of_death_rates(deaths_cleaned, confirmed_cases_cleaned, country, date):
+@memoize
+@read_only_inputs
+def distribution_of_death_rates(
+    deaths_cleaned, confirmed_cases_cleaned, country, date, cube=None
+):
     """
     Takes in cleaned deaths and confirmed cases dataframe, and name of a country
     of which we want distribution of deaths, and returns a dataframe of with
@@ -98,36 +315,22 @@ def distribution_of_death_rates(deaths_cleaned, confirmed_cases_cleaned, country
         confirmed_cases_cleaned: Cleaned DataFrame of confirmed cases
         country: Name of a country
         date: Date as of which you want the distribution
+        cube: Optional CaseCube, when given it is used instead of the DataFrames
 
     Returns:
         death_rates: A DataFrame containing comparison of death rates at specific date
     """
     try:
-        filtered_deaths = deaths_cleaned[deaths_cleaned["Country/Region"] == country]
-        filtered_deaths = filtered_deaths.drop(
-            columns=["Lat", "Long", "Country/Region"]
-        )
-        filtered_deaths = filtered_deaths.groupby("Province/State").sum()
-
-        filtered_confirmed = confirmed_cases_cleaned[
-            deaths_cleaned["Country/Region"] == country
-        ]
-        filtered_confirmed = filtered_confirmed.drop(
-            columns=["Lat", "Long", "Country/Region"]
-        )
-        filtered_confirmed = filtered_confirmed.groupby("Province/State").sum()
-
-        death_rates = (
-            ((filtered_deaths / filtered_confirmed) * 100).fillna(0.0).round(2)
+        death_rates = death_rates_by_province(
+            deaths_cleaned, confirmed_cases_cleaned, date, [country], cube=cube
         )
-        death_rates = death_rates[[date]]
-        death_rates.columns = ["Death Rates"]
 
-        return death_rates
+        return death_rates.drop(columns=["Country/Region"]).set_index("Province/State")
     except Exception as err:
         logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
 
+@read_only_inputs
 def get_extreme_death_rates(death_rates):
     """
     Takes in death rates dataframe, and returns a dataframe of with
@@ -153,37 +356,64 @@ def get_extreme_death_rates(death_rates):
         logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
 
-def get_total_deaths_per_country(long_deaths_df):
+@memoize
+@read_only_inputs
+def get_total_deaths_per_country(long_deaths_df, cube=None, number_of_countries=None):
     """
     Takes in cleaned deaths dataframe in long format, and returns a dataframe with
     total deaths per country
 
     Parameters:
         long_deaths_df: Cleaned DataFrame of death cases in long format
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
+        number_of_countries: Optional number of countries with the most deaths
+            to keep, None keeps and sorts every country
 
     Returns:
         total_deaths_df: A DataFrame containing total deaths per country
     """
     try:
-        latest_date = long_deaths_df["Date"].max()
-
-        total_deaths_df = long_deaths_df[long_deaths_df["Date"] == latest_date]
-        total_deaths_df = total_deaths_df.drop(
-            columns=["Lat", "Long", "Province/State"]
-        )
-        total_deaths_df = (
-            total_deaths_df.groupby("Country/Region")
-            .sum(numeric_only=True)
-            .sort_values(by="Deaths", ascending=False)
-            .reset_index()
-        )
+        if cube is not None:
+            positions = _present_positions(cube, [DatasetType.DEATHS])
+            total_deaths_df = pd.DataFrame(
+                {"Deaths": cube.country_values(DatasetType.DEATHS, positions, -1)},
+                index=cube.countries[positions],
+            )
+        else:
+            if isinstance(long_deaths_df, LongView):
+                total_deaths_df = long_deaths_df.latest()
+            else:
+                latest_date = long_deaths_df["Date"].max()
+                total_deaths_df = long_deaths_df[
+                    long_deaths_df["Date"] == latest_date
+                ]
+            total_deaths_df = total_deaths_df.drop(
+                columns=["Lat", "Long", "Province/State"]
+            )
+            total_deaths_df = total_deaths_df.groupby(
+                "Country/Region", observed=True
+            ).sum(numeric_only=True)
+            total_deaths_df.index = total_deaths_df.index.astype("string")
+
+        if number_of_countries is not None:
+            total_deaths_df = top_k_rows(
+                total_deaths_df, number_of_countries, "Deaths"
+            ).reset_index()
+        else:
+            total_deaths_df = total_deaths_df.sort_values(
+                by="Deaths", ascending=False
+            ).reset_index()
 
         return total_deaths_df
     except Exception as err:
         logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
 
-def get_highest_avg_daily_deaths(long_deaths_df, number_of_countries=5):
+@memoize
+@read_only_inputs
+def get_highest_avg_daily_deaths(
+    long_deaths_df, number_of_countries=5, cube=None, increments=None
+):
     """
     Takes in cleaned deaths dataframe, and returns a dataframe of top 5 countries with
     highest average daily deaths
@@ -191,30 +421,69 @@ def get_highest_avg_daily_deaths(long_deaths_df, number_of_countries=5):
     Parameters:
         long_deaths_df: Cleaned DataFrame of death cases in long format
         number_of_countries: Integer number of countries you want
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
+        increments: Optional DailyIncrements of the cube's rollup, read instead
+            of diffing the cube when both are given
 
     Returns:
         average_daily_deaths: A DataFrame with highest average daily deaths countries
     """
     try:
-        long_deaths_df = long_deaths_df.drop(columns=["Lat", "Long", "Province/State"])
-        long_deaths_df = long_deaths_df.sort_values(["Country/Region", "Date"])
+        if cube is not None:
+            positions = _present_positions(cube, [DatasetType.DEATHS])
+            if increments is not None:
+                average_deaths = increments.metric("country", DatasetType.DEATHS)[
+                    positions
+                ].mean(axis=1)
+            else:
+                # The daily increments of a cumulative series sum up to last - first
+                first_and_last = cube.country_values(
+                    DatasetType.DEATHS, positions, [0, -1]
+                )
+                average_deaths = (
+                    first_and_last[:, 1] - first_and_last[:, 0]
+                ) / len(cube.dates)
+            average_daily_deaths = pd.Series(
+                average_deaths,
+                index=cube.countries[positions],
+                name="Average Daily Deaths",
+            )
+
+            return top_k_rows(average_daily_deaths, number_of_countries)
+
+        if isinstance(long_deaths_df, LongView):
+            long_deaths_df = long_deaths_df.to_frame()
+
+        # Sum provinces first so the diff runs along each country's own series
+        long_deaths_df = (
+            long_deaths_df.groupby(["Country/Region", "Date"], observed=True)[
+                "Deaths"
+            ]
+            .sum()
+            .reset_index()
+        )
         long_deaths_df["Average Daily Deaths"] = (
-            long_deaths_df.groupby("Country/Region")["Deaths"].diff().fillna(0.0)
+            long_deaths_df.groupby("Country/Region", observed=True)["Deaths"]
+            .diff()
+            .fillna(0.0)
         )
 
-        average_daily_deaths = (
-            long_deaths_df.groupby("Country/Region")["Average Daily Deaths"]
-            .mean()
-            .sort_values(ascending=False)
-            .head(number_of_countries)
+        average_daily_deaths = top_k_rows(
+            long_deaths_df.groupby("Country/Region", observed=True)[
+                "Average Daily Deaths"
+            ].mean(),
+            number_of_countries,
         )
+        average_daily_deaths.index = average_daily_deaths.index.astype("string")
 
         return average_daily_deaths
     except Exception as err:
         logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
 
-def total_deaths_overtime(long_deaths_df, country_name):
+@memoize
+@read_only_inputs
+def total_deaths_overtime(long_deaths_df, country_name, cube=None):
     """
     Takes in cleaned deaths dataframe, and returns a dataframe of deaths
     overtime.
@@ -222,17 +491,35 @@ def total_deaths_overtime(long_deaths_df, country_name):
     Parameters:
         long_deaths_df: Cleaned DataFrame of death cases in long format
         country_name: Name of the country you want the overtime deaths for
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
 
     Returns:
         overtime_deaths: A DataFrame with overtime deaths of the specified country
     """
     try:
-        overtime_deaths = long_deaths_df[
-            long_deaths_df["Country/Region"] == country_name
-        ]
+        if cube is not None:
+            regions = _long_region_order(
+                long_deaths_df,
+                cube,
+                _single_country_rows(cube, country_name),
+                country_name,
+            )
+            deaths = cube.metric(DatasetType.DEATHS)[regions]
+
+            return pd.DataFrame(
+                {
+                    "Date": cube.dates.repeat(len(deaths)),
+                    "Deaths": deaths.T.ravel(),
+                }
+            )
+
+        overtime_deaths = _country_long_rows(long_deaths_df, country_name)
 
         # Drop unnecessary columns
-        overtime_deaths = overtime_deaths.sort_values(["Date"]).reset_index()
+        # A stable sort keeps the provinces of every date in the input order
+        overtime_deaths = overtime_deaths.sort_values(
+            ["Date"], kind="stable"
+        ).reset_index()
         overtime_deaths = overtime_deaths.drop(
             columns=["Lat", "Long", "Province/State", "Country/Region", "index"]
         )
@@ -242,46 +529,131 @@ def total_deaths_overtime(long_deaths_df, country_name):
         logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
 
-def merged_monthly_sum(merged_df):
+@memoize
+@read_only_inputs
+def merged_period_sum(merged_df, granularity="month", cube=None, increments=None):
     """
-    Takes in merged dataframe of confirmed, deaths, and recovered cases, and returns
-    a dataframe containing monthly sum of each dataset type.
+    Takes in merged dataframe of confirmed, deaths, and recovered cases and a
+    granularity, and returns a dataframe containing the sum of each dataset type
+    in every calendar bucket, e.g. every ISO week, epi week, month or quarter.
 
     Parameters:
         merged_df: Merged DataFrame of confirmed, deaths, recovered cases in long format
+        granularity: One of GRANULARITIES, or a sequence of the start dates of
+            custom buckets
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
+        increments: Optional DailyIncrements of the cube's rollup, read instead
+            of diffing the cube when both are given
 
     Returns:
-        monthly_sum: A DataFrame with merged monthly sums
+        period_sum: A DataFrame with the country, the bucket and the sums of
+            every dataset type, titled after the granularity, e.g. Month and
+            Monthly Deaths
     """
     try:
-        merged_df.sort_values(by=["Country/Region", "Date"], inplace=True)
+        title, adjective = granularity_titles(granularity)
+        value_columns = {
+            column: f"{adjective} {column}" for column in MERGED_VALUE_COLUMNS
+        }
+
+        if cube is not None:
+            positions = _present_positions(cube, MERGED_VALUE_COLUMNS.values())
+            buckets = build_date_buckets(cube.dates, granularity)
+            metrics = [
+                CUBE_METRICS.index(data_type)
+                for data_type in MERGED_VALUE_COLUMNS.values()
+            ]
 
-        merged_df["Monthly Confirmed Cases"] = merged_df.groupby("Country/Region")[
-            "Confirmed Cases"
-        ].diff()
-        merged_df["Monthly Deaths"] = merged_df.groupby("Country/Region")[
-            "Deaths"
-        ].diff()
-        merged_df["Monthly Recovered"] = merged_df.groupby("Country/Region")[
-            "Recovered"
+            if increments is not None:
+                # Every country and metric is summed per bucket in one reduceat
+                period_values = resample_values(
+                    increments.levels["country"][positions], buckets
+                )[:, :, metrics]
+            else:
+                # Daily increments within a bucket sum up to the change between
+                # the day before it and its last day
+                ends = buckets.ends()
+                previous_ends = np.maximum(buckets.starts - 1, 0)
+                period_values = np.stack(
+                    [
+                        cube.country_values(data_type, positions, ends)
+                        - cube.country_values(data_type, positions, previous_ends)
+                        for data_type in MERGED_VALUE_COLUMNS.values()
+                    ],
+                    axis=2,
+                )
+
+            period_sum = pd.DataFrame(
+                {
+                    "Country/Region": cube.countries[positions].repeat(
+                        len(buckets.starts)
+                    ),
+                    title: buckets.labels[
+                        np.tile(np.arange(len(buckets.starts)), len(positions))
+                    ],
+                }
+            )
+            for position, column in enumerate(value_columns.values()):
+                period_sum[column] = period_values[:, :, position].ravel().astype(
+                    float
+                )
+
+            return period_sum
+
+        # The caller's frame is left as it is, the diffs go into a sorted copy
+        sorted_df = merged_df.sort_values(by=["Country/Region", "Date"])
+        period_diffs = sorted_df.groupby("Country/Region")[
+            list(MERGED_VALUE_COLUMNS)
         ].diff()
+        buckets = build_date_buckets(
+            pd.DatetimeIndex(sorted_df["Date"].unique()).sort_values(), granularity
+        )
+        bucket_numbers = buckets.bucket_of(sorted_df["Date"])
+        # Dates before the first bucket have no label, also when no bucket
+        # covers any date and there is no label at all
+        covered = bucket_numbers >= 0
+        sorted_df = sorted_df.assign(
+            **{
+                value_column: period_diffs[column]
+                for column, value_column in value_columns.items()
+            }
+        )[covered]
+        sorted_df.insert(
+            len(sorted_df.columns), title, buckets.labels[bucket_numbers[covered]]
+        )
 
-        merged_df["Month"] = merged_df["Date"].dt.to_period("M")
-
-        monthly_sum = (
-            merged_df.groupby(["Country/Region", "Month"])[
-                ["Monthly Confirmed Cases", "Monthly Deaths", "Monthly Recovered"]
-            ]
+        period_sum = (
+            sorted_df.groupby(["Country/Region", title])[list(value_columns.values())]
             .sum()
             .reset_index()
         )
 
-        return monthly_sum
+        return period_sum
     except Exception as err:
         logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
 
-def highest_avg_death_rates_2020(merged_df, number_of_countries=3):
+@read_only_inputs
+def merged_monthly_sum(merged_df, cube=None, increments=None):
+    """
+    Takes in merged dataframe of confirmed, deaths, and recovered cases, and returns
+    a dataframe containing monthly sum of each dataset type.
+
+    Parameters:
+        merged_df: Merged DataFrame of confirmed, deaths, recovered cases in long format
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
+        increments: Optional DailyIncrements of the cube's rollup, read instead
+            of diffing the cube when both are given
+
+    Returns:
+        monthly_sum: A DataFrame with merged monthly sums
+    """
+    return merged_period_sum(merged_df, "month", cube=cube, increments=increments)
+
+
+@memoize
+@read_only_inputs
+def highest_avg_death_rates_2020(merged_df, number_of_countries=3, cube=None):
     """
     Takes in merged dataframe of confirmed, deaths, and recovered cases, and number_of_countries
     and returns a dataframe death rates of top n countries.
@@ -289,34 +661,83 @@ def highest_avg_death_rates_2020(merged_df, number_of_countries=3):
     Parameters:
         merged_df: Merged DataFrame of confirmed, deaths, recovered cases in long format
         number_of_countries: Number of countries of which you want to see death rates
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
 
     Returns:
         death_rates: A DataFrame with death rates of n countries
     """
     try:
-        df_2020 = merged_df[
-            (merged_df["Date"] >= "2020-01-01") & (merged_df["Date"] <= "2020-12-31")
-        ]
-
-        death_rates = (
-            df_2020.sort_values("Date").groupby("Country/Region").last().reset_index()
-        )
+        if cube is not None:
+            last_2020_date = cube.dates.searchsorted(pd.Timestamp("2020-12-31"), "right")
+            death_rates = _merged_rows(
+                cube,
+                _present_positions(cube, MERGED_VALUE_COLUMNS.values()),
+                last_2020_date - 1,
+            )
+        else:
+            # Last row of every country in 2020, found by binary search
+            last_2020_rows = get_date_index(merged_df).last_in_range(
+                "2020-01-01", "2020-12-31"
+            )
+            death_rates = merged_df.iloc[last_2020_rows].reset_index(drop=True)
 
         death_rates["Death Rate"] = (
             (death_rates["Deaths"] / death_rates["Confirmed Cases"])
             .fillna(0.0)
             .round(2)
         )
-        death_rates = death_rates.sort_values("Death Rate", ascending=False).head(
-            number_of_countries
-        )
+        death_rates = top_k_rows(death_rates, number_of_countries, "Death Rate")
 
         return death_rates
     except Exception as err:
         logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
 
-def recovery_death_ratio(merged_df, country_name):
+@memoize
+@read_only_inputs
+def recovery_death_ratios(merged_df, countries=None, cube=None):
+    """
+    Takes in merged dataframe of confirmed, deaths, and recovered cases, and a list
+    of countries and returns the recovery death ratio of every one of them in one pass.
+
+    Parameters:
+        merged_df: Merged DataFrame of confirmed, deaths, recovered cases in long format
+        countries: List of country names, None selects every country
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
+
+    Returns:
+        recovery_death_ratios: A DataFrame with the latest row of every country and
+            its Recovery Death Ratio, NaN where the country has no deaths
+    """
+    try:
+        if cube is not None:
+            positions = _present_positions(
+                cube, MERGED_VALUE_COLUMNS.values(), countries
+            )
+            latest_data = _merged_rows(cube, positions, -1)
+        else:
+            if isinstance(merged_df, LongView):
+                merged_df = merged_df.filter(
+                    countries=countries, start=merged_df.latest_date()
+                )
+            latest_data = merged_df.iloc[get_date_index(merged_df).last_in_range()]
+            if countries is not None:
+                latest_data = latest_data[latest_data["Country/Region"].isin(countries)]
+            latest_data = latest_data.reset_index(drop=True)
+
+        total_deaths = latest_data["Deaths"].where(latest_data["Deaths"] > 0)
+        latest_data["Recovery Death Ratio"] = (
+            latest_data["Recovered"] / total_deaths
+        ).round(2)
+
+        return latest_data
+    except Exception as err:
+        logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
+
+
+@memoize
+@read_only_inputs
+def recovery_death_ratio(merged_df, country_name, cube=None):
     """
     Takes in merged dataframe of confirmed, deaths, and recovered cases, and name of the country
     and returns a recovery death ratio of that country.
@@ -324,32 +745,87 @@ def recovery_death_ratio(merged_df, country_name):
     Parameters:
         merged_df: Merged DataFrame of confirmed, deaths, recovered cases in long format
         country_name: Name of country of which you want to see recovery death ratio
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
 
     Returns:
         recovery_death_ratio: Recovery death ratio of specified country
     """
     try:
-        country_df = merged_df[merged_df["Country/Region"] == country_name]
+        recovery_death_ratio = recovery_death_ratios(
+            merged_df, [country_name], cube=cube
+        )["Recovery Death Ratio"].iloc[-1]
+
+        return None if np.isnan(recovery_death_ratio) else recovery_death_ratio
+    except Exception as err:
+        logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
-        latest_data = country_df.sort_values("Date").iloc[-1]
 
-        total_recovered = latest_data["Recovered"]
-        total_deaths = latest_data["Deaths"]
+@memoize
+@read_only_inputs
+def recovery_confirmed_ratios(
+    merged_df,
+    countries=None,
+    start="2020-03-01",
+    end="2021-05-31",
+    cube=None,
+    granularity="month",
+):
+    """
+    Takes in merged dataframe of confirmed, deaths, and recovered cases, a list of
+    countries and a date range and returns the recovery confirmed cases ratio of every
+    one of them at the end of every calendar bucket of the range in one pass.
 
-        recovery_death_ratio = (
-            total_recovered / total_deaths if total_deaths > 0 else None
-        )
+    Parameters:
+        merged_df: Merged DataFrame of confirmed, deaths, recovered cases in long format
+        countries: List of country names, None selects every country
+        start: First date of the range
+        end: Last date of the range
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
+        granularity: One of GRANULARITIES, or a sequence of the start dates of
+            custom buckets
 
-        return (
-            recovery_death_ratio.round(2)
-            if isinstance(recovery_death_ratio, float)
-            else recovery_death_ratio
+    Returns:
+        recovery_confirm_ratios: A DataFrame with the last row of every country in
+            every bucket and its Recovery Ratio, sorted by country and bucket, the
+            bucket column titled after the granularity, e.g. Month
+    """
+    try:
+        if cube is not None:
+            # Only the last day of every bucket is kept
+            positions = _present_positions(
+                cube, MERGED_VALUE_COLUMNS.values(), countries
+            )
+            buckets = build_date_buckets(cube.dates, granularity, start, end)
+            date_filtered = _merged_rows(cube, positions, buckets.ends())
+        else:
+            if isinstance(merged_df, LongView):
+                merged_df = merged_df.filter(countries=countries, start=start, end=end)
+            date_index = get_date_index(merged_df)
+            buckets = build_date_buckets(date_index.dates, granularity, start, end)
+            bucket_ends = date_index.last_in_buckets(buckets.boundaries(), countries)
+            date_filtered = merged_df.iloc[bucket_ends]
+        recovery_confirm_ratios = date_filtered.reset_index(drop=True)
+        recovery_confirm_ratios.insert(
+            0,
+            granularity_titles(granularity)[0],
+            buckets.labels[buckets.bucket_of(recovery_confirm_ratios["Date"])],
         )
+
+        recovery_confirm_ratios["Recovery Ratio"] = (
+            recovery_confirm_ratios["Recovered"]
+            / recovery_confirm_ratios["Confirmed Cases"]
+        ).round(2)
+
+        return recovery_confirm_ratios
     except Exception as err:
         logger.error(f"An unexpected error occured: {str(err)}", exc_info=True)
 
 
-def highest_recovery_confirmed_ratio(merged_df, country_name):
+@memoize
+@read_only_inputs
+def highest_recovery_confirmed_ratio(
+    merged_df, country_name, cube=None, granularity="month"
+):
     """
     Takes in merged dataframe of confirmed, deaths, and recovered cases, and name of the country
     and returns a recovery confirmed cases ratio of that country.
@@ -357,25 +833,17 @@ def highest_recovery_confirmed_ratio(merged_df, country_name):
     Parameters:
         merged_df: Merged DataFrame of confirmed, deaths, recovered cases in long format
         country_name: Name of country of which you want to see recovery confirm cases
+        cube: Optional CaseCube, when given it is used instead of the DataFrame
+        granularity: Calendar buckets the ratio is read at the end of, see
+            recovery_confirmed_ratios
 
     Returns:
         recovery_confirm_ratio: Recovery confirm cases ratio of specified country
     """
     try:
-        country_df = merged_df[merged_df["Country/Region"] == country_name]
-
-        date_filtered = country_df[
-            (country_df["Date"] >= "2020-03-01") & (country_df["Date"] <= "2021-05-31")
-        ].copy()
-        date_filtered["Month"] = date_filtered["Date"].dt.to_period("M")
-        recovery_confirm_ratio = (
-            date_filtered.sort_values("Date").groupby("Month").last().reset_index()
+        recovery_confirm_ratio = recovery_confirmed_ratios(
+            merged_df, [country_name], cube=cube, granularity=granularity
         )
-
-        recovery_confirm_ratio["Recovery Ratio"] = (
-            recovery_confirm_ratio["Recovered"]
-            / recovery_confirm_ratio["Confirmed Cases"]
-        ).round(2)
         recovery_confirm_ratio = recovery_confirm_ratio.sort_values(
             "Recovery Ratio", ascending=False
         )
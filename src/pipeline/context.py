@@ -0,0 +1,207 @@
+from types import MappingProxyType
+from dataclasses import dataclass
+from collections.abc import Mapping
+
+import pandas as pd
+import streamlit as st
+
+from src.logger.logger import logger
+from src.utils.enums import DatasetType
+from src.utils.utils import timer
+from src.utils.constants import DATASET_FILES
+from src.pipeline.cube import CaseCube, load_shared_cube, share_cube
+from src.pipeline.long_view import LongView
+from src.pipeline.result_cache import RESULT_CACHE, register_dataset
+from src.pipeline.rollup import Rollup, build_rollup
+from src.pipeline.increments import DailyIncrements, load_shared_increments
+from src.pipeline.forecast import Forecasts, build_forecasts
+from src.pipeline.row_index import get_row_index
+from src.pipeline.date_index import get_date_index
+from src.pipeline.ingest import ingest_new_dates
+from src.pipeline.data_loader import (
+    read_csv_cached,
+    get_dataset_version,
+    get_dataset_fingerprint,
+)
+from src.pipeline.data_cleaner import handle_missing_data, merge_datasets
+
+
+@dataclass(frozen=True)
+class DataContext:
+    """
+    Every dataset the pages work with, cleaned and transformed once per process
+    and shared by all sessions. The context is read-only: pages must not modify
+    the dataframes it holds, and should pass copies to any code that does.
+
+    Attributes:
+        version: Dataset version the context was built from
+        cleaned: Read-only mapping of DatasetType to the cleaned wide DataFrame
+        long: Read-only mapping of DatasetType to the LongView of the dataset,
+            which builds long format rows only when they are asked for
+        merged: DataFrame built by merge_datasets
+        cube: Memory-mapped CaseCube of the cleaned datasets
+        rollup: Rollup of the cube to countries, continents, WHO regions and
+            the world
+        increments: DailyIncrements of the province and country levels of the
+            rollup, memory-mapped next to the cube
+        forecasts: Forecasts of the province and country levels of the rollup
+    """
+
+    version: str
+    cleaned: Mapping[DatasetType, pd.DataFrame]
+    long: Mapping[DatasetType, LongView]
+    merged: pd.DataFrame
+    cube: CaseCube
+    rollup: Rollup
+    increments: DailyIncrements
+    forecasts: Forecasts
+
+
+# The last context built, which a new one extends when the csvs only gained
+# date columns since
+_LATEST_CONTEXT = {}
+
+
+def _finish_data_context(version, datasets):
+    """
+    Registers the datasets of a context under its version, builds the row and
+    date indexes the pages look up and returns the DataContext.
+    """
+    for df in [*datasets["cleaned"].values(), datasets["merged"]]:
+        get_row_index(df)
+    get_date_index(datasets["merged"])
+
+    names = {
+        **{
+            f"cleaned:{data_type.name}": df
+            for data_type, df in datasets["cleaned"].items()
+        },
+        **{
+            f"long:{data_type.name}": view
+            for data_type, view in datasets["long"].items()
+        },
+        **{
+            name: datasets[name]
+            for name in ["merged", "cube", "rollup", "increments", "forecasts"]
+        },
+    }
+    for name, dataset in names.items():
+        register_dataset(dataset, version, name)
+    RESULT_CACHE.retain_version(version)
+
+    return DataContext(
+        version=version,
+        cleaned=MappingProxyType(datasets["cleaned"]),
+        long=MappingProxyType(datasets["long"]),
+        merged=datasets["merged"],
+        cube=datasets["cube"],
+        rollup=datasets["rollup"],
+        increments=datasets["increments"],
+        forecasts=datasets["forecasts"],
+    )
+
+
+def _build_data_context(version):
+    """
+    Loads, cleans and transforms the datasets of DATASET_FILES from scratch.
+    """
+    # Read through the on-disk cache, which checks the csvs for changes, as
+    # load_data is memoized on the path alone
+    cleaned = {
+        data_type: handle_missing_data(
+            read_csv_cached(path, typed=True)[0], data_type
+        )
+        for data_type, path in DATASET_FILES.items()
+    }
+    cube = load_shared_cube(version=version)
+    rollup = build_rollup(cube)
+
+    return _finish_data_context(
+        version,
+        {
+            "cleaned": cleaned,
+            "long": {
+                data_type: LongView.from_wide(cleaned_df, data_type)
+                for data_type, cleaned_df in cleaned.items()
+            },
+            "merged": merge_datasets(
+                deaths_cleaned=cleaned[DatasetType.DEATHS],
+                confirmed_cases_cleaned=cleaned[DatasetType.CONFIRMED_CASES],
+                recovered_cleaned=cleaned[DatasetType.RECOVERED],
+            ),
+            "cube": cube,
+            "rollup": rollup,
+            "increments": load_shared_increments(rollup, version),
+            "forecasts": build_forecasts(rollup),
+        },
+    )
+
+
+def _extend_data_context(context, version):
+    """
+    Extends a context with the date columns the csvs gained since it was
+    built, parsing and cleaning only those. Returns None when the csvs changed
+    in any other way, so the context has to be built from scratch.
+    """
+    ingested = ingest_new_dates(
+        dict(context.cleaned),
+        dict(context.long),
+        context.merged,
+        context.cube,
+        context.rollup,
+        context.increments,
+        context.forecasts,
+    )
+    if ingested is None or not ingested["new_dates"]:
+        return None
+
+    ingested["cube"] = share_cube(ingested["cube"], version)
+    ingested["increments"] = load_shared_increments(
+        ingested["rollup"], version, increments=ingested["increments"]
+    )
+
+    return _finish_data_context(version, ingested)
+
+
+@st.cache_resource(max_entries=1)
+def _load_data_context(fingerprint):
+    """
+    Returns the data context of DATASET_FILES. fingerprint is only the cache key,
+    so a new context is made when a csv changes and the old one is dropped.
+    When the csvs only gained new dates the last context is extended with them,
+    anything else rebuilds the context from scratch.
+    """
+    with timer() as timing:
+        version = get_dataset_version(DATASET_FILES.values())
+        previous = _LATEST_CONTEXT.get("context")
+
+        if previous is not None and previous.version == version:
+            context, action = previous, "Kept"
+        else:
+            context, action = None, "Extended"
+            if previous is not None:
+                context = _extend_data_context(previous, version)
+            if context is None:
+                context, action = _build_data_context(version), "Built"
+        _LATEST_CONTEXT["context"] = context
+
+    logger.info(
+        f"{action} data context {version[:16]} in {timing['seconds'] * 1000:.1f} ms"
+    )
+    return context
+
+
+def get_data_context():
+    """
+    Returns the process-wide data context of the datasets in DATASET_FILES.
+    It is built on first use and then only looked up, which costs a stat of
+    each csv, so a rerun no longer reloads, recleans or remerges anything.
+    When the csvs gain new dates only those are cleaned and appended.
+
+    Returns:
+        context: Read-only DataContext shared by every session of the process
+    """
+    try:
+        return _load_data_context(get_dataset_fingerprint(DATASET_FILES.values()))
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
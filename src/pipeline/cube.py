@@ -0,0 +1,378 @@
+import os
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.logger.logger import logger
+from src.utils.enums import DatasetType
+from src.utils.constants import CACHE_DIR, DATASET_FILES
+from src.pipeline.data_loader import read_csv_cached, get_dataset_version
+from src.pipeline.data_cleaner import (
+    METADATA_COLUMNS,
+    get_date_columns,
+    handle_missing_data,
+)
+
+CUBE_FORMAT_VERSION = 1
+CUBE_METRICS = (
+    DatasetType.CONFIRMED_CASES,
+    DatasetType.DEATHS,
+    DatasetType.RECOVERED,
+)
+
+
+@dataclass(frozen=True)
+class CaseCube:
+    """
+    Cleaned confirmed, deaths and recovered counts held in one contiguous
+    region x date x metric array, with the region metadata and the date axis
+    kept as side tables. Regions are sorted by country and then province, so
+    the regions of every country form one contiguous block and selecting a
+    country or a date is an array slice.
+
+    Attributes:
+        values: Read-only integer array of shape (region, date, metric), metrics
+            ordered as CUBE_METRICS
+        regions: DataFrame of Province/State, Country/Region, Lat and Long,
+            one row per region
+        dates: DatetimeIndex of the date axis
+        date_labels: Original "m/d/yy" date column labels of the wide DataFrames
+        present: Boolean array of shape (region, metric), False where the region
+            has no row in that metric's dataset
+        countries: Sorted Index of country names
+        country_offsets: Array of region offsets, country i spans regions
+            country_offsets[i]:country_offsets[i + 1]
+    """
+
+    values: np.ndarray
+    regions: pd.DataFrame
+    dates: pd.DatetimeIndex
+    date_labels: pd.Index
+    present: np.ndarray
+    countries: pd.Index
+    country_offsets: np.ndarray
+
+    def metric(self, data_type):
+        """
+        Returns the region x date view of one metric.
+        """
+        return self.values[:, :, CUBE_METRICS.index(data_type)]
+
+    def region_present(self, data_type):
+        """
+        Returns the boolean mask of regions that have a row in the dataset of
+        the given metric.
+        """
+        return self.present[:, CUBE_METRICS.index(data_type)]
+
+    def country_rows(self, position):
+        """
+        Returns the slice of regions that belong to the country at position.
+        """
+        return slice(
+            self.country_offsets[position], self.country_offsets[position + 1]
+        )
+
+    def country_positions(self, countries=None):
+        """
+        Takes country names and returns their sorted positions in self.countries,
+        names that are not in the cube are skipped. None selects every country.
+        """
+        if countries is None:
+            return np.arange(len(self.countries))
+
+        positions = np.unique(self.countries.get_indexer(list(countries)))
+        return positions[positions >= 0]
+
+    def country_present(self, data_type):
+        """
+        Returns a boolean array telling which countries have at least one region
+        in the dataset of the given metric.
+        """
+        return np.logical_or.reduceat(
+            self.region_present(data_type), self.country_offsets[:-1]
+        )
+
+    def country_values(self, data_type, positions=None, dates=slice(None)):
+        """
+        Takes a metric, country positions and date positions and returns the
+        country totals of that metric as int64. The result has one row per
+        country followed by the shape of the date selection, so a single date
+        position gives one value per country.
+        """
+        metric = self.metric(data_type)[:, dates]
+        if positions is None:
+            return np.add.reduceat(
+                metric, self.country_offsets[:-1], axis=0, dtype=np.int64
+            )
+
+        totals = np.empty((len(positions),) + metric.shape[1:], dtype=np.int64)
+        for row, position in enumerate(positions):
+            totals[row] = metric[self.country_rows(position)].sum(
+                axis=0, dtype=np.int64
+            )
+
+        return totals
+
+    def date_position(self, date):
+        """
+        Takes a date, either an original "m/d/yy" label or anything pandas can
+        turn into a Timestamp, and returns its position on the date axis.
+        """
+        if date in self.date_labels:
+            return self.date_labels.get_loc(date)
+
+        return self.dates.get_loc(pd.Timestamp(date))
+
+
+def build_cube(confirmed_cases_cleaned, deaths_cleaned, recovered_cleaned):
+    """
+    Takes in cleaned dataframes of confirmed, deaths, and recovered cases, as
+    returned by handle_missing_data, and builds the region x date x metric cube.
+    Regions missing from one of the datasets hold zeros for that metric and are
+    flagged in the cube's present mask.
+
+    Parameters:
+        confirmed_cases_cleaned: Cleaned DataFrame of confirmed cases
+        deaths_cleaned: Cleaned DataFrame of death cases
+        recovered_cleaned: Cleaned DataFrame of recovered cases
+
+    Returns:
+        cube: CaseCube built from the three datasets
+    """
+    try:
+        cleaned_dfs = [confirmed_cases_cleaned, deaths_cleaned, recovered_cleaned]
+
+        date_labels = get_date_columns(confirmed_cases_cleaned)
+        for cleaned_df in cleaned_dfs[1:]:
+            if not get_date_columns(cleaned_df).equals(date_labels):
+                raise ValueError("All datasets must share the same date columns")
+
+        regions = (
+            pd.concat([cleaned_df[METADATA_COLUMNS] for cleaned_df in cleaned_dfs])
+            .drop_duplicates(subset=["Province/State", "Country/Region"])
+            .sort_values(["Country/Region", "Province/State"])
+            .reset_index(drop=True)
+        )
+        region_keys = pd.MultiIndex.from_frame(
+            regions[["Province/State", "Country/Region"]]
+        )
+
+        max_value = max(
+            cleaned_df[date_labels].to_numpy().max() for cleaned_df in cleaned_dfs
+        )
+        dtype = np.int32 if max_value <= np.iinfo(np.int32).max else np.int64
+
+        values = np.zeros((len(regions), len(date_labels), len(CUBE_METRICS)), dtype)
+        present = np.zeros((len(regions), len(CUBE_METRICS)), dtype=bool)
+        for metric_position, cleaned_df in enumerate(cleaned_dfs):
+            rows = region_keys.get_indexer(
+                pd.MultiIndex.from_frame(
+                    cleaned_df[["Province/State", "Country/Region"]]
+                )
+            )
+            values[rows, :, metric_position] = cleaned_df[date_labels].to_numpy()
+            present[rows, metric_position] = True
+
+        values.flags.writeable = False
+        present.flags.writeable = False
+
+        return _assemble_cube(values, present, regions, date_labels)
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
+
+
+def extend_cube(cube, confirmed_cases_new, deaths_new, recovered_new):
+    """
+    Takes in a cube and cleaned dataframes of confirmed, deaths, and recovered
+    cases that hold only the date columns appended after the cube's last date,
+    and returns a cube with those dates added.
+
+    Parameters:
+        cube: CaseCube to extend
+        confirmed_cases_new: Cleaned confirmed cases of the new dates
+        deaths_new: Cleaned deaths of the new dates
+        recovered_new: Cleaned recovered cases of the new dates
+
+    Returns:
+        extended_cube: CaseCube covering the old and the new dates
+    """
+    new_dfs = [confirmed_cases_new, deaths_new, recovered_new]
+    new_labels = get_date_columns(confirmed_cases_new)
+    region_keys = pd.MultiIndex.from_frame(
+        cube.regions[["Province/State", "Country/Region"]]
+    )
+
+    max_value = max(new_df[new_labels].to_numpy().max() for new_df in new_dfs)
+    dtype = cube.values.dtype
+    if max_value > np.iinfo(dtype).max:
+        dtype = np.int64
+
+    new_values = np.zeros((len(region_keys), len(new_labels), len(CUBE_METRICS)), dtype)
+    for metric_position, new_df in enumerate(new_dfs):
+        rows = region_keys.get_indexer(
+            pd.MultiIndex.from_frame(new_df[["Province/State", "Country/Region"]])
+        )
+        if (rows < 0).any():
+            raise ValueError("New dates add regions, the cube needs a full rebuild")
+        new_values[rows, :, metric_position] = new_df[new_labels].to_numpy()
+
+    values = np.concatenate([cube.values.astype(dtype, copy=False), new_values], axis=1)
+    values.flags.writeable = False
+
+    return _assemble_cube(
+        values,
+        cube.present,
+        cube.regions,
+        list(cube.date_labels) + list(new_labels),
+    )
+
+
+def _assemble_cube(values, present, regions, date_labels):
+    """
+    Derives the date axis and the country offsets and wraps everything in a
+    CaseCube. regions must already be sorted by country.
+    """
+    country_names = regions["Country/Region"].to_numpy()
+    country_starts = np.flatnonzero(
+        np.r_[True, country_names[1:] != country_names[:-1]]
+    )
+
+    return CaseCube(
+        values=values,
+        regions=regions,
+        dates=pd.to_datetime(date_labels, format="%m/%d/%y"),
+        date_labels=pd.Index(date_labels),
+        present=present,
+        countries=pd.Index(
+            regions["Country/Region"].iloc[country_starts], name="Country/Region"
+        ),
+        country_offsets=np.append(country_starts, len(regions)),
+    )
+
+
+def save_cube(cube, directory):
+    """
+    Writes the cube into directory as plain .npy arrays plus the region table,
+    so that open_cube can memory-map it. The files are written to a temporary
+    directory that is renamed into place, so a reader never sees a partial cube,
+    and if another process saved the same cube first its copy is kept.
+
+    Parameters:
+        cube: CaseCube to write
+        directory: Directory the cube is written to, must not exist yet
+    """
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    tmp_directory = Path(tempfile.mkdtemp(dir=directory.parent, prefix=".tmp-"))
+
+    try:
+        np.save(tmp_directory / "values.npy", cube.values)
+        np.save(tmp_directory / "present.npy", cube.present)
+        cube.regions.to_feather(tmp_directory / "regions.feather")
+        with open(tmp_directory / "date_labels.json", "w") as file:
+            json.dump(list(cube.date_labels), file)
+
+        try:
+            os.rename(tmp_directory, directory)
+        except OSError:
+            if not directory.exists():
+                raise
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+
+
+def open_cube(directory):
+    """
+    Opens a cube written by save_cube. The values are memory-mapped read-only,
+    so every process that opens the same directory shares one copy of the data
+    through the page cache instead of holding its own.
+
+    Parameters:
+        directory: Directory the cube was saved to
+
+    Returns:
+        cube: CaseCube whose values are a read-only view of the mapped file
+    """
+    directory = Path(directory)
+    values = np.load(directory / "values.npy", mmap_mode="r").view(np.ndarray)
+    present = np.load(directory / "present.npy", mmap_mode="r").view(np.ndarray)
+    regions = pd.read_feather(directory / "regions.feather")
+    with open(directory / "date_labels.json", "r") as file:
+        date_labels = json.load(file)
+
+    return _assemble_cube(values, present, regions, date_labels)
+
+
+def shared_cube_directory(version, cache_dir=CACHE_DIR):
+    """
+    Returns the directory the shared cube of a dataset version is saved to.
+    """
+    return Path(cache_dir) / f"cube-v{CUBE_FORMAT_VERSION}-{version[:16]}"
+
+
+def share_cube(cube, version, cache_dir=CACHE_DIR):
+    """
+    Saves a cube built in this process, like one extended by new dates, as the
+    shared cube of its dataset version unless another process already did, and
+    returns the memory-mapped copy, so the process drops its own.
+
+    Parameters:
+        cube: CaseCube of the dataset version
+        version: Dataset version as returned by get_dataset_version
+        cache_dir: Directory holding the cube files
+
+    Returns:
+        cube: Read-only, memory-mapped CaseCube
+    """
+    directory = shared_cube_directory(version, cache_dir)
+    if not directory.exists():
+        save_cube(cube, directory)
+        logger.info(f"Saved shared cube in {directory}")
+
+    return open_cube(directory)
+
+
+@st.cache_resource
+def load_shared_cube(cache_dir=CACHE_DIR, version=None):
+    """
+    Returns the cube of the datasets in DATASET_FILES, memory-mapped from
+    cache_dir. The cube file is named after the dataset version, so it is
+    built once per dataset change by whichever process gets there first, and
+    every other process and session only maps it. st.cache_resource keeps a
+    single mapping per process and version.
+
+    Parameters:
+        cache_dir: Directory holding the cube files
+        version: Dataset version as returned by get_dataset_version, computed
+            from DATASET_FILES when not given
+
+    Returns:
+        cube: Read-only, memory-mapped CaseCube
+    """
+    try:
+        if version is None:
+            version = get_dataset_version(
+                DATASET_FILES[metric] for metric in CUBE_METRICS
+            )
+        directory = shared_cube_directory(version, cache_dir)
+
+        if not directory.exists():
+            cleaned_dfs = [
+                handle_missing_data(
+                    read_csv_cached(DATASET_FILES[metric], typed=True)[0], metric
+                )
+                for metric in CUBE_METRICS
+            ]
+            save_cube(build_cube(*cleaned_dfs), directory)
+            logger.info(f"Built shared cube in {directory}")
+
+        return open_cube(directory)
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
@@ -1,24 +1,39 @@
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 
 from src.logger.logger import logger
 from src.utils.enums import DatasetType
-
-
-def rename_column_first_row(raw_df):
+from src.utils.utils import profile_stage
+
+METADATA_COLUMNS = ["Province/State", "Country/Region", "Lat", "Long"]
+METADATA_DTYPES = {
+    "Province/State": "string",
+    "Country/Region": "string",
+    "Lat": float,
+    "Long": float,
+}
+NON_EXISTING_PROVINCES = ["Diamond Princess", "Grand Princess"]
+VALUE_COLUMN_TITLES = {
+    DatasetType.CONFIRMED_CASES: "Confirmed Cases",
+    DatasetType.DEATHS: "Deaths",
+    DatasetType.RECOVERED: "Recovered",
+}
+
+
+def get_date_columns(df):
     """
-    Takes in raw dataframe and renames its column to its first row
+    Takes in a wide dataframe and returns its date columns, i.e. every column
+    after the Province/State, Country/Region, Lat and Long columns
 
     Parameters:
-        raw_df: Raw DataFrame
+        df: DataFrame in wide format
 
     Returns:
-        renamed_df: Renamed column DataFrame
+        date_columns: Index of the date column labels
     """
-    # Rename the column to the first row and remove first row
-    renamed_df = raw_df.rename(columns=raw_df.iloc[0])
-    renamed_df = renamed_df.drop(renamed_df.index[0]).reset_index(drop=True)
-
-    return renamed_df
+    return df.columns[len(METADATA_COLUMNS) :]
 
 
 def replace_empty_province(raw_df):
@@ -32,6 +47,15 @@ def replace_empty_province(raw_df):
     Returns:
         renamed_df: DataFrame with empty provinces replaced with 'All Provinces'
     """
+    provinces = raw_df["Province/State"]
+    if (
+        isinstance(provinces.dtype, pd.CategoricalDtype)
+        and "All Provinces" not in provinces.cat.categories
+    ):
+        raw_df = raw_df.assign(
+            **{"Province/State": provinces.cat.add_categories("All Provinces")}
+        )
+
     return raw_df.fillna({"Province/State": "All Provinces"})
 
 
@@ -46,105 +70,317 @@ def drop_non_existing_provinces(raw_df):
     Returns:
         cleaned_df: DataFrame with the rows with non existing provinces dropped
     """
-    return raw_df[
-        ~raw_df["Province/State"].isin(["Diamond Princess", "Grand Princess"])
-    ]
+    return raw_df[~raw_df["Province/State"].isin(NON_EXISTING_PROVINCES)]
 
 
-def fix_datatypes(raw_df):
+def forward_fill(values, inplace=False):
     """
-    Takes in raw dataframe and make sure that each column has proper data types
+    Takes in a 2-D float array and replaces every NaN with the last non missing
+    value to its left in the same row, NaNs at the start of a row stay NaN.
+    Only rows with a NaN are touched: a running maximum over the column
+    positions of their non missing values gives, for every cell, the column to
+    copy from.
 
     Parameters:
-        raw_df: Raw DataFrame
+        values: 2-D float array of shape (rows, dates)
+        inplace: Whether to fill values itself instead of a copy, read-only
+            arrays, like the views Copy-on-Write frames hand out, are copied
 
     Returns:
-        datatype_fixed_df: DataFrame with properly updated datatypes
+        filled_values: Array with the missing values forward filled
     """
-    datatype_fixed_df = raw_df.copy()
-    datatype_fixed_df["Province/State"] = datatype_fixed_df["Province/State"].astype(
-        "string"
-    )
-    datatype_fixed_df["Country/Region"] = datatype_fixed_df["Country/Region"].astype(
-        "string"
+    if not inplace or not values.flags.writeable:
+        values = values.copy()
+
+    missing = np.isnan(values)
+    rows = np.flatnonzero(missing.any(axis=1))
+    if len(rows) == 0:
+        return values
+
+    missing = missing[rows]
+    source_columns = np.where(
+        missing, np.int32(0), np.arange(values.shape[1], dtype=np.int32)
     )
-    datatype_fixed_df["Lat"] = datatype_fixed_df["Lat"].astype(float)
-    datatype_fixed_df["Long"] = datatype_fixed_df["Long"].astype(float)
-    date_columns = datatype_fixed_df.loc[:, "1/22/20":"5/29/21"].columns
-    datatype_fixed_df[date_columns] = datatype_fixed_df[date_columns].astype(int)
+    np.maximum.accumulate(source_columns, axis=1, out=source_columns)
+
+    missing_rows, missing_columns = np.nonzero(missing)
+    values[rows[missing_rows], missing_columns] = values[
+        rows[missing_rows], source_columns[missing_rows, missing_columns]
+    ]
 
-    return datatype_fixed_df
+    return values
 
 
-def handle_missing_data(raw_df, data_type):
+def _compact_rows(values, rows):
+    """
+    Moves the given rows of a 2-D array, in ascending order, to its top in
+    place and returns the view of them. Rows are copied one at a time, so no
+    temporary of the whole selection is made.
+    """
+    for target, source in enumerate(rows):
+        if target != source:
+            values[target] = values[source]
+
+    return values[: len(rows)]
+
+
+def handle_missing_data(raw_df, data_type, report_stage=None):
     """
     Takes in raw dataframe and handle the missing values in the columns,
     deletes lat/long non-significant rows and ffill from left to right,
     and whereever province is empty, write 'All Provinces'
 
+    The raw dataframe is never copied as a whole: the rows to keep are found
+    from the metadata columns, the date columns are read once into a float
+    buffer owned by this function, and that buffer is compacted, forward
+    filled and cast without further intermediate frames.
+
     Parameters:
-        raw_df: Raw DataFrame of the deaths csv
+        raw_df: Raw DataFrame of the deaths csv, either as loaded by load_data or
+            typed by load_data(..., typed=True)
         data_type: DatasetType enum value
+        report_stage: Optional callback receiving the name, seconds and peak
+            allocated bytes of every cleaning stage, see profile_stage
 
     Returns:
         cleaned_df: Cleaned DataFrame
     """
     try:
-        if data_type in [DatasetType.DEATHS, DatasetType.RECOVERED]:
-            raw_df = rename_column_first_row(raw_df)
+        with profile_stage("header", report_stage):
+            # Typed frames were read with their real header and compact integer
+            # dates, placeholder headers are replaced by the first row
+            header_rows = int(
+                data_type in [DatasetType.DEATHS, DatasetType.RECOVERED]
+                and "Province/State" not in raw_df.columns
+            )
+            labels = raw_df.iloc[0] if header_rows else raw_df.columns
+            date_labels = pd.Index(labels[len(METADATA_COLUMNS) :])
+            row_labels = raw_df.index[header_rows:]
+            if header_rows:
+                row_labels = pd.RangeIndex(len(row_labels))
+            date_dtype = "int32" if (raw_df.dtypes == "int32").any() else int
+
+        with profile_stage("select rows", report_stage):
+            metadata_df = raw_df.iloc[header_rows:, : len(METADATA_COLUMNS)]
+            metadata_df.columns = METADATA_COLUMNS
+
+            # Rows of ships and rows without Lat or Long are non-significant
+            kept_rows = np.flatnonzero(
+                ~metadata_df["Province/State"].isin(NON_EXISTING_PROVINCES)
+                & metadata_df["Lat"].notna()
+                & metadata_df["Long"].notna()
+            )
+
+        with profile_stage("metadata", report_stage):
+            metadata_df = replace_empty_province(metadata_df.iloc[kept_rows])
+            metadata_df = metadata_df.astype(METADATA_DTYPES).set_axis(
+                row_labels[kept_rows]
+            )
+
+        with profile_stage("read dates", report_stage):
+            values = raw_df.iloc[header_rows:, len(METADATA_COLUMNS) :].to_numpy(
+                dtype=float
+            )
+            # Float dates come as a read-only view of raw_df, which stays as is
+            if not values.flags.writeable:
+                values = values.copy()
+            values = _compact_rows(values, kept_rows)
+
+        # Fill missing values left to right, only dates can still be missing here
+        with profile_stage("forward fill", report_stage):
+            forward_fill(values, inplace=True)
+
+        with profile_stage("fix datatypes", report_stage):
+            if np.isnan(values).any():
+                raise ValueError("Cannot convert dates missing before any report")
+            dates_df = pd.DataFrame(
+                values.astype(date_dtype),
+                index=metadata_df.index,
+                columns=date_labels,
+                copy=False,
+            )
+            cleaned_df = pd.concat([metadata_df, dates_df], axis=1, copy=False)
+
+        return cleaned_df
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
 
-        cleaned_df = replace_empty_province(raw_df)
-        cleaned_df = drop_non_existing_provinces(cleaned_df)
 
-        # Drop rows where Lat or Long are NaN, these rows are non-significant
-        cleaned_df.dropna(inplace=True, subset=["Lat", "Long"])
+def parse_date_columns(date_labels):
+    """
+    Takes in "m/d/yy" date column labels and parses them into dates
 
-        # Fill missing values left to right
-        cleaned_df = cleaned_df.ffill(axis=1)
+    Parameters:
+        date_labels: Date column labels of a wide DataFrame
 
-        cleaned_df = drop_non_existing_provinces(cleaned_df)
-        return fix_datatypes(cleaned_df)
-    except Exception as err:
-        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
+    Returns:
+        dates: DatetimeIndex of the labels
+    """
+    return pd.to_datetime(date_labels, format="%m/%d/%y")
 
 
-def transform_from_wide_to_long(wide_df, data_type):
+def transform_from_wide_to_long(wide_df, data_type, categorical=True):
     """
     Takes in any clean dataframe and converts the dataset from wide to
     long format
 
+    The rows come out in the order pd.melt gives them, date by date with every
+    region under each date. The date header is parsed once and repeated, and
+    the values are the date block read column by column, so no melted row is
+    parsed or copied on its own.
+
     Parameters:
         wide_df: DataFrame in wide format
         data_type: DatasetType enum value
+        categorical: Whether Province/State and Country/Region become
+            categoricals instead of keeping the dtype of wide_df
 
     Returns:
         long_df: DataFrame in long format
     """
     try:
-        if data_type == DatasetType.DEATHS:
-            value_column_title = "Deaths"
-        elif data_type == DatasetType.CONFIRMED_CASES:
-            value_column_title = "Confirmed Cases"
-        elif data_type == DatasetType.RECOVERED:
-            value_column_title = "Recovered"
-
-        long_df = pd.melt(
-            wide_df,
-            id_vars=["Province/State", "Country/Region", "Lat", "Long"],
-            var_name="Date",
-            value_name=value_column_title,
+        value_column_title = VALUE_COLUMN_TITLES[data_type]
+
+        date_labels = get_date_columns(wide_df)
+        dates = parse_date_columns(date_labels)
+        region_positions = np.tile(np.arange(len(wide_df)), len(dates))
+
+        long_columns = {}
+        for column in METADATA_COLUMNS:
+            values = wide_df[column].array
+            if categorical and column in ["Province/State", "Country/Region"]:
+                values = pd.Categorical(values)
+            long_columns[column] = values.take(region_positions)
+
+        long_columns["Date"] = dates.repeat(len(wide_df))
+        long_columns[value_column_title] = wide_df[date_labels].to_numpy().ravel(
+            order="F"
         )
-        long_df["Date"] = pd.to_datetime(long_df["Date"], format="%m/%d/%y")
 
-        return long_df
+        return pd.DataFrame(long_columns)
     except Exception as err:
         logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
 
 
+def aggregate_countries(cleaned_df):
+    """
+    Takes in any clean dataframe and sums the date columns of its regions up
+    to their countries. Regions are grouped by integer country codes and summed
+    with one np.add.reduceat over the date block.
+
+    Parameters:
+        cleaned_df: Cleaned DataFrame in wide format
+
+    Returns:
+        countries: Sorted Index of the country names
+        totals: int64 array of shape (country, date) of the country totals
+    """
+    codes, countries = pd.factorize(cleaned_df["Country/Region"], sort=True)
+    values = cleaned_df[get_date_columns(cleaned_df)].to_numpy()
+
+    # Rows of one country must be contiguous for reduceat, they usually already are
+    if (np.diff(codes) < 0).any():
+        order = np.argsort(codes, kind="stable")
+        codes, values = codes[order], values[order]
+
+    starts = np.searchsorted(codes, np.arange(len(countries)))
+    totals = np.add.reduceat(values, starts, axis=0, dtype=np.int64)
+
+    return pd.Index(countries, name="Country/Region"), totals
+
+
+@dataclass(frozen=True)
+class CountryGrid:
+    """
+    Country totals of the confirmed, deaths and recovered datasets aligned on
+    one country x date grid, which is what merge_datasets merges. The long
+    merged frame is only built by to_long.
+
+    Attributes:
+        countries: Sorted Index of the countries found in all three datasets
+        dates: Sorted DatetimeIndex of the dates found in all three datasets
+        values: Dict of "Confirmed Cases", "Deaths" and "Recovered" to their
+            array of shape (country, date)
+    """
+
+    countries: pd.Index
+    dates: pd.DatetimeIndex
+    values: dict
+
+    def to_long(self):
+        """
+        Returns the grid as the merged DataFrame, one row per country and date
+        sorted by country and then date.
+        """
+        return pd.DataFrame(
+            {
+                "Country/Region": self.countries.array.take(
+                    np.arange(len(self.countries)).repeat(len(self.dates))
+                ),
+                "Date": np.tile(self.dates, len(self.countries)),
+                **{title: values.ravel() for title, values in self.values.items()},
+            }
+        )
+
+
+def build_country_grid(deaths_cleaned, confirmed_cases_cleaned, recovered_cleaned):
+    """
+    Takes in any clean dataframes of deaths, confirmed, and recovered cases,
+    sums each of them up to countries once and aligns the three on the
+    countries and dates they share
+
+    Parameters:
+        deaths_cleaned: Deaths DataFrame in wide format
+        confirmed_cases_cleaned: Confirmed Cases DataFrame in wide format
+        recovered_cleaned: Recovered Cases DataFrame in wide format
+
+    Returns:
+        country_grid: CountryGrid of the three datasets
+    """
+    cleaned_dfs = {
+        "Confirmed Cases": confirmed_cases_cleaned,
+        "Deaths": deaths_cleaned,
+        "Recovered": recovered_cleaned,
+    }
+
+    aggregated = {}
+    for title, cleaned_df in cleaned_dfs.items():
+        countries, totals = aggregate_countries(cleaned_df)
+        dates = parse_date_columns(get_date_columns(cleaned_df))
+        aggregated[title] = (countries, dates, totals)
+
+    # Keep what all three have, as inner merges on country and date would
+    shared_countries, shared_dates, _ = aggregated["Confirmed Cases"]
+    for countries, dates, _ in aggregated.values():
+        shared_countries = shared_countries[shared_countries.isin(countries)]
+        shared_dates = shared_dates[shared_dates.isin(dates)]
+    shared_dates = shared_dates.sort_values()
+
+    values = {}
+    for title, (countries, dates, totals) in aggregated.items():
+        grid_totals = totals[
+            np.ix_(
+                countries.get_indexer(shared_countries),
+                dates.get_indexer(shared_dates),
+            )
+        ]
+
+        # Keep the dtype of the date columns, as a groupby sum would, if it fits
+        date_dtype = cleaned_dfs[title][get_date_columns(cleaned_dfs[title])].dtypes
+        date_dtype = np.result_type(*date_dtype)
+        if grid_totals.size and grid_totals.max() <= np.iinfo(date_dtype).max:
+            grid_totals = grid_totals.astype(date_dtype)
+        values[title] = grid_totals
+
+    return CountryGrid(countries=shared_countries, dates=shared_dates, values=values)
+
+
 def merge_datasets(deaths_cleaned, confirmed_cases_cleaned, recovered_cleaned):
     """
     Takes in any clean dataframes of deaths, confirmed, and recovered cases
-    and converts the datasets from wide to long format and merge them
+    and merges them into one long dataframe of country totals per date. The
+    totals are aggregated on the wide date blocks by build_country_grid, and
+    only the merged frame is built in long format.
 
     Parameters:
         deaths_cleaned: Deaths DataFrame in wide format
@@ -155,35 +391,8 @@ def merge_datasets(deaths_cleaned, confirmed_cases_cleaned, recovered_cleaned):
         merged_df: DataFrame built by merging them
     """
     try:
-        confirmed_cases_long = transform_from_wide_to_long(
-            confirmed_cases_cleaned, DatasetType.CONFIRMED_CASES
-        )
-        deaths_long = transform_from_wide_to_long(deaths_cleaned, DatasetType.DEATHS)
-        recovered_long = transform_from_wide_to_long(
-            recovered_cleaned, DatasetType.RECOVERED
-        )
-
-        confirmed_cases_grouped = (
-            confirmed_cases_long.groupby(["Country/Region", "Date"])["Confirmed Cases"]
-            .sum()
-            .reset_index()
-        )
-        deaths_grouped = (
-            deaths_long.groupby(["Country/Region", "Date"])["Deaths"]
-            .sum()
-            .reset_index()
-        )
-        recovered_grouped = (
-            recovered_long.groupby(["Country/Region", "Date"])["Recovered"]
-            .sum()
-            .reset_index()
-        )
-
-        merged_df = confirmed_cases_grouped.merge(
-            deaths_grouped, on=["Country/Region", "Date"]
-        )
-        merged_df = merged_df.merge(recovered_grouped, on=["Country/Region", "Date"])
-
-        return merged_df
+        return build_country_grid(
+            deaths_cleaned, confirmed_cases_cleaned, recovered_cleaned
+        ).to_long()
     except Exception as err:
         logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
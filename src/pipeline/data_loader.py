@@ -1,26 +1,258 @@
 import io
+import os
+import re
+import csv
+import json
+import hashlib
+import tempfile
+from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import streamlit as st
 
 from src.logger.logger import logger
+from src.utils.constants import CACHE_DIR
+from src.utils.utils import timer
+
+PLACEHOLDER_COLUMN_PATTERN = re.compile(r"Column\d+")
+METADATA_ARROW_TYPES = {
+    "Province/State": pa.dictionary(pa.int32(), pa.string()),
+    "Country/Region": pa.dictionary(pa.int32(), pa.string()),
+    "Lat": pa.float64(),
+    "Long": pa.float64(),
+}
+
+
+def _file_fingerprint(path):
+    """
+    Takes a file path and returns the cheap part of its cache key.
+
+    Parameters:
+        path: Path of the source file
+
+    Returns:
+        fingerprint: Dict with the file size and modification time in nanoseconds
+    """
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _content_hash(path):
+    """
+    Takes a file path and returns the sha256 hex digest of its contents.
+
+    Parameters:
+        path: Path of the source file
+
+    Returns:
+        digest: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _cache_paths(path, cache_dir, typed=False):
+    """
+    Takes the source csv path and returns where its cached copy and metadata live.
+    The absolute source path and the parse mode are hashed into the name so that
+    csv files with the same name in different directories, or the same csv read
+    raw and typed, never share a cache entry.
+
+    Parameters:
+        path: Path of the source csv
+        cache_dir: Directory holding the cache files
+        typed: Whether the cache entry holds the read_typed_csv parse
+
+    Returns:
+        data_path, meta_path: Paths of the feather file and of its json metadata
+    """
+    source = f"{path.resolve()}:typed" if typed else str(path.resolve())
+    source_key = hashlib.sha1(source.encode()).hexdigest()[:8]
+    base = Path(cache_dir) / f"{path.stem}-{source_key}"
+
+    return base.with_suffix(".feather"), base.with_suffix(".json")
+
+
+def _read_cache_meta(meta_path):
+    try:
+        with open(meta_path, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _atomic_write(target, write):
+    """
+    Calls write(tmp_path) on a temporary file next to target and then moves it
+    into place, so concurrent readers never see a half written cache file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_cache_meta(meta_path, meta):
+    def write(tmp_path):
+        with open(tmp_path, "w") as file:
+            json.dump(meta, file)
+
+    _atomic_write(meta_path, write)
+
+
+def _is_placeholder_header(columns):
+    return all(PLACEHOLDER_COLUMN_PATTERN.fullmatch(column) for column in columns)
+
+
+def read_csv_header(path):
+    """
+    Takes the location of a dataset csv and reads only its header. When the
+    first row is a placeholder "Column1,Column2,..." header, the real header
+    is taken from the second row.
+
+    Parameters:
+        path: Location of your csv data file
+
+    Returns:
+        header: List of column labels
+        skip_rows: Number of placeholder rows before the header
+    """
+    with open(path, "r", encoding="utf-8-sig") as file:
+        header = next(csv.reader(file))
+        if _is_placeholder_header(header):
+            return next(csv.reader(file)), 1
+
+    return header, 0
+
+
+def read_typed_csv(path, columns=None):
+    """
+    Takes the location of a dataset csv and parses it straight into its final
+    layout with pyarrow, see read_csv_header for how the header is found.
+    Province/State and Country/Region become categoricals, Lat/Long floats, and
+    date columns int32. Date columns with missing cells come out as float64
+    until they are imputed.
+
+    Parameters:
+        path: Location of your csv data file
+        columns: Optional list of the only columns to convert
+
+    Returns:
+        df: Typed DataFrame of the csv
+    """
+    header, skip_rows = read_csv_header(path)
+
+    column_types = {column: pa.int32() for column in header}
+    column_types.update(METADATA_ARROW_TYPES)
+
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(skip_rows=skip_rows),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types,
+            strings_can_be_null=True,
+            include_columns=columns,
+        ),
+    )
+
+    return table.to_pandas()
+
+
+def read_csv_cached(path, cache_dir=CACHE_DIR, typed=False):
+    """
+    Takes the location of a csv file and returns its dataframe, reading it from a
+    feather (Arrow IPC) copy in cache_dir whenever the csv has not changed since
+    the copy was written. The cache key is the size, modification time and sha256 of the csv;
+    when only the modification time differs the contents are hashed, and a
+    matching hash refreshes the key instead of rebuilding the cache.
+
+    Parameters:
+        path: Location of your csv data file
+        cache_dir: Directory holding the cache files
+        typed: Whether to parse the csv with read_typed_csv instead of pd.read_csv
+
+    Returns:
+        df: Dataframe of the loaded csv
+        cache_hit: True if df was read from the cache, False if the csv was parsed
+    """
+    path = Path(path)
+    data_path, meta_path = _cache_paths(path, cache_dir, typed)
+    fingerprint = _file_fingerprint(path)
+    meta = _read_cache_meta(meta_path)
+    content_hash = None
+
+    if meta is not None and data_path.exists():
+        is_fresh = all(meta.get(key) == value for key, value in fingerprint.items())
+        if not is_fresh:
+            content_hash = _content_hash(path)
+            is_fresh = meta.get("sha256") == content_hash
+            if is_fresh:
+                _write_cache_meta(meta_path, {**fingerprint, "sha256": content_hash})
+
+        if is_fresh:
+            try:
+                return pd.read_feather(data_path), True
+            except Exception as err:
+                logger.warning(f"Ignoring unreadable cache file {data_path}: {err}")
+
+    df = read_typed_csv(path) if typed else pd.read_csv(path)
+
+    try:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        _atomic_write(
+            data_path,
+            lambda tmp_path: df.to_feather(tmp_path, compression="uncompressed"),
+        )
+        _write_cache_meta(
+            meta_path, {**fingerprint, "sha256": content_hash or _content_hash(path)}
+        )
+    except OSError as err:
+        logger.warning(f"Could not write cache for {path}: {err}")
+
+    return df, False
 
 
 @st.cache_data
-def load_data(path):
+def load_data(path, use_cache=True, typed=False):
     """
     Takes the location of the csv file and returns a dataframe of the csv file provided.
+    Unless use_cache is False the csv is read through an on-disk feather cache
+    (see read_csv_cached), which survives server restarts and is shared by replicas.
+    With typed=True the csv is parsed by read_typed_csv, so the header row is
+    already fixed and every column already has a compact dtype.
 
     Parameters:
         path: Location of your csv data file
+        use_cache: Whether to read through the on-disk cache
+        typed: Whether to parse the csv into typed columns
 
     Returns:
         df: Dataframe of the loaded csv
     """
     try:
-        df = pd.read_csv(path)
+        with timer() as timing:
+            if use_cache:
+                df, cache_hit = read_csv_cached(path, typed=typed)
+            elif typed:
+                df, cache_hit = read_typed_csv(path), False
+            else:
+                df, cache_hit = pd.read_csv(path), False
 
-        logger.info(f"Successfully loaded data for file: {path}")
+        load_kind = "warm (cache)" if cache_hit else "cold (csv)"
+        logger.info(
+            f"Successfully loaded data for file: {path}, "
+            f"{load_kind} load took {timing['seconds'] * 1000:.1f} ms"
+        )
         return df
     except FileNotFoundError:
         logger.error(f"The file at {path} was not found")
@@ -28,6 +260,41 @@ def load_data(path):
         logger.error(f"An unexcected error occured while loading {path} file: {err}")
 
 
+def get_dataset_version(paths):
+    """
+    Takes the locations of dataset csv files and returns a version string that
+    changes whenever the contents of any of them change.
+
+    Parameters:
+        paths: Locations of your csv data files
+
+    Returns:
+        version: sha256 hex digest over the contents of all files
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(_content_hash(Path(path)).encode())
+
+    return digest.hexdigest()
+
+
+def get_dataset_fingerprint(paths):
+    """
+    Takes the locations of dataset csv files and returns a key that changes
+    whenever any of them is rewritten. Unlike get_dataset_version only the file
+    metadata is read, so it is cheap enough to check on every rerun.
+
+    Parameters:
+        paths: Locations of your csv data files
+
+    Returns:
+        fingerprint: Tuple of the path, size and modification time of each file
+    """
+    return tuple(
+        (str(path), *_file_fingerprint(Path(path)).values()) for path in paths
+    )
+
+
 def get_dataset_info(df):
     """
     Takes in a dataframe and returns its .info() in string.
@@ -0,0 +1,191 @@
+import weakref
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class DateIndex:
+    """
+    Rows of a long or merged frame kept sorted by (country, date), so that a
+    date range of every country is found with a binary search and the last
+    value of a period is read from the boundary offsets of that range, without
+    comparing or sorting the Date column per query.
+
+    Attributes:
+        countries: Array of country names, one per run of sorted rows
+        by_name: Positions of the runs in country name order, as groupby sorts
+        dates: Sorted unique dates of the frame
+        keys: Sorted int64 keys of the rows, run * len(dates) + date position
+        order: Frame positions of the sorted rows, None when the frame is
+            already sorted by (country, date)
+    """
+
+    countries: np.ndarray
+    by_name: np.ndarray
+    dates: pd.DatetimeIndex
+    keys: np.ndarray
+    order: np.ndarray
+
+    def frame_positions(self, sorted_positions):
+        """
+        Returns the frame positions of rows given by their sorted positions.
+        """
+        if self.order is None:
+            return sorted_positions
+
+        return self.order[sorted_positions]
+
+    def _offsets(self, date_positions):
+        """
+        Returns, for every run, the sorted position of its first row at or
+        after each of the given date positions.
+        """
+        bases = np.arange(len(self.countries), dtype=np.int64) * len(self.dates)
+        return self.keys.searchsorted(bases[:, None] + date_positions)
+
+    def range_offsets(self, start=None, end=None):
+        """
+        Takes an inclusive date range, where None leaves that side open, and
+        returns the first and stop sorted positions of the range in every run.
+        """
+        first = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start))
+        last = (
+            len(self.dates)
+            if end is None
+            else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        )
+        offsets = self._offsets(np.array([first, last]))
+
+        return offsets[:, 0], offsets[:, 1]
+
+    def last_in_range(self, start=None, end=None):
+        """
+        Returns the frame positions of the last row of every country in the
+        date range, in country name order, skipping countries without rows in it.
+        """
+        starts, stops = self.range_offsets(start, end)
+        runs = self.by_name[(stops > starts)[self.by_name]]
+
+        return self.frame_positions(stops[runs] - 1)
+
+    def last_in_buckets(self, boundaries, countries=None):
+        """
+        Takes the date positions where consecutive buckets start, followed by
+        the position after the last one, and returns the frame positions of
+        the last row of the given countries, or of every country, in every
+        bucket, ordered by country name and then date, skipping empty buckets.
+        """
+        runs = self.by_name
+        if countries is not None:
+            runs = runs[np.isin(self.countries[runs], list(countries))]
+        if len(runs) == 0 or len(self.dates) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        offsets = self._offsets(np.asarray(boundaries))[runs]
+        non_empty = offsets[:, 1:] > offsets[:, :-1]
+
+        return self.frame_positions(offsets[:, 1:][non_empty] - 1)
+
+
+def build_date_index(df):
+    """
+    Takes in a long or merged dataframe and builds its DateIndex. Frames that
+    are already sorted by country and date, like the merged dataset, are used
+    as they are, any other row order is sorted once here.
+
+    Parameters:
+        df: DataFrame with Country/Region and Date columns
+
+    Returns:
+        date_index: DateIndex of df
+    """
+    codes, countries = pd.factorize(df["Country/Region"].to_numpy(dtype=object))
+    dates, date_positions = np.unique(
+        df["Date"].to_numpy(dtype="datetime64[ns]"), return_inverse=True
+    )
+    keys = codes.astype(np.int64) * len(dates) + date_positions
+
+    order = None
+    if np.any(keys[1:] < keys[:-1]):
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+
+    return DateIndex(
+        countries=np.asarray(countries, dtype=object),
+        by_name=np.argsort(countries, kind="stable"),
+        dates=pd.DatetimeIndex(dates),
+        keys=keys,
+        order=order,
+    )
+
+
+_DATE_INDEXES = {}
+# Streamlit runs every session in its own thread. The lock is reentrant as a
+# frame collected while it is held runs its finalizer in the same thread
+_DATE_INDEXES_LOCK = threading.RLock()
+
+
+def _forget_date_index(key):
+    """
+    Drops the DateIndex cached for the frame with the given id.
+    """
+    with _DATE_INDEXES_LOCK:
+        _DATE_INDEXES.pop(key, None)
+
+
+def _is_current(df, date_index):
+    """
+    Checks in O(1) that the first and last sorted row of an index are still
+    where it put them, which catches frames reordered or resized since.
+    """
+    if len(df) != len(date_index.keys):
+        return False
+    if len(df) == 0:
+        return True
+
+    frame_positions = date_index.frame_positions(np.array([0, len(df) - 1]))
+    sorted_keys = date_index.keys[[0, -1]]
+    countries = date_index.countries[sorted_keys // len(date_index.dates)]
+    dates = date_index.dates[sorted_keys % len(date_index.dates)]
+
+    return all(
+        df["Country/Region"].iat[position] == country
+        and df["Date"].iat[position] == date
+        for position, country, date in zip(frame_positions, countries, dates)
+    )
+
+
+def get_date_index(df):
+    """
+    Takes in a long or merged dataframe and returns its DateIndex, built on
+    the first call for that frame and kept until it is garbage collected.
+
+    The frame must not be modified in place once indexed, as the datasets of
+    the data context never are. Only its size and its first and last sorted
+    rows are checked on every call, which catches frames reordered or resized
+    since, not a country or date changed in between.
+
+    Parameters:
+        df: DataFrame with Country/Region and Date columns
+
+    Returns:
+        date_index: DateIndex of df
+    """
+    key = id(df)
+    with _DATE_INDEXES_LOCK:
+        date_index = _DATE_INDEXES.get(key)
+    if date_index is not None and _is_current(df, date_index):
+        return date_index
+
+    # Built outside the lock, a thread building the same index meanwhile only
+    # costs the time of building it twice
+    date_index = build_date_index(df)
+    with _DATE_INDEXES_LOCK:
+        if key not in _DATE_INDEXES:
+            weakref.finalize(df, _forget_date_index, key)
+        _DATE_INDEXES[key] = date_index
+
+    return date_index
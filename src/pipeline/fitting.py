@@ -0,0 +1,286 @@
+import os
+import atexit
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.logger.logger import logger
+from src.utils.enums import DatasetType
+from src.pipeline.result_cache import memoize
+
+FIT_COLUMNS = [
+    "Capacity",
+    "Growth Rate",
+    "Midpoint",
+    "Doubling Time",
+    "RMSE",
+    "Converged",
+]
+FIT_MAX_ITERATIONS = 200
+FIT_TOLERANCE = 1e-10
+FIT_CHUNK_SIZE = 16
+
+# Worker pools by number of workers, kept for the life of the process so the
+# workers are started once and not on every fit
+_EXECUTORS = {}
+
+
+def _logistic(x, parameters):
+    """
+    Returns the logistic curve capacity / (1 + exp(-rate * (x - midpoint)))
+    at x and its Jacobian with respect to the three parameters.
+    """
+    capacity, rate, midpoint = parameters
+    exponentials = np.exp(np.clip(-rate * (x - midpoint), -50, 50))
+    denominators = 1 + exponentials
+
+    values = capacity / denominators
+    slopes = capacity * exponentials / denominators**2
+    jacobian = np.column_stack(
+        [1 / denominators, slopes * (x - midpoint), -slopes * rate]
+    )
+
+    return values, jacobian
+
+
+def fit_logistic(series):
+    """
+    Takes in a cumulative series and fits a logistic growth curve to it by
+    Levenberg-Marquardt least squares. The series and the day axis are scaled
+    to [0, 1] for the fit and the parameters scaled back.
+
+    Parameters:
+        series: 1-D array of cumulative counts, one per day
+
+    Returns:
+        fit: Tuple of the capacity, the growth rate per day, the midpoint in
+            days from the first day, the doubling time in days of the early
+            exponential growth, the root mean squared error and whether the fit
+            converged, NaN and False for a series without any count
+    """
+    series = np.asarray(series, dtype=np.float64)
+    scale = series.max() if len(series) > 0 else 0.0
+    if not scale > 0:
+        return (np.nan,) * 5 + (False,)
+
+    days = len(series)
+    x = np.arange(days) / days
+    y = series / scale
+
+    # Start from a curve that reaches the last count and is halfway up where
+    # the series is
+    parameters = np.array([1.0, 10.0, x[np.argmax(y >= y[-1] / 2)]])
+    values, jacobian = _logistic(x, parameters)
+    residuals = y - values
+    error = residuals @ residuals
+    damping = 1e-3
+    converged = False
+
+    for _ in range(FIT_MAX_ITERATIONS):
+        normal = jacobian.T @ jacobian
+        try:
+            step = np.linalg.solve(
+                normal + damping * np.diag(np.diag(normal) + 1e-12),
+                jacobian.T @ residuals,
+            )
+        except np.linalg.LinAlgError:
+            break
+
+        candidate = parameters + step
+        candidate[:2] = np.maximum(candidate[:2], 1e-9)
+        candidate_values, candidate_jacobian = _logistic(x, candidate)
+        candidate_residuals = y - candidate_values
+        candidate_error = candidate_residuals @ candidate_residuals
+
+        if candidate_error < error:
+            improvement = error - candidate_error
+            parameters, jacobian, residuals, error = (
+                candidate,
+                candidate_jacobian,
+                candidate_residuals,
+                candidate_error,
+            )
+            damping = max(damping / 10, 1e-12)
+            if improvement <= FIT_TOLERANCE * max(error, FIT_TOLERANCE):
+                converged = True
+                break
+        else:
+            damping *= 10
+            # No step lowers the error any more, the fit stalled
+            if damping > 1e12:
+                break
+
+    capacity, rate, midpoint = parameters
+    rate_per_day = rate / days
+
+    return (
+        capacity * scale,
+        rate_per_day,
+        midpoint * days,
+        np.log(2) / rate_per_day,
+        np.sqrt(error / days) * scale,
+        converged,
+    )
+
+
+def _fit_rows(block, rows):
+    """
+    Fits every row of a block given by its position.
+    """
+    return [fit_logistic(block[row]) for row in rows]
+
+
+def _fit_shared_rows(name, shape, dtype, rows):
+    """
+    Runs in a worker: attaches to the shared memory block of the series and
+    fits the given rows of it, without the series being pickled to the worker.
+    """
+    shared_memory = SharedMemory(name=name)
+    try:
+        block = np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf)
+        fits = _fit_rows(block, rows)
+        del block
+    finally:
+        shared_memory.close()
+
+    return fits
+
+
+def _get_executor(max_workers):
+    """
+    Returns the process-wide pool of max_workers workers, started on first use.
+    Workers are spawned, as forking a process that runs threads, like a
+    Streamlit server, is not safe.
+    """
+    if max_workers not in _EXECUTORS:
+        _EXECUTORS[max_workers] = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=get_context("spawn")
+        )
+
+    return _EXECUTORS[max_workers]
+
+
+@atexit.register
+def _shutdown_executors():
+    """
+    Shuts the worker pools down when the process exits.
+    """
+    for executor in _EXECUTORS.values():
+        executor.shutdown(cancel_futures=True)
+    _EXECUTORS.clear()
+
+
+def fit_block(block, max_workers=None, chunk_size=FIT_CHUNK_SIZE):
+    """
+    Takes in a block of cumulative series, one per row, and fits a logistic
+    curve to every row. With more than one worker the block is put in shared
+    memory once and the rows are fitted in chunks by a process pool.
+
+    Parameters:
+        block: 2-D array of shape (series, day)
+        max_workers: Number of worker processes, the number of CPUs when None,
+            1 fits in this process
+        chunk_size: Number of rows every work unit fits
+
+    Returns:
+        fits: List of the fit_logistic tuples of the rows, in row order
+    """
+    block = np.ascontiguousarray(block, dtype=np.float64)
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(block) <= chunk_size:
+        return _fit_rows(block, range(len(block)))
+
+    shared_memory = SharedMemory(create=True, size=max(block.nbytes, 1))
+    try:
+        shared_block = np.ndarray(
+            block.shape, dtype=block.dtype, buffer=shared_memory.buf
+        )
+        shared_block[:] = block
+        del shared_block
+
+        chunks = [
+            range(start, min(start + chunk_size, len(block)))
+            for start in range(0, len(block), chunk_size)
+        ]
+        futures = [
+            _get_executor(max_workers).submit(
+                _fit_shared_rows, shared_memory.name, block.shape, block.dtype, rows
+            )
+            for rows in chunks
+        ]
+
+        return [fit for future in futures for fit in future.result()]
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+
+@memoize(ignore=("max_workers",))
+def fit_country_curves(
+    rollup,
+    data_type=DatasetType.CONFIRMED_CASES,
+    start=None,
+    end=None,
+    max_workers=None,
+):
+    """
+    Takes in a rollup and fits a logistic growth curve to the cumulative
+    counts of every country over a date range, in parallel. Results are cached
+    by dataset version like the analyzers, whatever the number of workers.
+
+    Parameters:
+        rollup: Rollup of the cleaned datasets
+        data_type: DatasetType of the counts to fit
+        start: First date of the range, None starts at the first date
+        end: Last date of the range, None ends at the last date
+        max_workers: Number of worker processes, see fit_block
+
+    Returns:
+        fits: DataFrame with one row per country: Country/Region, the capacity,
+            the growth rate per day, the date of the midpoint, the doubling
+            time in days, the RMSE and whether the fit converged
+    """
+    try:
+        first = 0 if start is None else rollup.dates.searchsorted(pd.Timestamp(start))
+        stop = (
+            len(rollup.dates)
+            if end is None
+            else rollup.dates.searchsorted(pd.Timestamp(end), side="right")
+        )
+        block = rollup.metric("country", data_type)[:, first:stop]
+
+        fits = pd.DataFrame(
+            fit_block(block, max_workers), columns=FIT_COLUMNS
+        ).astype({"Converged": bool})
+        fits["Midpoint"] = rollup.dates[first] + pd.to_timedelta(
+            fits["Midpoint"].round(), unit="D"
+        )
+        fits.insert(0, "Country/Region", rollup.labels("country"))
+
+        return fits
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
+
+
+def logistic_curve(fit, dates):
+    """
+    Takes in one row of fit_country_curves and returns its fitted logistic
+    curve at the given dates.
+
+    Parameters:
+        fit: Row of the DataFrame returned by fit_country_curves
+        dates: DatetimeIndex to evaluate the curve at
+
+    Returns:
+        curve: Array of fitted cumulative counts, one per date
+    """
+    days = (dates - fit["Midpoint"]) / pd.Timedelta(days=1)
+    values, _ = _logistic(
+        np.asarray(days, dtype=np.float64),
+        (fit["Capacity"], fit["Growth Rate"], 0.0),
+    )
+
+    return values
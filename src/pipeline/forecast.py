@@ -0,0 +1,325 @@
+from statistics import NormalDist
+from types import MappingProxyType
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+from src.logger.logger import logger
+from src.pipeline.cube import CUBE_METRICS
+
+FORECAST_HORIZONS = (7, 14, 28)
+# Smoothing parameters of the level and the trend every series is smoothed
+# with, the pair with the smallest one day ahead errors is the one forecast
+SMOOTHING_LEVELS = (0.2, 0.4, 0.6, 0.8, 1.0)
+SMOOTHING_TRENDS = (0.0, 0.05, 0.1, 0.2)
+
+
+@dataclass(frozen=True)
+class SmoothingState:
+    """
+    State of Holt's linear exponential smoothing of every series of a level,
+    for every pair of smoothing parameters at once, so a new date only needs
+    one more smoothing step.
+
+    Attributes:
+        level: Array of shape (pair, unit, metric) of the smoothed levels
+        trend: Array of shape (pair, unit, metric) of the smoothed trends
+        errors: Array of shape (pair, unit, metric) of the summed squared
+            one day ahead errors
+        steps: Number of one day ahead errors summed
+    """
+
+    level: np.ndarray
+    trend: np.ndarray
+    errors: np.ndarray
+    steps: int
+
+
+@dataclass(frozen=True)
+class LevelForecasts:
+    """
+    Forecasts of the cumulative counts of every unit of one rollup level.
+
+    Attributes:
+        labels: Index of the units of the level, in the rollup's order
+        mean: Read-only array of shape (unit, horizon, metric) of the forecasts
+        lower: Read-only array of the lower bounds of the prediction intervals
+        upper: Read-only array of the upper bounds of the prediction intervals
+        state: SmoothingState the forecasts were made from
+    """
+
+    labels: pd.Index
+    mean: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    state: SmoothingState
+
+
+@dataclass(frozen=True)
+class Forecasts:
+    """
+    Forecasts of the cumulative confirmed cases, deaths and recoveries of every
+    unit of some rollup levels a number of days after the last date, with
+    prediction intervals. Holt's linear exponential smoothing models the log
+    of the trailing window average of the daily new cases, of every unit and
+    metric at once.
+
+    Attributes:
+        dates: DatetimeIndex of the date axis the forecasts were made from
+        horizons: Days after the last date of every forecast
+        window: Number of days the daily new cases are averaged over
+        coverage: Probability every prediction interval is meant to cover
+        levels: Read-only mapping of rollup level name to its LevelForecasts
+    """
+
+    dates: pd.DatetimeIndex
+    horizons: tuple
+    window: int
+    coverage: float
+    levels: MappingProxyType
+
+    def frame(self, level, data_type):
+        """
+        Returns the forecasts of one dataset at a level as a DataFrame with one
+        row per unit and horizon.
+        """
+        level_forecasts = self.levels[level]
+        position = CUBE_METRICS.index(data_type)
+        units, horizons = len(level_forecasts.labels), len(self.horizons)
+
+        frame = level_forecasts.labels.to_frame(index=False).loc[
+            np.arange(units).repeat(horizons)
+        ]
+        frame["Horizon"] = np.tile(self.horizons, units)
+        frame["Date"] = self.dates[-1] + pd.to_timedelta(frame["Horizon"], unit="D")
+        for column, values in [
+            ("Forecast", level_forecasts.mean),
+            ("Lower", level_forecasts.lower),
+            ("Upper", level_forecasts.upper),
+        ]:
+            frame[column] = values[:, :, position].ravel()
+
+        return frame.reset_index(drop=True)
+
+
+def log_window_means(values, window=7, first=None):
+    """
+    Takes in cumulative counts and returns the log of one plus the average
+    daily new cases of the trailing window of every date. Downward corrections
+    of a count are taken as no new cases.
+
+    Parameters:
+        values: Array of shape (unit, date, metric) of cumulative counts
+        window: Number of days averaged
+        first: First date to return, None starts at the first full window
+
+    Returns:
+        series: Float array of shape (unit, date, metric) from the first date
+    """
+    first = window if first is None else max(first, window)
+    values = np.asarray(values, dtype=np.float64)
+    new_cases = values[:, first:] - values[:, first - window : values.shape[1] - window]
+
+    return np.log1p(np.maximum(new_cases, 0) / window)
+
+
+def _smoothing_parameters():
+    """
+    Returns the smoothing parameters of the level and the trend of every pair,
+    shaped (pair, 1, 1) to broadcast over the units and metrics.
+    """
+    levels, trends = np.meshgrid(SMOOTHING_LEVELS, SMOOTHING_TRENDS, indexing="ij")
+
+    return levels.reshape(-1, 1, 1), trends.reshape(-1, 1, 1)
+
+
+def smooth(state, series):
+    """
+    Takes in a smoothing state and the series of the dates after it and
+    advances every pair of smoothing parameters of every unit and metric over
+    them, one batched step per date.
+
+    Parameters:
+        state: SmoothingState of the dates before the series
+        series: Array of shape (unit, date, metric), see log_window_means
+
+    Returns:
+        state: SmoothingState after the last date of the series
+    """
+    alphas, betas = _smoothing_parameters()
+    level, trend, errors = state.level.copy(), state.trend.copy(), state.errors.copy()
+
+    for day in range(series.shape[1]):
+        expected = level + trend
+        error = series[:, day] - expected
+        errors += error**2
+        level = expected + alphas * error
+        trend += alphas * betas * error
+
+    return SmoothingState(level, trend, errors, state.steps + series.shape[1])
+
+
+def start_smoothing(series):
+    """
+    Takes in a series and smooths it from its first date, which the level
+    starts at with no trend.
+
+    Parameters:
+        series: Array of shape (unit, date, metric), see log_window_means
+
+    Returns:
+        state: SmoothingState after the last date of the series
+    """
+    pairs = len(SMOOTHING_LEVELS) * len(SMOOTHING_TRENDS)
+    level = np.repeat(series[None, :, 0], pairs, axis=0)
+    zeros = np.zeros_like(level)
+
+    return smooth(SmoothingState(level, zeros, zeros, 0), series[:, 1:])
+
+
+def _smoothing_moments(state, days):
+    """
+    Returns the forecast log means and their variances of every unit, day
+    ahead and metric from the pair of smoothing parameters with the smallest
+    one day ahead errors. The variances are those of Holt's model with
+    additive errors.
+    """
+    best = np.argmin(state.errors, axis=0)[None]
+    level, trend, errors, alpha, beta = (
+        np.take_along_axis(np.broadcast_to(values, state.errors.shape), best, 0)[0]
+        for values in (
+            state.level,
+            state.trend,
+            state.errors,
+            *_smoothing_parameters(),
+        )
+    )
+    variance = errors / max(state.steps, 1)
+
+    # The forecast h days ahead adds the errors of the h - 1 days before it,
+    # day j weighted by alpha * (1 + j * beta)
+    earlier = np.arange(1, days)[None, :, None]
+    weights = (alpha[:, None] * (1 + earlier * beta[:, None])) ** 2
+    spread = 1 + np.concatenate(
+        [np.zeros_like(weights[:, :1]), np.cumsum(weights, axis=1)], axis=1
+    )
+    ahead = np.arange(1, days + 1)[None, :, None]
+
+    return level[:, None] + ahead * trend[:, None], variance[:, None] * spread
+
+
+def _cumulative_intervals(log_means, variances, last_counts, horizons, coverage):
+    """
+    Turns forecast log window means into the cumulative counts of the horizons
+    and their prediction intervals, the daily bounds summed up so the intervals
+    hold if the days of a forecast err the same way.
+    """
+    z = NormalDist().inv_cdf((1 + coverage) / 2)
+    deviations = z * np.sqrt(variances)
+    positions = np.asarray(horizons) - 1
+
+    forecasts = []
+    for log_daily in (log_means, log_means - deviations, log_means + deviations):
+        daily = np.maximum(np.expm1(log_daily), 0)
+        cumulative = last_counts[:, None] + np.cumsum(daily, axis=1)[:, positions]
+        cumulative.flags.writeable = False
+        forecasts.append(cumulative)
+
+    return forecasts
+
+
+def _level_forecasts(labels, values, state, forecasts):
+    """
+    Makes the LevelForecasts of a level from its smoothing state.
+    """
+    log_means, variances = _smoothing_moments(state, max(forecasts.horizons))
+    mean, lower, upper = _cumulative_intervals(
+        log_means,
+        variances,
+        values[:, -1].astype(np.float64),
+        forecasts.horizons,
+        forecasts.coverage,
+    )
+
+    return LevelForecasts(labels, mean, lower, upper, state)
+
+
+def build_forecasts(
+    rollup,
+    levels=("province", "country"),
+    horizons=FORECAST_HORIZONS,
+    window=7,
+    coverage=0.95,
+):
+    """
+    Takes in a rollup and forecasts the cumulative counts of every unit of the
+    given levels the given number of days after its last date, every unit,
+    metric and pair of smoothing parameters of a level smoothed at once
+
+    Parameters:
+        rollup: Rollup of the cleaned datasets
+        levels: Names of the rollup levels to forecast
+        horizons: Days after the last date to forecast
+        window: Number of days the daily new cases are averaged over
+        coverage: Probability every prediction interval is meant to cover
+
+    Returns:
+        forecasts: Forecasts of the levels
+    """
+    try:
+        forecasts = Forecasts(
+            dates=rollup.dates,
+            horizons=tuple(horizons),
+            window=window,
+            coverage=coverage,
+            levels=MappingProxyType({}),
+        )
+
+        computed = {}
+        for level in levels:
+            values = rollup.levels[level].values
+            state = start_smoothing(log_window_means(values, window))
+            computed[level] = _level_forecasts(
+                rollup.labels(level), values, state, forecasts
+            )
+
+        return replace(forecasts, levels=MappingProxyType(computed))
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
+
+
+def extend_forecasts(forecasts, rollup):
+    """
+    Takes in forecasts and the rollup they were made from after extend_rollup
+    added dates to it, and returns the forecasts from the new last date. The
+    smoothing only steps over the new dates, not over the history again.
+
+    Parameters:
+        forecasts: Forecasts to bring up to date
+        rollup: Extended Rollup, with the same units as the forecasts
+
+    Returns:
+        extended_forecasts: Forecasts from the last date of the rollup
+    """
+    known_dates = len(forecasts.dates)
+    if len(rollup.dates) == known_dates:
+        return forecasts
+
+    extended = replace(forecasts, dates=rollup.dates)
+
+    computed = {}
+    for level, level_forecasts in forecasts.levels.items():
+        values = rollup.levels[level].values
+        if len(rollup.labels(level)) != len(level_forecasts.labels):
+            raise ValueError("The rollup has new units, the forecasts need a rebuild")
+
+        series = log_window_means(values, forecasts.window, known_dates)
+        computed[level] = _level_forecasts(
+            level_forecasts.labels,
+            values,
+            smooth(level_forecasts.state, series),
+            extended,
+        )
+
+    return replace(extended, levels=MappingProxyType(computed))
@@ -0,0 +1,180 @@
+import os
+import tempfile
+from pathlib import Path
+from types import MappingProxyType
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.logger.logger import logger
+from src.utils.constants import CACHE_DIR
+from src.pipeline.cube import CUBE_METRICS, shared_cube_directory
+
+
+@dataclass(frozen=True)
+class DailyIncrements:
+    """
+    Daily new confirmed cases, deaths and recoveries of every unit of some
+    rollup levels, diffed once so analyzers read them instead of diffing the
+    cumulative counts on every call. The first date has no previous day and
+    holds 0, the way diff().fillna(0) leaves it.
+
+    Attributes:
+        dates: DatetimeIndex of the date axis
+        levels: Read-only mapping of rollup level name to a read-only int64
+            array of shape (unit, date, metric), units in the rollup's order
+        clipped: Whether negative increments, where a dataset corrected its
+            cumulative count downwards, were clipped to 0
+    """
+
+    dates: pd.DatetimeIndex
+    levels: MappingProxyType
+    clipped: bool
+
+    def metric(self, level, data_type):
+        """
+        Returns the unit x date view of the increments of one metric at a level.
+        """
+        return self.levels[level][:, :, CUBE_METRICS.index(data_type)]
+
+
+def build_daily_increments(rollup, levels=("province", "country"), clip=False):
+    """
+    Takes in a rollup and diffs the cumulative counts of the given levels along
+    the date axis, every metric of a level in one np.diff
+
+    Parameters:
+        rollup: Rollup of the cleaned datasets
+        levels: Names of the rollup levels to diff
+        clip: Whether to clip negative increments to 0
+
+    Returns:
+        increments: DailyIncrements of the levels
+    """
+    try:
+        increments = {}
+        for level in levels:
+            values = rollup.levels[level].values.astype(np.int64)
+            level_increments = np.diff(values, axis=1, prepend=values[:, :1])
+            if clip:
+                np.maximum(level_increments, 0, out=level_increments)
+            level_increments.flags.writeable = False
+            increments[level] = level_increments
+
+        return DailyIncrements(
+            dates=rollup.dates, levels=MappingProxyType(increments), clipped=clip
+        )
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
+
+
+def extend_daily_increments(increments, rollup):
+    """
+    Takes in daily increments and the rollup they were diffed from after
+    extend_rollup added dates to it, and returns the increments with those
+    dates added. Only the new dates are diffed, against the last old date.
+
+    Parameters:
+        increments: DailyIncrements to extend
+        rollup: Extended Rollup, with the same units as the increments
+
+    Returns:
+        extended_increments: DailyIncrements covering the old and new dates
+    """
+    known_dates = len(increments.dates)
+    if len(rollup.dates) == known_dates:
+        return increments
+
+    extended = {}
+    for level, level_increments in increments.levels.items():
+        values = rollup.levels[level].values[:, known_dates - 1 :].astype(np.int64)
+        if len(values) != len(level_increments):
+            raise ValueError("The rollup has new units, the increments need a rebuild")
+
+        new_increments = np.diff(values, axis=1)
+        if increments.clipped:
+            np.maximum(new_increments, 0, out=new_increments)
+        level_values = np.concatenate([level_increments, new_increments], axis=1)
+        level_values.flags.writeable = False
+        extended[level] = level_values
+
+    return DailyIncrements(
+        dates=rollup.dates,
+        levels=MappingProxyType(extended),
+        clipped=increments.clipped,
+    )
+
+
+def _save_shared_array(array, path):
+    """
+    Writes an array to a temporary file next to path and moves it into place,
+    so a process mapping path never sees a half written file, and if another
+    process wrote it first its copy is kept.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            np.save(file, array)
+        if not path.exists():
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_shared_increments(
+    rollup,
+    version,
+    levels=("province", "country"),
+    clip=False,
+    increments=None,
+    cache_dir=CACHE_DIR,
+):
+    """
+    Returns the daily increments of a rollup memory-mapped from the directory
+    of the shared cube of its dataset version, like the cube itself, so every
+    process maps one copy through the page cache instead of diffing its own.
+    They are diffed and saved by whichever process needs them first.
+
+    Parameters:
+        rollup: Rollup of the shared cube of the version
+        version: Dataset version as returned by get_dataset_version
+        levels: Names of the rollup levels to diff
+        clip: Whether to clip negative increments to 0
+        increments: Optional DailyIncrements of the rollup already computed,
+            e.g. by extend_daily_increments, saved instead of diffing again
+        cache_dir: Directory holding the cube files
+
+    Returns:
+        increments: DailyIncrements whose levels are read-only mapped arrays
+    """
+    try:
+        directory = shared_cube_directory(version, cache_dir)
+        suffix = "-clipped" if clip else ""
+        paths = {
+            level: Path(directory) / f"increments-{level}{suffix}.npy"
+            for level in levels
+        }
+
+        missing = [level for level, path in paths.items() if not path.exists()]
+        if missing:
+            if increments is None:
+                increments = build_daily_increments(rollup, missing, clip)
+            directory.mkdir(parents=True, exist_ok=True)
+            for level in missing:
+                _save_shared_array(increments.levels[level], paths[level])
+            logger.info(f"Saved shared daily increments in {directory}")
+
+        return DailyIncrements(
+            dates=rollup.dates,
+            levels=MappingProxyType(
+                {
+                    level: np.load(path, mmap_mode="r").view(np.ndarray)
+                    for level, path in paths.items()
+                }
+            ),
+            clipped=clip,
+        )
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
@@ -0,0 +1,286 @@
+import numpy as np
+import pandas as pd
+
+from src.logger.logger import logger
+from src.utils.enums import DatasetType
+from src.utils.constants import DATASET_FILES
+from src.pipeline.cube import extend_cube
+from src.pipeline.rollup import extend_rollup
+from src.pipeline.increments import extend_daily_increments
+from src.pipeline.forecast import extend_forecasts
+from src.pipeline.long_view import LongView
+from src.pipeline.data_loader import read_csv_header, read_typed_csv
+from src.pipeline.data_cleaner import (
+    METADATA_COLUMNS,
+    get_date_columns,
+    replace_empty_province,
+    drop_non_existing_provinces,
+    transform_from_wide_to_long,
+    merge_datasets,
+)
+
+
+def _region_keys(df):
+    return pd.MultiIndex.from_arrays(
+        [
+            df["Province/State"].astype("string"),
+            df["Country/Region"].astype("string"),
+        ]
+    )
+
+
+def find_new_date_labels(path, known_date_labels):
+    """
+    Takes the location of a dataset csv and the date columns already ingested
+    from it, and returns the date columns the csv has gained since. Only the
+    header is read.
+
+    Parameters:
+        path: Location of your csv data file
+        known_date_labels: Date column labels that are already ingested
+
+    Returns:
+        new_date_labels: List of the date column labels after the known ones
+    """
+    header, _ = read_csv_header(path)
+    date_labels = header[len(METADATA_COLUMNS) :]
+    known_date_labels = list(known_date_labels)
+
+    if date_labels[: len(known_date_labels)] != known_date_labels:
+        raise ValueError(f"{path} does not extend the ingested dates, reload it fully")
+
+    return date_labels[len(known_date_labels) :]
+
+
+def append_date_columns(cleaned_df, new_raw_df):
+    """
+    Takes in a cleaned dataframe and a raw dataframe of the metadata columns
+    and the dates that come after it, cleans only the new dates the way
+    handle_missing_data does and returns cleaned_df with them appended, all
+    new columns joined at once. Missing values are forward filled from the
+    last date cleaned_df already holds. cleaned_df itself is left unchanged.
+
+    Parameters:
+        cleaned_df: Cleaned DataFrame, as returned by handle_missing_data
+        new_raw_df: Raw DataFrame of the new dates, as read by read_typed_csv
+
+    Returns:
+        extended_df: Cleaned DataFrame holding the new date columns too
+    """
+    new_df = drop_non_existing_provinces(replace_empty_province(new_raw_df))
+    new_df = new_df.dropna(subset=["Lat", "Long"])
+
+    rows = _region_keys(new_df).get_indexer(_region_keys(cleaned_df))
+    if len(new_df) != len(cleaned_df) or (rows < 0).any():
+        raise ValueError("The regions of the dataset changed, reload it fully")
+
+    date_labels = get_date_columns(cleaned_df)
+    date_dtype = cleaned_df[date_labels[-1]].dtype
+    last_values = cleaned_df[date_labels[-1]].to_numpy()
+
+    # Only the last known column is needed to forward fill the new ones
+    new_columns = {}
+    for label in get_date_columns(new_df):
+        values = new_df[label].to_numpy(dtype=float)[rows]
+        missing = np.isnan(values)
+        values[missing] = last_values[missing]
+        last_values = values.astype(date_dtype)
+        new_columns[label] = last_values
+
+    return pd.concat(
+        [cleaned_df, pd.DataFrame(new_columns, index=cleaned_df.index)], axis=1
+    )
+
+
+def extend_long(long_df, cleaned_df, new_date_labels, data_type):
+    """
+    Takes in the long format of a dataset and its cleaned dataframe that
+    already holds the new dates, and returns the long format with the rows of
+    the new dates added. Only the new dates are melted, and a LongView is just
+    rebuilt over the extended dataframe.
+
+    Parameters:
+        long_df: DataFrame in long format, as built by transform_from_wide_to_long,
+            or a LongView
+        cleaned_df: Cleaned DataFrame in wide format
+        new_date_labels: Labels of the date columns to add
+        data_type: DatasetType enum value
+
+    Returns:
+        long_df: DataFrame in long format covering the new dates
+    """
+    if isinstance(long_df, LongView):
+        return LongView.from_wide(cleaned_df, data_type)
+
+    new_long_df = transform_from_wide_to_long(
+        cleaned_df[METADATA_COLUMNS + list(new_date_labels)], data_type
+    )
+
+    # melt is date major, so the new dates simply go at the end
+    return pd.concat([long_df, new_long_df], ignore_index=True)
+
+
+def extend_merged(
+    merged_df,
+    deaths_cleaned,
+    confirmed_cases_cleaned,
+    recovered_cleaned,
+    new_date_labels,
+):
+    """
+    Takes in the merged dataset and the cleaned dataframes that already hold
+    the new dates, and returns the merged dataset with the rows of the new
+    dates added. Only the new dates are grouped and merged.
+
+    Parameters:
+        merged_df: DataFrame built by merge_datasets
+        deaths_cleaned: Deaths DataFrame in wide format
+        confirmed_cases_cleaned: Confirmed Cases DataFrame in wide format
+        recovered_cleaned: Recovered Cases DataFrame in wide format
+        new_date_labels: Labels of the date columns to add
+
+    Returns:
+        merged_df: DataFrame in the row order of merge_datasets, covering the
+            new dates
+    """
+    columns = METADATA_COLUMNS + list(new_date_labels)
+    new_merged_df = merge_datasets(
+        deaths_cleaned[columns],
+        confirmed_cases_cleaned[columns],
+        recovered_cleaned[columns],
+    )
+
+    # Both are sorted by country and then date, with every date for every
+    # country, so the new rows of each country go after its old ones
+    countries = new_merged_df["Country/Region"].unique()
+    old_dates = len(merged_df) // len(countries)
+    if len(merged_df) != len(countries) * old_dates or not np.array_equal(
+        merged_df["Country/Region"].to_numpy()[::old_dates], countries
+    ):
+        raise ValueError("The countries of the datasets changed, merge them fully")
+
+    old_order = np.arange(len(merged_df)).reshape(len(countries), -1)
+    new_order = len(merged_df) + np.arange(len(new_merged_df)).reshape(
+        len(countries), -1
+    )
+    order = np.hstack([old_order, new_order]).ravel()
+
+    return (
+        pd.concat([merged_df, new_merged_df], ignore_index=True)
+        .take(order)
+        .reset_index(drop=True)
+    )
+
+
+def ingest_new_dates(
+    cleaned_dfs,
+    long_dfs=None,
+    merged_df=None,
+    cube=None,
+    rollup=None,
+    increments=None,
+    forecasts=None,
+    dataset_files=DATASET_FILES,
+):
+    """
+    Takes in the cleaned dataframes and any outputs derived from them, checks
+    the dataset csvs for date columns appended since they were built, and
+    brings every output up to date. Only the new columns are parsed, cleaned
+    and forward filled, and the daily increments and forecasts only step over
+    the new dates. Every output is still rebuilt by copying its old data
+    next to the new columns, and finding the new columns reads every csv in
+    full. Dates are only ingested once all three csvs have them, so the
+    outputs never get out of step. The given outputs are left unchanged, so
+    they can be shared with readers while the update runs.
+
+    Parameters:
+        cleaned_dfs: Dict of DatasetType to cleaned DataFrame
+        long_dfs: Optional dict of DatasetType to DataFrame in long format
+        merged_df: Optional DataFrame built by merge_datasets
+        cube: Optional CaseCube
+        rollup: Optional Rollup of cube, which must then be given as well
+        increments: Optional DailyIncrements of rollup, which must then be
+            given as well
+        forecasts: Optional Forecasts of rollup, which must then be given as well
+        dataset_files: Dict of DatasetType to csv location
+
+    Returns:
+        ingested: Dict with the "new_dates" labels that were ingested and the
+            updated "cleaned", "long", "merged", "cube", "rollup",
+            "increments" and "forecasts" outputs
+    """
+    try:
+        new_date_labels = None
+        for data_type, cleaned_df in cleaned_dfs.items():
+            labels = find_new_date_labels(
+                dataset_files[data_type], get_date_columns(cleaned_df)
+            )
+            if new_date_labels is None or len(labels) < len(new_date_labels):
+                new_date_labels = labels
+
+        ingested = {
+            "new_dates": new_date_labels or [],
+            "cleaned": cleaned_dfs,
+            "long": long_dfs,
+            "merged": merged_df,
+            "cube": cube,
+            "rollup": rollup,
+            "increments": increments,
+            "forecasts": forecasts,
+        }
+        if not new_date_labels:
+            return ingested
+
+        cleaned_dfs = {
+            data_type: append_date_columns(
+                cleaned_df,
+                read_typed_csv(
+                    dataset_files[data_type],
+                    columns=METADATA_COLUMNS + new_date_labels,
+                ),
+            )
+            for data_type, cleaned_df in cleaned_dfs.items()
+        }
+        ingested["cleaned"] = cleaned_dfs
+
+        if long_dfs is not None:
+            ingested["long"] = {
+                data_type: extend_long(
+                    long_df, cleaned_dfs[data_type], new_date_labels, data_type
+                )
+                for data_type, long_df in long_dfs.items()
+            }
+
+        if merged_df is not None:
+            ingested["merged"] = extend_merged(
+                merged_df,
+                cleaned_dfs[DatasetType.DEATHS],
+                cleaned_dfs[DatasetType.CONFIRMED_CASES],
+                cleaned_dfs[DatasetType.RECOVERED],
+                new_date_labels,
+            )
+
+        if cube is not None:
+            columns = METADATA_COLUMNS + new_date_labels
+            ingested["cube"] = extend_cube(
+                cube,
+                cleaned_dfs[DatasetType.CONFIRMED_CASES][columns],
+                cleaned_dfs[DatasetType.DEATHS][columns],
+                cleaned_dfs[DatasetType.RECOVERED][columns],
+            )
+
+        if rollup is not None:
+            ingested["rollup"] = extend_rollup(rollup, ingested["cube"])
+
+        if increments is not None:
+            ingested["increments"] = extend_daily_increments(
+                increments, ingested["rollup"]
+            )
+
+        if forecasts is not None:
+            ingested["forecasts"] = extend_forecasts(forecasts, ingested["rollup"])
+
+        logger.info(f"Ingested {len(new_date_labels)} new dates")
+        return ingested
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+from src.pipeline.data_cleaner import (
+    METADATA_COLUMNS,
+    VALUE_COLUMN_TITLES,
+    get_date_columns,
+    parse_date_columns,
+)
+
+
+class LongView:
+    """
+    Long format view of wide numeric blocks that builds only the rows a query
+    selects. Every query returns a DataFrame with exactly the rows, columns
+    and index labels that filtering the fully built long frame would give, so
+    the result can be used the same way, but a single country costs memory in
+    the number of its regions times the dates instead of every region times
+    the dates.
+
+    Attributes:
+        metadata: DataFrame of the columns repeated for every date, one row per
+            row of the wide blocks
+        dates: Sorted DatetimeIndex of the date columns
+        values: Dict of value column title to its array of shape (row, date)
+        date_major: Whether the long rows are ordered date by date, as pd.melt
+            orders them, instead of row by row, as merge_datasets orders them
+    """
+
+    def __init__(self, metadata, dates, values, date_major=True):
+        self.metadata = metadata.reset_index(drop=True)
+        self.dates = dates
+        self.values = values
+        self.date_major = date_major
+        self._frame = None
+
+    @classmethod
+    def from_wide(cls, wide_df, data_type, categorical=True):
+        """
+        Takes in any clean dataframe and returns the view of the long frame
+        transform_from_wide_to_long would build from it.
+        """
+        metadata = wide_df[METADATA_COLUMNS]
+        if categorical:
+            metadata = metadata.astype(
+                {"Province/State": "category", "Country/Region": "category"}
+            )
+        date_labels = get_date_columns(wide_df)
+
+        return cls(
+            metadata,
+            parse_date_columns(date_labels),
+            {VALUE_COLUMN_TITLES[data_type]: wide_df[date_labels].to_numpy()},
+        )
+
+    @classmethod
+    def from_country_grid(cls, country_grid):
+        """
+        Takes in a CountryGrid and returns the view of the frame merge_datasets
+        would build from it.
+        """
+        return cls(
+            country_grid.countries.to_frame(index=False),
+            country_grid.dates,
+            country_grid.values,
+            date_major=False,
+        )
+
+    @property
+    def columns(self):
+        return pd.Index([*self.metadata.columns, "Date", *self.values])
+
+    @property
+    def shape(self):
+        return len(self), len(self.columns)
+
+    def __len__(self):
+        return len(self.metadata) * len(self.dates)
+
+    def latest_date(self):
+        """
+        Returns the last date of the view.
+        """
+        return self.dates[-1]
+
+    def filter(self, countries=None, start=None, end=None):
+        """
+        Takes country names and an inclusive date range and returns the long
+        rows that match all of them. None leaves that filter out.
+        """
+        rows = np.arange(len(self.metadata))
+        if countries is not None:
+            rows = np.flatnonzero(self.metadata["Country/Region"].isin(countries))
+
+        first = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start))
+        last = (
+            len(self.dates)
+            if end is None
+            else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        )
+
+        return self._take(rows, np.arange(first, last))
+
+    def latest(self):
+        """
+        Returns the long rows of the last date.
+        """
+        return self._take(
+            np.arange(len(self.metadata)), np.array([len(self.dates) - 1])
+        )
+
+    def groupby_country(self):
+        """
+        Yields every country name with its long rows, in sorted country order.
+        """
+        codes, names = pd.factorize(self.metadata["Country/Region"], sort=True)
+        date_positions = np.arange(len(self.dates))
+        for code, name in enumerate(names):
+            yield name, self._take(np.flatnonzero(codes == code), date_positions)
+
+    def to_frame(self):
+        """
+        Returns the whole long frame. It is built on the first call and the
+        same frame is returned afterwards, so it must not be modified.
+        """
+        if self._frame is None:
+            self._frame = self._take(
+                np.arange(len(self.metadata)), np.arange(len(self.dates))
+            ).reset_index(drop=True)
+
+        return self._frame
+
+    def _take(self, rows, date_positions):
+        """
+        Builds the long rows of the given block rows at the given date
+        positions, in the row order and with the index labels of the full frame.
+        """
+        if self.date_major:
+            index = date_positions[:, None] * len(self.metadata) + rows
+            row_positions = np.tile(rows, len(date_positions))
+            long_dates = self.dates[date_positions].repeat(len(rows))
+            order = "F"
+        else:
+            index = rows[:, None] * len(self.dates) + date_positions
+            row_positions = rows.repeat(len(date_positions))
+            long_dates = np.tile(self.dates[date_positions], len(rows))
+            order = "C"
+
+        long_columns = {
+            column: self.metadata[column].array.take(row_positions)
+            for column in self.metadata.columns
+        }
+        long_columns["Date"] = long_dates
+        for title, values in self.values.items():
+            long_columns[title] = values[np.ix_(rows, date_positions)].ravel(
+                order=order
+            )
+
+        return pd.DataFrame(long_columns, index=pd.Index(index.ravel()))
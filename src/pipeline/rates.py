@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+
+from src.logger.logger import logger
+from src.pipeline.row_index import select_countries
+from src.pipeline.data_cleaner import (
+    METADATA_COLUMNS,
+    get_date_columns,
+    parse_date_columns,
+)
+
+
+def percentages(numerators, denominators, valid):
+    """
+    Returns numerators / denominators * 100 rounded to 2 places, with 0.0 where
+    a row is missing from either dataset or the division is 0 / 0, the same
+    way fillna(0.0) treats the aligned DataFrames. valid is broadcast against
+    the values, so one flag per row covers all of its dates.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = numerators / denominators * 100
+    rates[~valid | np.isnan(rates)] = 0.0
+
+    return rates.round(2)
+
+
+def date_column_offsets(wide_df, dates):
+    """
+    Takes in a wide dataframe and dates, either "m/d/yy" column labels or
+    anything pandas can turn into a Timestamp, and returns the offsets of
+    their columns in the frame. Raises KeyError for a date the frame lacks.
+
+    Parameters:
+        wide_df: DataFrame in wide format
+        dates: List of dates
+
+    Returns:
+        offsets: Array of column offsets, one per date
+    """
+    date_labels = get_date_columns(wide_df)
+    offsets = date_labels.get_indexer(dates)
+
+    missing = offsets < 0
+    if missing.any():
+        offsets[missing] = parse_date_columns(date_labels).get_indexer(
+            pd.to_datetime([dates[i] for i in np.flatnonzero(missing)])
+        )
+    if (offsets < 0).any():
+        raise KeyError(f"Dates {list(dates)} are not all in the dataset")
+
+    return offsets + len(METADATA_COLUMNS)
+
+
+def _group_sums(wide_df, dates, countries, by):
+    """
+    Sums the columns of the given dates, and no other, of the rows of the
+    given countries by the values of column by, or of a list of columns.
+    """
+    rows_df = wide_df if countries is None else select_countries(wide_df, countries)
+    block = rows_df.iloc[:, date_column_offsets(wide_df, dates)].to_numpy()
+
+    keys = rows_df[by]
+    codes = np.empty(0, dtype=np.intp)
+    if len(keys) > 0:
+        codes, _ = pd.factorize(
+            keys if isinstance(by, str) else pd.MultiIndex.from_frame(keys),
+            sort=True,
+        )
+    order = np.argsort(codes, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])[: len(codes)]
+    sums = (
+        np.add.reduceat(block[order], starts, axis=0, dtype=np.int64)
+        if len(codes) > 0
+        else np.empty((0, len(dates)), dtype=np.int64)
+    )
+
+    # Labels are read from the first row of every group to keep their dtypes
+    group_keys = keys.iloc[order[starts]]
+    index = (
+        pd.Index(group_keys, name=by)
+        if isinstance(by, str)
+        else pd.MultiIndex.from_frame(group_keys)
+    )
+
+    return pd.DataFrame(sums, index=index, columns=list(dates))
+
+
+def rates_as_of(
+    numerator_df, denominator_df, dates, countries=None, by="Country/Region"
+):
+    """
+    Takes in two cleaned wide dataframes and returns the percentage of the
+    first in the second as of each of the given dates only, instead of
+    dividing every date of the frames and keeping a few of them
+
+    Parameters:
+        numerator_df: Cleaned DataFrame in wide format, e.g. of recovered cases
+        denominator_df: Cleaned DataFrame in wide format, e.g. of confirmed cases
+        dates: List of dates, "m/d/yy" column labels or Timestamps
+        countries: List of countries to keep, None keeps every country
+        by: Column the rows are summed by, Country/Region or Province/State,
+            or a list of both
+
+    Returns:
+        rates: DataFrame of percentages rounded to 2 places, one row per value
+            of by and one column per date, 0.0 where either dataset lacks the row
+    """
+    try:
+        rates = _group_sums(numerator_df, dates, countries, by) / _group_sums(
+            denominator_df, dates, countries, by
+        )
+
+        return (rates * 100).fillna(0.0).round(2)
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
+
+
+def cube_rates_as_of(
+    cube, numerator_type, denominator_type, dates, countries=None, by="Country/Region"
+):
+    """
+    Takes in a cube and two of its metrics and returns the percentage of the
+    first in the second as of each of the given dates only, read from the
+    date columns of the cube by their offsets
+
+    Parameters:
+        cube: CaseCube of the cleaned datasets
+        numerator_type: DatasetType of the numerator, e.g. RECOVERED
+        denominator_type: DatasetType of the denominator, e.g. CONFIRMED_CASES
+        dates: List of dates, "m/d/yy" labels or anything pandas can turn into
+            a Timestamp
+        countries: List of countries to keep, None keeps every country
+        by: Country/Region for country totals, or Province/State or a list of
+            both for regions
+
+    Returns:
+        rates: DataFrame of percentages rounded to 2 places, one row per
+            country or region that either dataset has and one column per date
+    """
+    try:
+        date_positions = [cube.date_position(date) for date in dates]
+        positions = cube.country_positions(countries)
+
+        if by == "Country/Region":
+            numerator_present = cube.country_present(numerator_type)[positions]
+            denominator_present = cube.country_present(denominator_type)[positions]
+            in_either = numerator_present | denominator_present
+            numerators = cube.country_values(
+                numerator_type, positions[in_either], date_positions
+            )
+            denominators = cube.country_values(
+                denominator_type, positions[in_either], date_positions
+            )
+            labels = cube.countries[positions[in_either]]
+        else:
+            rows = np.concatenate(
+                [
+                    np.arange(len(cube.regions))[cube.country_rows(position)]
+                    for position in positions
+                ]
+                or [np.empty(0, dtype=np.intp)]
+            )
+            numerator_present = cube.region_present(numerator_type)[rows]
+            denominator_present = cube.region_present(denominator_type)[rows]
+            in_either = numerator_present | denominator_present
+            block = np.ix_(rows[in_either], date_positions)
+            numerators = cube.metric(numerator_type)[block]
+            denominators = cube.metric(denominator_type)[block]
+            region_keys = cube.regions[by].iloc[rows[in_either]]
+            labels = (
+                pd.Index(region_keys, name=by)
+                if isinstance(by, str)
+                else pd.MultiIndex.from_frame(region_keys)
+            )
+
+        return pd.DataFrame(
+            percentages(
+                numerators,
+                denominators,
+                (numerator_present & denominator_present)[in_either, None],
+            ),
+            index=labels,
+            columns=list(dates),
+        )
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
@@ -0,0 +1,70 @@
+import hashlib
+import inspect
+import functools
+
+import numpy as np
+import pandas as pd
+
+from src.utils.constants import DEBUG_MUTATIONS
+
+
+def _fingerprint(value):
+    """
+    Returns a digest of the labels, dtypes and values of a DataFrame, Series or
+    array, in their order, or None for any other argument.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (pd.DataFrame, pd.Series)):
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        digest.update(repr((list(frame.columns), list(frame.dtypes))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy())
+    else:
+        return None
+
+    return digest.digest()
+
+
+def read_only_inputs(function=None, enabled=DEBUG_MUTATIONS):
+    """
+    Decorator checking that a function leaves the DataFrames, Series and arrays
+    it is given as they were, for the debug mode set by COVID_DEBUG_MUTATIONS.
+    Every such argument is fingerprinted before and after the call, and a
+    RuntimeError naming the function and the argument is raised when one
+    changed. When disabled the function is returned as it is.
+
+    Parameters:
+        function: Function to check
+        enabled: Whether to check the function
+
+    Returns:
+        checked: Function raising when it mutates one of its inputs
+    """
+    if function is None:
+        return functools.partial(read_only_inputs, enabled=enabled)
+    if not enabled:
+        return function
+
+    signature = inspect.signature(function)
+    name = f"{function.__module__}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def checked(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs).arguments
+        before = {
+            argument: (value, fingerprint)
+            for argument, value in arguments.items()
+            if (fingerprint := _fingerprint(value)) is not None
+        }
+
+        result = function(*args, **kwargs)
+
+        for argument, (value, fingerprint) in before.items():
+            if _fingerprint(value) != fingerprint:
+                raise RuntimeError(f"{name} changed its input {argument}")
+
+        return result
+
+    return checked
@@ -0,0 +1,150 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Granularity to its pandas period frequency, the title of its label column
+# and the adjective of its value columns. ISO weeks run Monday to Sunday and
+# epi weeks, as the CDC counts them, Sunday to Saturday.
+GRANULARITIES = {
+    "week": ("W-SUN", "Week", "Weekly"),
+    "epiweek": ("W-SAT", "Epi Week", "Weekly"),
+    "month": ("M", "Month", "Monthly"),
+    "quarter": ("Q", "Quarter", "Quarterly"),
+}
+CUSTOM_TITLES = ("Period", "Period")
+
+
+def granularity_titles(granularity):
+    """
+    Returns the title of the label column and the adjective of the value
+    columns of a granularity, e.g. ("Month", "Monthly").
+    """
+    if isinstance(granularity, str):
+        return GRANULARITIES[granularity][1:]
+
+    return CUSTOM_TITLES
+
+
+def bucket_timestamps(labels):
+    """
+    Returns bucket labels as timestamps to plot them against, the start of
+    every period for period labels.
+    """
+    if isinstance(labels.dtype, pd.PeriodDtype):
+        return labels.dt.to_timestamp()
+
+    return labels
+
+
+@dataclass(frozen=True)
+class DateBuckets:
+    """
+    Calendar buckets of a date axis, every bucket a run of consecutive
+    positions on it, so summing daily values per bucket is one np.add.reduceat.
+
+    Attributes:
+        dates: DatetimeIndex of the date axis
+        labels: Index of the buckets, periods for a named granularity and the
+            start dates for custom buckets
+        starts: Position on the date axis where every bucket starts
+        stop: Position after the last date the buckets cover
+    """
+
+    dates: pd.DatetimeIndex
+    labels: pd.Index
+    starts: np.ndarray
+    stop: int
+
+    def ends(self):
+        """
+        Returns the positions of the last date of every bucket, none when the
+        buckets cover no date.
+        """
+        return np.r_[self.starts[1:], self.stop][: len(self.starts)] - 1
+
+    def boundaries(self):
+        """
+        Returns the start positions of every bucket followed by the stop.
+        """
+        return np.r_[self.starts, self.stop]
+
+    def bucket_of(self, dates):
+        """
+        Returns the bucket number of every date, -1 for dates the buckets do
+        not cover.
+        """
+        positions = self.dates.get_indexer(pd.DatetimeIndex(dates))
+        buckets = self.starts.searchsorted(positions, side="right") - 1
+
+        return np.where((positions >= 0) & (positions < self.stop), buckets, -1)
+
+
+def build_date_buckets(dates, granularity="month", start=None, end=None):
+    """
+    Takes in a sorted date axis and splits the dates of an inclusive range of
+    it into calendar buckets, finding the boundaries once for every later
+    reduction over the axis
+
+    Parameters:
+        dates: Sorted DatetimeIndex, e.g. the dates of the cube
+        granularity: One of GRANULARITIES, or a non-empty sequence of the start
+            dates of custom buckets, dates before the first start are left out
+        start: First date of the range, None starts at the first date
+        end: Last date of the range, None ends at the last date
+
+    Returns:
+        buckets: DateBuckets of the range
+    """
+    if not isinstance(granularity, str) and len(granularity) == 0:
+        raise ValueError("Custom buckets need at least one start date")
+
+    first = 0 if start is None else dates.searchsorted(pd.Timestamp(start))
+    stop = (
+        len(dates)
+        if end is None
+        else dates.searchsorted(pd.Timestamp(end), side="right")
+    )
+
+    if isinstance(granularity, str):
+        frequency = GRANULARITIES[granularity][0]
+        keys = dates[first:stop].to_period(frequency)
+    else:
+        bucket_starts = pd.DatetimeIndex(sorted(pd.Timestamp(s) for s in granularity))
+        first = max(first, dates.searchsorted(bucket_starts[0]))
+        keys = bucket_starts[
+            bucket_starts.searchsorted(dates[first:stop], side="right") - 1
+        ].rename(CUSTOM_TITLES[0])
+    first, stop = int(first), int(max(first, stop))
+
+    changes = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])[: len(keys)]
+
+    return DateBuckets(
+        dates=dates, labels=keys[changes], starts=first + changes, stop=stop
+    )
+
+
+def resample_values(daily_values, buckets):
+    """
+    Takes in daily values, e.g. daily increments of shape (unit, date, metric),
+    and sums them per bucket for every unit and metric in one np.add.reduceat
+
+    Parameters:
+        daily_values: Array with dates on its second axis
+        buckets: DateBuckets of the date axis of daily_values
+
+    Returns:
+        bucket_sums: int64 array of daily_values' shape with one entry per
+            bucket on the date axis
+    """
+    if len(buckets.starts) == 0:
+        shape = (daily_values.shape[0], 0) + daily_values.shape[2:]
+        return np.empty(shape, dtype=np.int64)
+
+    first = buckets.starts[0]
+    return np.add.reduceat(
+        daily_values[:, first : buckets.stop],
+        buckets.starts - first,
+        axis=1,
+        dtype=np.int64,
+    )
@@ -0,0 +1,271 @@
+import sys
+import inspect
+import weakref
+import threading
+import functools
+from enum import Enum
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+RESULT_CACHE_MAX_BYTES = 256 * 2**20
+RESULT_CACHE_MAX_ENTRIES = 1024
+
+# id of every registered dataset object to its (version, name) token
+_DATASETS = {}
+
+
+class _Uncacheable(Exception):
+    """
+    Raised while building a cache key for an argument the key can not cover.
+    """
+
+
+def register_dataset(dataset, version, name):
+    """
+    Takes in a dataset object, like a cleaned DataFrame, a LongView or a cube,
+    and records which dataset version it holds. Memoized functions called with
+    it are keyed on the version and the name instead of the object, and the
+    record is dropped when the object is garbage collected.
+
+    Parameters:
+        dataset: Object that is passed to memoized functions
+        version: Dataset version the object was built from
+        name: Name telling the object apart from the other objects built from
+            the same version, e.g. "cleaned:DEATHS"
+    """
+    key = id(dataset)
+    _DATASETS[key] = (version, name)
+    weakref.finalize(dataset, _DATASETS.pop, key, None)
+
+
+def _normalize(value):
+    """
+    Turns an argument into a hashable cache key component. Registered datasets
+    become their (version, name) token and containers are normalized item by
+    item, anything else raises _Uncacheable.
+    """
+    if id(value) in _DATASETS:
+        return ("dataset",) + _DATASETS[id(value)]
+    if value is None or isinstance(
+        value, (bool, int, float, str, Enum, pd.Timestamp, pd.Period)
+    ):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return ("set",) + tuple(sorted(_normalize(item) for item in value))
+    if isinstance(value, dict):
+        return ("dict",) + tuple(
+            sorted((key, _normalize(item)) for key, item in value.items())
+        )
+
+    raise _Uncacheable(type(value).__name__)
+
+
+def _versions(key):
+    """
+    Returns the dataset versions a normalized key refers to.
+    """
+    if isinstance(key, tuple):
+        if len(key) == 3 and key[0] == "dataset":
+            return {key[1]}
+        return set().union(*(_versions(item) for item in key))
+
+    return set()
+
+
+def _freeze(result):
+    """
+    Makes the numeric numpy buffers of a result read-only, so writing values
+    into a cached frame raises instead of changing what later calls get.
+    Object arrays stay writable, some pandas internals can not read them
+    otherwise.
+    """
+    if isinstance(result, np.ndarray) and result.dtype != object:
+        result.flags.writeable = False
+    elif isinstance(result, (pd.DataFrame, pd.Series)):
+        # The block arrays are the buffers every view of the frame writes to
+        for array in result._mgr.arrays:
+            if isinstance(array, np.ndarray) and array.dtype != object:
+                array.flags.writeable = False
+
+    return result
+
+
+def _share(result):
+    """
+    Returns what a caller gets of a cached result. Frames are shallow copies,
+    so adding, replacing or reordering columns and rows on them leaves the
+    cached frame as it was.
+    """
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return result.copy(deep=False)
+
+    return result
+
+
+def _size(result):
+    """
+    Returns the approximate number of bytes a result holds.
+    """
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(deep=True).sum())
+    if isinstance(result, pd.Series):
+        return int(result.memory_usage(deep=True))
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+
+    return sys.getsizeof(result)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of function results, bounded by the number of
+    entries and by the bytes the results hold. It works the same inside and
+    outside Streamlit.
+
+    Attributes:
+        max_bytes: Bytes the cached results may hold in total
+        max_entries: Number of results that may be cached
+    """
+
+    def __init__(
+        self, max_bytes=RESULT_CACHE_MAX_BYTES, max_entries=RESULT_CACHE_MAX_ENTRIES
+    ):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "bypasses": 0}
+
+    def get(self, key):
+        """
+        Returns (True, result) for a cached key and marks it recently used,
+        or (False, None).
+        """
+        with self._lock:
+            if key not in self._entries:
+                self._stats["misses"] += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, self._entries[key][0]
+
+    def put(self, key, result):
+        """
+        Caches a result, evicting the least recently used ones until it fits.
+        A result larger than max_bytes on its own is not cached.
+        """
+        size = _size(result)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+
+            while (
+                self._bytes > self.max_bytes or len(self._entries) > self.max_entries
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def bypass(self):
+        """
+        Counts a call whose arguments could not be keyed.
+        """
+        with self._lock:
+            self._stats["bypasses"] += 1
+
+    def retain_version(self, version):
+        """
+        Drops every result computed from a dataset version other than version.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if _versions(key) - {version}:
+                    self._bytes -= self._entries.pop(key)[1]
+                    self._stats["evictions"] += 1
+
+    def clear(self):
+        """
+        Drops every cached result and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def stats(self):
+        """
+        Returns a dict of the hits, misses, evictions and bypassed calls so far
+        and of the entries and bytes cached now.
+        """
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._bytes}
+
+
+RESULT_CACHE = ResultCache()
+
+
+def memoize(function=None, cache=RESULT_CACHE, ignore=()):
+    """
+    Decorator caching the results of a function in cache, keyed on the
+    function name and its arguments bound to its signature, with registered
+    datasets standing in as their version. Calls with an argument the key can
+    not cover, like an unregistered DataFrame, are passed through. None is
+    never cached, so a failed call is retried the next time.
+
+    Parameters:
+        function: Function to memoize
+        cache: ResultCache the results are kept in
+        ignore: Names of arguments left out of the key, which only change how
+            the result is computed, not the result
+
+    Returns:
+        memoized: Function returning read-only results shared between calls
+    """
+    if function is None:
+        return functools.partial(memoize, cache=cache, ignore=ignore)
+
+    signature = inspect.signature(function)
+    name = f"{function.__module__}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def memoized(*args, **kwargs):
+        try:
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            key = (
+                name,
+                _normalize(
+                    tuple(
+                        (argument, value)
+                        for argument, value in arguments.arguments.items()
+                        if argument not in ignore
+                    )
+                ),
+            )
+        except (_Uncacheable, TypeError):
+            cache.bypass()
+            return function(*args, **kwargs)
+
+        found, result = cache.get(key)
+        if not found:
+            result = function(*args, **kwargs)
+            if result is None:
+                return result
+            cache.put(key, _freeze(result))
+
+        return _share(result)
+
+    memoized.cache = cache
+    return memoized
+
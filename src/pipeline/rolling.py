@@ -0,0 +1,206 @@
+from types import MappingProxyType
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.logger.logger import logger
+from src.pipeline.cube import CUBE_METRICS
+
+ROLLING_METRICS = ("rolling_mean", "growth", "reproduction", "doubling_time")
+
+
+@dataclass(frozen=True)
+class RollingMetrics:
+    """
+    Smoothed and growth metrics of every unit of some rollup levels, computed
+    for all units and dates at once and aligned to the date axis of the
+    cleaned datasets. A date without enough history before it holds NaN, the
+    way rolling(window) leaves it.
+
+    Attributes:
+        dates: DatetimeIndex of the date axis
+        window: Number of days every window spans
+        serial_interval: Days between the windows the reproduction proxy compares
+        levels: Read-only mapping of rollup level name to a read-only mapping of
+            metric name, one of ROLLING_METRICS, to a read-only float array of
+            shape (unit, date, metric), units in the rollup's order
+    """
+
+    dates: pd.DatetimeIndex
+    window: int
+    serial_interval: int
+    levels: MappingProxyType
+
+    def metric(self, level, name, data_type):
+        """
+        Returns the unit x date view of one metric of one dataset at a level.
+        """
+        return self.levels[level][name][:, :, CUBE_METRICS.index(data_type)]
+
+
+def window_sums(values, window):
+    """
+    Takes in an array of shape (unit, date, ...) and returns the sums of the
+    trailing windows of every date, from one cumulative sum along the date
+    axis, so every window costs one subtraction whatever its length. Integer
+    values are summed exactly.
+
+    Parameters:
+        values: Array with dates on its second axis, e.g. daily increments
+        window: Number of days every window spans, the date itself included
+
+    Returns:
+        sums: Float array of the shape of values, NaN before the first full window
+    """
+    values = np.asarray(values)
+    totals = np.cumsum(
+        values,
+        axis=1,
+        dtype=np.int64 if np.issubdtype(values.dtype, np.integer) else np.float64,
+    )
+
+    sums = np.full(values.shape, np.nan)
+    if window <= values.shape[1]:
+        sums[:, window - 1] = totals[:, window - 1]
+        sums[:, window:] = totals[:, window:] - totals[:, :-window]
+
+    return sums
+
+
+def _lagged(values, lag):
+    """
+    Returns a float copy of values moved lag dates later along the date axis,
+    with NaN on the first lag dates.
+    """
+    lagged = np.full(values.shape, np.nan)
+    if lag < values.shape[1]:
+        lagged[:, lag:] = values[:, : values.shape[1] - lag]
+
+    return lagged
+
+
+def _ratio(numerators, denominators):
+    """
+    Divides two float arrays, with NaN where the denominator is not positive.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominators > 0, numerators / denominators, np.nan)
+
+
+def rolling_means(increments, window=7):
+    """
+    Takes in daily increments and returns their trailing window averages.
+
+    Parameters:
+        increments: Array of shape (unit, date, ...) of daily new cases
+        window: Number of days averaged
+
+    Returns:
+        means: Float array of the shape of increments
+    """
+    return window_sums(increments, window) / window
+
+
+def week_over_week_growth(increments, window=7):
+    """
+    Takes in daily increments and returns the relative change of the new cases
+    of every window from the window right before it, 0.5 for 50% more.
+
+    Parameters:
+        increments: Array of shape (unit, date, ...) of daily new cases
+        window: Number of days in a week
+
+    Returns:
+        growth: Float array of the shape of increments, NaN where the previous
+            window had no new cases
+    """
+    sums = window_sums(increments, window)
+
+    return _ratio(sums, _lagged(sums, window)) - 1
+
+
+def reproduction_proxy(increments, window=7, serial_interval=5):
+    """
+    Takes in daily increments and returns a proxy of the reproduction number:
+    the new cases of every window divided by those of the window one serial
+    interval earlier.
+
+    Parameters:
+        increments: Array of shape (unit, date, ...) of daily new cases
+        window: Number of days the new cases are summed over
+        serial_interval: Days between a case and the cases it causes
+
+    Returns:
+        reproduction: Float array of the shape of increments, NaN where the
+            earlier window had no new cases
+    """
+    sums = window_sums(increments, window)
+
+    return _ratio(sums, _lagged(sums, serial_interval))
+
+
+def doubling_times(cumulative, window=7):
+    """
+    Takes in cumulative counts and returns the days they take to double at the
+    exponential growth rate seen over the trailing window.
+
+    Parameters:
+        cumulative: Array of shape (unit, date, ...) of cumulative counts
+        window: Number of days the growth rate is measured over
+
+    Returns:
+        doubling_times: Float array of the shape of cumulative, NaN where the
+            count was 0 a window earlier or did not grow since
+    """
+    cumulative = np.asarray(cumulative, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth_rates = np.log(_ratio(cumulative, _lagged(cumulative, window)))
+        return np.where(growth_rates > 0, window * np.log(2) / growth_rates, np.nan)
+
+
+def build_rolling_metrics(
+    rollup,
+    increments,
+    levels=("province", "country"),
+    window=7,
+    serial_interval=5,
+):
+    """
+    Takes in a rollup and its daily increments and computes the rolling means,
+    week over week growth, reproduction proxy and doubling times of every unit
+    of the given levels, every metric of a level in one pass
+
+    Parameters:
+        rollup: Rollup of the cleaned datasets
+        increments: DailyIncrements of the rollup, holding the given levels
+        levels: Names of the rollup levels to compute
+        window: Number of days every window spans
+        serial_interval: Days between the windows the reproduction proxy compares
+
+    Returns:
+        rolling_metrics: RollingMetrics of the levels
+    """
+    try:
+        computed = {}
+        for level in levels:
+            # The window sums are shared by the means and both ratios
+            sums = window_sums(increments.levels[level], window)
+            metrics = {
+                "rolling_mean": sums / window,
+                "growth": _ratio(sums, _lagged(sums, window)) - 1,
+                "reproduction": _ratio(sums, _lagged(sums, serial_interval)),
+                "doubling_time": doubling_times(rollup.levels[level].values, window),
+            }
+            for values in metrics.values():
+                values.flags.writeable = False
+            computed[level] = MappingProxyType(metrics)
+
+        return RollingMetrics(
+            dates=rollup.dates,
+            window=window,
+            serial_interval=serial_interval,
+            levels=MappingProxyType(computed),
+        )
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
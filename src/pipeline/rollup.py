@@ -0,0 +1,214 @@
+from types import MappingProxyType
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.logger.logger import logger
+from src.utils.constants import REGION_MAPPING_FILE
+from src.pipeline.cube import CUBE_METRICS
+
+# Levels of the hierarchy, each one summed up from the level it names as child.
+# Continents and WHO regions are two groupings of the same countries.
+ROLLUP_LEVELS = {
+    "province": None,
+    "country": "province",
+    "continent": "country",
+    "who_region": "country",
+    "world": "country",
+}
+COUNTRY_GROUPINGS = {"continent": "Continent", "who_region": "WHO Region"}
+
+
+@dataclass(frozen=True)
+class RollupLevel:
+    """
+    One level of a Rollup.
+
+    Attributes:
+        labels: Index of the units of the level, a (country, province)
+            MultiIndex for provinces
+        values: Read-only array of shape (unit, date, metric), metrics ordered
+            as CUBE_METRICS
+        order: Positions of the child units in the order they are summed, None
+            when the child level is already in that order
+        offsets: Position in the ordered child units where every unit starts
+    """
+
+    labels: pd.Index
+    values: np.ndarray
+    order: np.ndarray
+    offsets: np.ndarray
+
+
+@dataclass(frozen=True)
+class Rollup:
+    """
+    Confirmed, deaths and recovered counts summed up once at every level of
+    province, country, continent or WHO region, and world, for every date.
+    Reading a level returns a view of its array, so no analyzer has to group
+    the cleaned datasets by country again.
+
+    Attributes:
+        dates: DatetimeIndex of the date axis
+        levels: Read-only mapping of level name to its RollupLevel
+    """
+
+    dates: pd.DatetimeIndex
+    levels: MappingProxyType
+
+    def labels(self, level):
+        """
+        Returns the index of the units of a level.
+        """
+        return self.levels[level].labels
+
+    def metric(self, level, data_type):
+        """
+        Returns the unit x date view of one metric at a level.
+        """
+        return self.levels[level].values[:, :, CUBE_METRICS.index(data_type)]
+
+    def unit(self, level, label, data_type):
+        """
+        Returns the view of one metric of one unit of a level over every date.
+        """
+        position = self.levels[level].labels.get_loc(label)
+        return self.metric(level, data_type)[position]
+
+
+def load_region_mapping(path=REGION_MAPPING_FILE):
+    """
+    Reads the bundled table of the continent, WHO region and approximate 2020
+    population of every country.
+
+    Parameters:
+        path: Location of the region mapping csv
+
+    Returns:
+        region_mapping: DataFrame of Country/Region, Continent, WHO Region and
+            Population, every column as strings
+    """
+    try:
+        return pd.read_csv(path, dtype="string", keep_default_na=False)
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
+
+
+def _sum_up(child_values, order, offsets):
+    """
+    Sums the child units of every unit, whose rows are contiguous once the
+    child units are taken in order.
+    """
+    if order is not None:
+        child_values = child_values[order]
+
+    values = np.add.reduceat(child_values, offsets, axis=0, dtype=np.int64)
+    values.flags.writeable = False
+
+    return values
+
+
+def _grouping(groups):
+    """
+    Takes the group of every country and returns the group labels with the
+    order and offsets that make the countries of every group contiguous.
+    """
+    codes, names = pd.factorize(groups, sort=True)
+    order = np.argsort(codes, kind="stable")
+    offsets = np.searchsorted(codes[order], np.arange(len(names)))
+
+    return pd.Index(names, name=groups.name), order, offsets
+
+
+def build_rollup(cube, region_mapping=None):
+    """
+    Takes in a cube and sums it up to countries, continents, WHO regions and
+    the world. Countries missing from the region mapping are put in "Other".
+
+    Parameters:
+        cube: CaseCube of the cleaned datasets
+        region_mapping: DataFrame as returned by load_region_mapping, the
+            bundled table is read when not given
+
+    Returns:
+        rollup: Rollup of the cube
+    """
+    try:
+        if region_mapping is None:
+            region_mapping = load_region_mapping()
+        region_mapping = region_mapping.set_index("Country/Region").reindex(
+            cube.countries
+        )
+        unmapped = region_mapping.index[region_mapping.isna().any(axis=1)]
+        if len(unmapped) > 0:
+            logger.warning(f"No region mapping for {', '.join(unmapped)}")
+        region_mapping = region_mapping.fillna("Other")
+
+        structure = {
+            "province": (
+                pd.MultiIndex.from_frame(
+                    cube.regions[["Country/Region", "Province/State"]]
+                ),
+                None,
+                None,
+            ),
+            "country": (cube.countries, None, cube.country_offsets[:-1]),
+            **{
+                level: _grouping(region_mapping[column])
+                for level, column in COUNTRY_GROUPINGS.items()
+            },
+            "world": (pd.Index(["World"]), None, np.array([0])),
+        }
+
+        levels = {}
+        for level, child in ROLLUP_LEVELS.items():
+            labels, order, offsets = structure[level]
+            values = (
+                cube.values
+                if child is None
+                else _sum_up(levels[child].values, order, offsets)
+            )
+            levels[level] = RollupLevel(labels, values, order, offsets)
+
+        return Rollup(dates=cube.dates, levels=MappingProxyType(levels))
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
+
+
+def extend_rollup(rollup, cube):
+    """
+    Takes in a rollup and the cube it was built from after extend_cube added
+    dates to it, and returns a rollup with those dates added. Only the new
+    dates are summed up.
+
+    Parameters:
+        rollup: Rollup to extend
+        cube: Extended CaseCube, with the same regions as the rollup
+
+    Returns:
+        extended_rollup: Rollup covering the old and the new dates
+    """
+    if len(cube.regions) != len(rollup.labels("province")):
+        raise ValueError("The cube has new regions, the rollup needs a full rebuild")
+
+    new_dates = slice(len(rollup.dates), None)
+    new_values = {"province": cube.values[:, new_dates]}
+    levels = {
+        "province": RollupLevel(rollup.labels("province"), cube.values, None, None)
+    }
+    for level, child in ROLLUP_LEVELS.items():
+        if child is None:
+            continue
+
+        old_level = rollup.levels[level]
+        new_values[level] = _sum_up(
+            new_values[child], old_level.order, old_level.offsets
+        )
+        values = np.concatenate([old_level.values, new_values[level]], axis=1)
+        values.flags.writeable = False
+        levels[level] = RollupLevel(
+            old_level.labels, values, old_level.order, old_level.offsets
+        )
+
+    return Rollup(dates=cube.dates, levels=MappingProxyType(levels))
@@ -0,0 +1,233 @@
+import weakref
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class RowIndex:
+    """
+    Hash index from every country, and from every (country, province), of a
+    frame to the contiguous range of its rows, so that selecting a country is a
+    dict lookup and a slice instead of a scan over the whole frame.
+
+    Attributes:
+        countries: Dict of country name to the slice of its rows
+        provinces: Dict of (country, province) to the slice of its rows, empty
+            when the frame has no Province/State column
+    """
+
+    countries: dict
+    provinces: dict
+
+    def country_rows(self, country):
+        """
+        Returns the slice of rows of a country, empty when it is not indexed.
+        """
+        return self.countries.get(country, slice(0, 0))
+
+    def province_rows(self, country, province):
+        """
+        Returns the slice of rows of a province, empty when it is not indexed.
+        """
+        return self.provinces.get((country, province), slice(0, 0))
+
+    def countries_positions(self, countries):
+        """
+        Returns the positions of the rows of the given countries, in the order
+        of the frame, as a boolean isin mask would select them.
+        """
+        ranges = sorted(
+            (
+                self.countries[country]
+                for country in set(countries)
+                if country in self.countries
+            ),
+            key=lambda rows: rows.start,
+        )
+        if not ranges:
+            return np.empty(0, dtype=np.intp)
+
+        return np.concatenate([np.arange(rows.start, rows.stop) for rows in ranges])
+
+
+def _key_ranges(keys):
+    """
+    Takes a sequence of keys and returns a dict of every key to the slice of
+    its rows, or None when the rows of some key are not contiguous.
+    """
+    run_starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    run_stops = np.r_[run_starts[1:], len(keys)]
+    ranges = {
+        key: slice(start, stop)
+        for key, start, stop in zip(keys[run_starts].tolist(), run_starts, run_stops)
+    }
+
+    return ranges if len(ranges) == len(run_starts) else None
+
+
+def build_row_index(df):
+    """
+    Takes in a dataframe whose rows of each country are contiguous, as they are
+    in the cleaned datasets and in the merged dataset, and builds its RowIndex
+
+    Parameters:
+        df: DataFrame with a Country/Region column
+
+    Returns:
+        row_index: RowIndex of df, or None when the rows of some country or
+            province are not contiguous
+    """
+    countries = df["Country/Region"].to_numpy(dtype=object)
+    country_ranges = _key_ranges(countries)
+    if country_ranges is None:
+        return None
+
+    province_ranges = {}
+    if "Province/State" in df.columns:
+        keys = np.empty(len(df), dtype=object)
+        keys[:] = list(zip(countries, df["Province/State"].to_numpy(dtype=object)))
+        province_ranges = _key_ranges(keys)
+        if province_ranges is None:
+            return None
+
+    return RowIndex(countries=country_ranges, provinces=province_ranges)
+
+
+_ROW_INDEXES = {}
+# Streamlit runs every session in its own thread. The lock is reentrant as a
+# frame collected while it is held runs its finalizer in the same thread
+_ROW_INDEXES_LOCK = threading.RLock()
+
+
+def _forget_row_index(key):
+    """
+    Drops the RowIndex cached for the frame with the given id.
+    """
+    with _ROW_INDEXES_LOCK:
+        _ROW_INDEXES.pop(key, None)
+
+
+def get_row_index(df):
+    """
+    Takes in a dataframe and returns its RowIndex, built on the first call for
+    that frame and kept until the frame is garbage collected. A frame whose
+    countries are not contiguous gets None.
+
+    The frame must not be modified in place once indexed, as the datasets of
+    the data context never are. The select functions only check the first and
+    last row of a range, which catches frames reordered or resized since, not
+    a country renamed inside a range.
+
+    Parameters:
+        df: DataFrame with a Country/Region column
+
+    Returns:
+        row_index: RowIndex of df or None
+    """
+    key = id(df)
+    with _ROW_INDEXES_LOCK:
+        if key in _ROW_INDEXES:
+            return _ROW_INDEXES[key]
+
+    # Built outside the lock, a thread building the same index meanwhile only
+    # costs the time of building it twice
+    row_index = build_row_index(df)
+    with _ROW_INDEXES_LOCK:
+        if key not in _ROW_INDEXES:
+            _ROW_INDEXES[key] = row_index
+            weakref.finalize(df, _forget_row_index, key)
+
+        return _ROW_INDEXES[key]
+
+
+def _is_current(df, rows, country):
+    """
+    Checks in O(1) that the first and last row of a range still belong to the
+    country, which catches frames reordered or shrunk since they were indexed.
+    """
+    if rows.stop > len(df):
+        return False
+
+    countries = df["Country/Region"]
+    return (
+        countries.iat[rows.start] == country
+        and countries.iat[rows.stop - 1] == country
+    )
+
+
+def select_country(df, country):
+    """
+    Takes in a dataframe and a country name and returns the rows of that
+    country, like df[df["Country/Region"] == country]. Through the frame's
+    RowIndex it is a slice, and frames that can not be indexed are scanned.
+
+    Parameters:
+        df: DataFrame with a Country/Region column
+        country: Name of the country
+
+    Returns:
+        country_df: DataFrame of the rows of the country
+    """
+    row_index = get_row_index(df)
+    if row_index is not None:
+        rows = row_index.country_rows(country)
+        if rows.stop == 0 or _is_current(df, rows, country):
+            return df.iloc[rows]
+
+        _forget_row_index(id(df))
+
+    return df[df["Country/Region"] == country]
+
+
+def select_countries(df, countries):
+    """
+    Takes in a dataframe and country names and returns the rows of those
+    countries, like df[df["Country/Region"].isin(countries)], through the
+    frame's RowIndex when it has one.
+
+    Parameters:
+        df: DataFrame with a Country/Region column
+        countries: List of country names
+
+    Returns:
+        countries_df: DataFrame of the rows of the countries
+    """
+    row_index = get_row_index(df)
+    if row_index is not None:
+        ranges = [row_index.country_rows(country) for country in countries]
+        if all(
+            rows.stop == 0 or _is_current(df, rows, country)
+            for rows, country in zip(ranges, countries)
+        ):
+            return df.iloc[row_index.countries_positions(countries)]
+
+        _forget_row_index(id(df))
+
+    return df[df["Country/Region"].isin(countries)]
+
+
+def select_province(df, country, province):
+    """
+    Takes in a dataframe, a country and one of its provinces and returns the
+    rows of that province through the frame's RowIndex when it has one.
+
+    Parameters:
+        df: DataFrame with Country/Region and Province/State columns
+        country: Name of the country
+        province: Name of the province
+
+    Returns:
+        province_df: DataFrame of the rows of the province
+    """
+    row_index = get_row_index(df)
+    if row_index is not None:
+        rows = row_index.province_rows(country, province)
+        if rows.stop == 0 or _is_current(df, rows, country):
+            return df.iloc[rows]
+
+    return df[
+        (df["Country/Region"] == country) & (df["Province/State"] == province)
+    ]
@@ -0,0 +1,240 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.logger.logger import logger
+from src.pipeline.rollup import load_region_mapping
+from src.pipeline.date_index import get_date_index
+
+# Compartments of the simulated state, Confirmed Cases, Deaths and Recovered
+# are cumulative as in the merged dataset and Active is what is left of them
+SCENARIO_COMPARTMENTS = ("Active", "Confirmed Cases", "Deaths", "Recovered")
+SCENARIO_PARAMETERS = ("Transmission", "Recovery", "Death")
+# Parameter whose share of the active cases is added to the removed
+# compartments each day
+REMOVAL_RATES = {"Deaths": "Death", "Recovered": "Recovery"}
+# Days a case counts as active in countries that report no recoveries
+ACTIVE_CASE_DAYS = 14
+
+
+@dataclass(frozen=True)
+class ScenarioSeeds:
+    """
+    Latest state of every country in the merged dataset, the day every
+    scenario starts from.
+
+    Attributes:
+        countries: Index of the countries, in name order
+        date: Last date of the merged dataset
+        states: float64 array of shape (compartment, country), compartments
+            ordered as SCENARIO_COMPARTMENTS
+        populations: float64 array of the population of every country, never
+            below its confirmed cases, inf where it is not known
+    """
+
+    countries: pd.Index
+    date: pd.Timestamp
+    states: np.ndarray
+    populations: np.ndarray
+
+
+def latest_states(merged_df, region_mapping=None):
+    """
+    Takes in the merged dataset and returns the last row of every country as
+    the seeds of the scenarios, found by binary search in its date index.
+    Countries that report no recoveries would keep every case ever confirmed
+    active, so their active cases are the cases confirmed in the last
+    ACTIVE_CASE_DAYS instead.
+
+    Parameters:
+        merged_df: DataFrame built by merge_datasets
+        region_mapping: DataFrame with the Population of every country, the
+            bundled region mapping when None
+
+    Returns:
+        seeds: ScenarioSeeds of every country
+    """
+    date_index = get_date_index(merged_df)
+    latest = merged_df.iloc[date_index.last_in_range()]
+    date = latest["Date"].max()
+    countries = pd.Index(latest["Country/Region"], name="Country/Region")
+
+    cumulative = latest[list(SCENARIO_COMPARTMENTS[1:])].to_numpy(dtype=np.float64)
+    confirmed, deaths, recovered = cumulative.T
+    earlier = (
+        merged_df.iloc[
+            date_index.last_in_range(end=date - pd.Timedelta(days=ACTIVE_CASE_DAYS))
+        ]
+        .set_index("Country/Region")["Confirmed Cases"]
+        .reindex(countries, fill_value=0)
+        .to_numpy(dtype=np.float64)
+    )
+    active = np.where(
+        recovered > 0,
+        np.maximum(confirmed - deaths - recovered, 0),
+        np.maximum(confirmed - earlier, 0),
+    )
+
+    if region_mapping is None:
+        region_mapping = load_region_mapping()
+    populations = (
+        region_mapping.set_index("Country/Region")["Population"]
+        .astype("float64")
+        .reindex(countries, fill_value=np.inf)
+        .to_numpy()
+    )
+
+    return ScenarioSeeds(
+        countries=countries,
+        date=date,
+        states=np.vstack([active, cumulative.T]),
+        populations=np.maximum(populations, confirmed),
+    )
+
+
+def sample_scenarios(
+    count,
+    transmission=(0.02, 0.12),
+    recovery=(0.05, 0.15),
+    death=(0.001, 0.01),
+    seed=0,
+):
+    """
+    Draws parameter sets of the scenarios uniformly from the given ranges of
+    the daily rates.
+
+    Parameters:
+        count: Number of parameter sets
+        transmission: Range of the new cases per active case per day while
+            nobody is immune, by default around the recovery range so the
+            scenarios both grow and shrink
+        recovery: Range of the share of active cases recovering per day
+        death: Range of the share of active cases dying per day
+        seed: Seed of the random generator
+
+    Returns:
+        parameters: float64 array of shape (parameter, scenario), parameters
+            ordered as SCENARIO_PARAMETERS
+    """
+    generator = np.random.default_rng(seed)
+
+    return np.vstack(
+        [
+            generator.uniform(*bounds, size=count)
+            for bounds in (transmission, recovery, death)
+        ]
+    )
+
+
+def simulate_ensemble(
+    seeds,
+    parameters,
+    days=60,
+    percentiles=(5, 50, 95),
+    compartment="Active",
+    countries=None,
+    chunk_days=7,
+):
+    """
+    Advances every scenario of every country at once, one batched time step per
+    day, and yields the percentile bands of a compartment across the scenarios
+    every chunk_days days, so a caller can show them while the rest runs.
+    Every day the active cases of a country infect the share of its population
+    not confirmed yet at the transmission rate, and shrink by recovery and
+    death. Confirmed cases never exceed the population, so neither does any
+    band.
+
+    Parameters:
+        seeds: ScenarioSeeds the scenarios start from
+        parameters: Array of shape (parameter, scenario), see sample_scenarios
+        days: Number of days to simulate
+        percentiles: Percentiles of the bands
+        compartment: One of SCENARIO_COMPARTMENTS to band
+        countries: List of the countries to band, None bands every country
+        chunk_days: Number of days whose bands every yield holds
+
+    Yields:
+        dates: DatetimeIndex of the days of the chunk
+        bands: float64 array of shape (day, percentile, country)
+    """
+    positions = (
+        np.arange(len(seeds.countries))
+        if countries is None
+        else seeds.countries.get_indexer(countries)
+    )
+    if np.any(positions < 0):
+        missing = [
+            country for country, position in zip(countries, positions) if position < 0
+        ]
+        raise KeyError(f"No seeds for the countries {missing}")
+
+    transmission = parameters[0][:, None]
+    removal = (parameters[1] + parameters[2])[:, None]
+
+    # One row per scenario and one column per banded country, the countries
+    # do not affect each other. Deaths and recoveries only ever add a fixed
+    # share of the active cases, so the steps track the active and confirmed
+    # cases and the running sum of the active cases, and the removed
+    # compartments are derived from it
+    states = seeds.states[:, positions]
+    active = np.repeat(states[None, 0], parameters.shape[1], axis=0)
+    confirmed = np.repeat(states[None, 1], parameters.shape[1], axis=0)
+    exposure = np.zeros_like(active)
+    new_cases = np.empty_like(active)
+    populations = seeds.populations[positions]
+
+    seed = states[SCENARIO_COMPARTMENTS.index(compartment)]
+    rate = (
+        parameters[SCENARIO_PARAMETERS.index(REMOVAL_RATES[compartment]), :, None]
+        if compartment in REMOVAL_RATES
+        else None
+    )
+    tracked = {"Active": active, "Confirmed Cases": confirmed}.get(compartment)
+    dates = seeds.date + pd.to_timedelta(np.arange(1, days + 1), unit="D")
+
+    for first in range(0, days, chunk_days):
+        chunk_dates = dates[first : first + chunk_days]
+        bands = np.empty((len(chunk_dates), len(percentiles), len(positions)))
+
+        for day in range(len(chunk_dates)):
+            # Share of the population not confirmed yet, 1 without a population
+            np.divide(confirmed, populations, out=new_cases)
+            np.multiply(transmission * active, 1 - new_cases, out=new_cases)
+            np.minimum(new_cases, populations - confirmed, out=new_cases)
+
+            exposure += active
+            active -= removal * active
+            active += new_cases
+            confirmed += new_cases
+
+            values = tracked if rate is None else seed + rate * exposure
+            bands[day] = np.percentile(values, percentiles, axis=0)
+
+        yield chunk_dates, bands
+
+
+def run_ensemble(seeds, parameters, days=60, **band_options):
+    """
+    Runs simulate_ensemble to the end and returns every band at once.
+
+    Parameters:
+        seeds: ScenarioSeeds the scenarios start from
+        parameters: Array of shape (parameter, scenario), see sample_scenarios
+        days: Number of days to simulate
+        band_options: percentiles, compartment, countries and chunk_days of
+            simulate_ensemble
+
+    Returns:
+        dates: DatetimeIndex of the simulated days
+        bands: float64 array of shape (day, percentile, country)
+    """
+    try:
+        chunks = list(simulate_ensemble(seeds, parameters, days, **band_options))
+
+        return (
+            pd.DatetimeIndex(np.concatenate([dates for dates, _ in chunks])),
+            np.concatenate([bands for _, bands in chunks]),
+        )
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
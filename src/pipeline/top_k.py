@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from src.logger.logger import logger
+from src.pipeline.data_cleaner import VALUE_COLUMN_TITLES
+
+
+def top_k_indices(values, k, largest=True):
+    """
+    Takes in a 1-D array, or a 2-D array of one ranking per row, and returns
+    the positions of its k largest, or smallest, values along the last axis,
+    best first. Only the k selected values are sorted: np.argpartition finds
+    the k-th value of every row and a linear pass over the row picks what
+    beats it. Ties are broken by position, the way nlargest(keep="first")
+    does, and NaNs rank last.
+
+    Parameters:
+        values: 1-D or 2-D numeric array
+        k: Number of positions to return per row, capped at the row length
+        largest: Whether to rank the largest values first
+
+    Returns:
+        positions: Integer array of shape values.shape[:-1] + (k,)
+    """
+    values = np.asarray(values)
+    rows = np.atleast_2d(values)
+    k = max(0, min(int(k), rows.shape[1]))
+    if k == 0:
+        return np.empty(values.shape[:-1] + (0,), dtype=np.intp)
+
+    # Ranking the negated values largest first ranks the values smallest first
+    keys = rows.astype(np.float64)
+    if not largest:
+        keys = -keys
+    keys[np.isnan(keys)] = -np.inf
+
+    kth = -np.partition(-keys, k - 1, axis=1)[:, k - 1 : k]
+    above = keys > kth
+    # Of the values tied with the k-th one, the first ones fill the k places
+    tied = keys == kth
+    tied &= np.cumsum(tied, axis=1) <= k - above.sum(axis=1, keepdims=True)
+
+    selected = np.nonzero(above | tied)[1].reshape(len(rows), k)
+    order = np.argsort(
+        -np.take_along_axis(keys, selected, axis=1), axis=1, kind="stable"
+    )
+    positions = np.take_along_axis(selected, order, axis=1)
+
+    return positions.reshape(values.shape[:-1] + (k,))
+
+
+def top_k_rows(df, k, column=None, largest=True):
+    """
+    Takes in a dataframe or a series and returns its k rows with the largest,
+    or smallest, values of a column, best first, as sort_values(...).head(k)
+    does without sorting every row.
+
+    Parameters:
+        df: DataFrame or Series
+        k: Number of rows to return
+        column: Column of df to rank by, ignored for a Series
+        largest: Whether to rank the largest values first
+
+    Returns:
+        top_rows: The k selected rows of df
+    """
+    values = df if isinstance(df, pd.Series) else df[column]
+
+    return df.iloc[top_k_indices(values.to_numpy(dtype=float), k, largest)]
+
+
+def top_units(
+    rollup, data_type, k, dates=None, window=None, level="country", largest=True
+):
+    """
+    Takes in a rollup and ranks the units of one of its levels by a metric,
+    for many dates in one call. A unit is ranked by its cumulative count at
+    each date, or, with a window, by its new cases over the window days up to
+    and including each date.
+
+    Parameters:
+        rollup: Rollup of the cleaned datasets
+        data_type: DatasetType of the metric to rank by
+        k: Number of units per date
+        dates: List of dates, "m/d/yy" labels or anything pandas can turn into
+            a Timestamp, None ranks at every date
+        window: Optional number of days the new cases are counted over
+        level: Rollup level of the units, e.g. "country" or "continent"
+        largest: Whether to rank the largest values first
+
+    Returns:
+        top_units_df: DataFrame with Date, Rank, the unit and the value of the
+            metric, k rows per date ordered by date and then rank
+    """
+    try:
+        date_positions = (
+            np.arange(len(rollup.dates))
+            if dates is None
+            else rollup.dates.get_indexer([pd.Timestamp(date) for date in dates])
+        )
+        if (date_positions < 0).any():
+            raise KeyError(f"Dates {list(dates)} are not all in the rollup")
+
+        metric = rollup.metric(level, data_type)
+        values = metric[:, date_positions].T
+        if window is not None:
+            # Daily increments sum up to the change of the cumulative count,
+            # the first date holds no increment
+            values = values - metric[:, np.maximum(date_positions - window, 0)].T
+
+        positions = top_k_indices(values, k, largest)
+        labels = rollup.labels(level)
+        ranks = positions.shape[1]
+
+        return pd.DataFrame(
+            {
+                "Date": rollup.dates[date_positions].repeat(ranks),
+                "Rank": np.tile(np.arange(1, ranks + 1), len(date_positions)),
+                labels.name or "Unit": labels[positions.ravel()],
+                VALUE_COLUMN_TITLES[data_type]: np.take_along_axis(
+                    values, positions, axis=1
+                ).ravel(),
+            }
+        )
+    except Exception as err:
+        logger.error(f"An unexpected error occurred {str(err)}", exc_info=True)
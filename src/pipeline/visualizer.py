@@ -1,4 +1,8 @@
 from src.logger.logger import logger
+from src.pipeline.row_index import select_country
+from src.pipeline.read_only import read_only_inputs
+from src.pipeline.top_k import top_k_rows
+from src.pipeline.resample import granularity_titles, bucket_timestamps
 
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -6,7 +10,10 @@ import matplotlib.dates as mdates
 import matplotlib.ticker as ticker
 import seaborn as sns
 
+CASE_TYPES = {"Confirmed Cases": "blue", "Deaths": "red", "Recovered": "green"}
 
+
+@read_only_inputs
 def get_top_countries_confirmed_cases_plot(confirmed_cases_df):
     """
     Takes in the raw dataframe of confirmed cases and cleans it as needed
@@ -19,14 +26,15 @@ def get_top_countries_confirmed_cases_plot(confirmed_cases_df):
         fig: matplotlib.figure.Figure
     """
     try:
-        confirmed_cases_df = confirmed_cases_df.copy()
-
         # Group the countries based on Country/Region and sum their cases and drop unnecessary data
-        confirmed_cases_df.drop(columns=["Province/State", "Lat", "Long"], inplace=True)
-        grouped_countries = confirmed_cases_df.groupby("Country/Region").sum()
+        grouped_countries = (
+            confirmed_cases_df.drop(columns=["Province/State", "Lat", "Long"])
+            .groupby("Country/Region")
+            .sum()
+        )
 
         # Pick 5 countries with most cases of all time
-        top_5_countries_index = grouped_countries.iloc[:, -1].nlargest(5).index
+        top_5_countries_index = top_k_rows(grouped_countries.iloc[:, -1], 5).index
         top_5_countries = grouped_countries.loc[top_5_countries_index]
 
         # Convert the columns to proper datetime format
@@ -55,6 +63,7 @@ def get_top_countries_confirmed_cases_plot(confirmed_cases_df):
         logger.error(f"An unexpected error occured: {err}")
 
 
+@read_only_inputs
 def get_china_countries_confirmed_cases_plot(confirmed_cases_df):
     """
     Takes in the raw dataframe of confirmed cases and cleans it as needed
@@ -67,15 +76,13 @@ def get_china_countries_confirmed_cases_plot(confirmed_cases_df):
         fig: matplotlib.figure.Figure
     """
     try:
-        confirmed_cases_df = confirmed_cases_df.copy()
+        # Filter out all of the china regions and group them up and sum their cases
+        china_confirmed_cases = select_country(confirmed_cases_df, "China")
 
         # Remove unnecessary columns
-        confirmed_cases_df.drop(columns=["Province/State", "Lat", "Long"], inplace=True)
-
-        # Filter out all of the china regions and group them up and sum their cases
-        china_confirmed_cases = confirmed_cases_df[
-            confirmed_cases_df["Country/Region"] == "China"
-        ]
+        china_confirmed_cases = china_confirmed_cases.drop(
+            columns=["Province/State", "Lat", "Long"]
+        )
         grouped_china_confirmed_cases = china_confirmed_cases.groupby(
             "Country/Region"
         ).sum()
@@ -106,6 +113,7 @@ def get_china_countries_confirmed_cases_plot(confirmed_cases_df):
         logger.error(f"An unexpected error occured: {err}")
 
 
+@read_only_inputs
 def plot_peak_daily_cases(peak_daily_cases_df):
     """
     Plots a bar chart of peak daily confirmed cases per country.
@@ -138,6 +146,7 @@ def plot_peak_daily_cases(peak_daily_cases_df):
     return fig
 
 
+@read_only_inputs
 def plot_recovery_rates(recovery_rates, date):
     """
     Plots a bar chart comparing recovery rates of two countries.
@@ -160,6 +169,7 @@ def plot_recovery_rates(recovery_rates, date):
     return fig
 
 
+@read_only_inputs
 def plot_death_rate_distribution(death_rate_distribution_df, country, date):
     """
     Plots horizontal bar chart of death rates across provinces.
@@ -184,6 +194,7 @@ def plot_death_rate_distribution(death_rate_distribution_df, country, date):
     return fig
 
 
+@read_only_inputs
 def plot_total_deaths_per_country(total_deaths_per_country_df):
     """
     Plots total deaths per country as a horizontal bar chart.
@@ -205,6 +216,7 @@ def plot_total_deaths_per_country(total_deaths_per_country_df):
     return fig
 
 
+@read_only_inputs
 def plot_highest_avg_daily_deaths(avg_death_series):
     """
     Plots top countries by average daily deaths.
@@ -225,6 +237,7 @@ def plot_highest_avg_daily_deaths(avg_death_series):
     return fig
 
 
+@read_only_inputs
 def plot_deaths_overtime(overtime_deaths_df, country_name="US"):
     """
     Plots cumulative deaths over time for a country.
@@ -251,72 +264,80 @@ def plot_deaths_overtime(overtime_deaths_df, country_name="US"):
     return fig
 
 
-def plot_global_monthly_sums(monthly_sum_df):
+@read_only_inputs
+def plot_global_monthly_sums(monthly_sum_df, granularity="month"):
     """
     Plots global monthly sum trends of confirmed, deaths, and recovered cases.
 
     Parameters:
-        monthly_sum_df: Dataframe with monthly sums
+        monthly_sum_df: Dataframe with monthly sums, or the sums of another
+            granularity as returned by merged_period_sum
+        granularity: Granularity the sums were taken at
 
     Returns:
         fig: matplotlib.figure.Figure
     """
-    monthly_sum_df["Month"] = monthly_sum_df["Month"].dt.to_timestamp()
+    title, adjective = granularity_titles(granularity)
+    monthly_sum_df = monthly_sum_df.assign(
+        **{title: bucket_timestamps(monthly_sum_df[title])}
+    )
 
-    global_monthly = monthly_sum_df.groupby("Month")[
-        ["Monthly Confirmed Cases", "Monthly Deaths", "Monthly Recovered"]
+    global_monthly = monthly_sum_df.groupby(title)[
+        [f"{adjective} {case_type}" for case_type in CASE_TYPES]
     ].sum()
 
     fig, ax = plt.subplots(figsize=(12, 6))
     global_monthly.plot(ax=ax, marker="o")
-    ax.set_title("Global Monthly COVID-19 Trends")
+    ax.set_title(f"Global {adjective} COVID-19 Trends")
     ax.set_ylabel("Number of Cases")
-    ax.set_xlabel("Month")
+    ax.set_xlabel(title)
     ax.legend(title="Case Type")
     ax.grid(True)
 
     return fig
 
 
-def plot_monthly_trends_by_country(filtered_monthly_sum_df, countries):
+@read_only_inputs
+def plot_monthly_trends_by_country(
+    filtered_monthly_sum_df, countries, granularity="month"
+):
     """
     Plots monthly trends for confirmed, deaths, and recovered for given countries.
 
     Parameters:
-        filtered_monthly_sum_df: Dataframe with monthly sums
+        filtered_monthly_sum_df: Dataframe with monthly sums, or the sums of
+            another granularity as returned by merged_period_sum
         countries: List of countries of which data is available
+        granularity: Granularity the sums were taken at
 
     Returns:
         fig: matplotlib.figure.Figure
     """
+    title, adjective = granularity_titles(granularity)
     fig, axes = plt.subplots(3, 1, figsize=(14, 12), sharex=True)
 
-    case_types = {
-        "Monthly Confirmed Cases": "blue",
-        "Monthly Deaths": "red",
-        "Monthly Recovered": "green",
-    }
-
-    for i, (case_type, color) in enumerate(case_types.items()):
+    for i, (case_type, color) in enumerate(CASE_TYPES.items()):
         ax = axes[i]
         for country in countries:
-            country_df = filtered_monthly_sum_df[
-                filtered_monthly_sum_df["Country/Region"] == country
-            ]
+            country_df = select_country(filtered_monthly_sum_df, country)
             ax.plot(
-                country_df["Month"], country_df[case_type], label=country, marker="o"
+                bucket_timestamps(country_df[title]),
+                country_df[f"{adjective} {case_type}"],
+                label=country,
+                marker="o",
             )
 
-        ax.set_title(case_type.replace("Monthly ", "") + " per Month")
+        ax.set_title(f"{case_type} per {title}")
         ax.set_ylabel("Cases")
         ax.legend()
         ax.grid(True)
 
-    axes[-1].set_xlabel("Month")
+    axes[-1].set_xlabel(title)
 
     return fig
 
 
+@read_only_inputs
 def plot_highest_avg_death_rates(highest_avg_death_rate_df):
     """
     Plots average death rates.
@@ -342,25 +363,151 @@ def plot_highest_avg_death_rates(highest_avg_death_rate_df):
     return fig
 
 
-def plot_us_monthly_recovery_ratio(us_ratio_df):
+@read_only_inputs
+def plot_us_monthly_recovery_ratio(us_ratio_df, granularity="month"):
     """
     Plots monthly recovery ratio of US as a bar chart.
 
     Parameters:
-        us_ratio_df: DataFrame with 'Month' (datetime) and 'Recovery Ratio'
+        us_ratio_df: DataFrame with 'Month' (period) and 'Recovery Ratio', or
+            the bucket column of another granularity
+        granularity: Granularity the ratios were read at
 
     Returns:
         fig: matplotlib.figure.Figure
     """
-    us_ratio_df["Month"] = us_ratio_df["Month"].dt.to_timestamp()
+    title, adjective = granularity_titles(granularity)
+    buckets = bucket_timestamps(us_ratio_df[title])
+
+    # Bars are 20 days wide, or narrower when the buckets are closer
+    gaps = buckets.sort_values().diff().dt.days.dropna()
+    width = 20 if gaps.empty else max(1, min(20, gaps.min() * 0.7))
 
     fig, ax = plt.subplots(figsize=(10, 5))
-    ax.bar(us_ratio_df["Month"], us_ratio_df["Recovery Ratio"], color="green", width=20)
+    ax.bar(buckets, us_ratio_df["Recovery Ratio"], color="green", width=width)
 
-    ax.set_title("US Monthly Recovery Ratio (Mar 2020 - May 2021)")
-    ax.set_xlabel("Month")
+    ax.set_title(f"US {adjective} Recovery Ratio (Mar 2020 - May 2021)")
+    ax.set_xlabel(title)
     ax.set_ylabel("Recovery Ratio")
     ax.grid(True, axis="y")
     fig.autofmt_xdate()
 
     return fig
+
+
+@read_only_inputs
+def plot_logistic_fit(dates, observed, fitted, country_name, case_type):
+    """
+    Plots the observed cumulative counts of a country against its fitted
+    logistic growth curve.
+
+    Parameters:
+        dates: DatetimeIndex of the counts
+        observed: Array of observed cumulative counts, one per date
+        fitted: Array of fitted cumulative counts, one per date
+        country_name: Name of the country
+        case_type: Title of the counts, e.g. "Confirmed Cases"
+
+    Returns:
+        fig: matplotlib.figure.Figure
+    """
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.plot(dates, observed, color="steelblue", linewidth=2, label="Observed")
+    ax.plot(dates, fitted, color="darkorange", linestyle="--", label="Logistic fit")
+
+    ax.set_title(f"Logistic Growth Fit of {case_type} in {country_name}")
+    ax.set_xlabel("Date")
+    ax.set_ylabel(f"Cumulative {case_type}")
+    ax.legend()
+    ax.grid(True)
+    ax.tick_params(axis="x", rotation=45)
+
+    return fig
+
+
+@read_only_inputs
+def plot_scenario_bands(dates, bands, percentiles, country_name, compartment):
+    """
+    Plots the median of the scenarios of a country with the band between the
+    lowest and highest percentiles shaded.
+
+    Parameters:
+        dates: DatetimeIndex of the simulated days so far
+        bands: Array of shape (day, percentile) of the country's bands
+        percentiles: Percentiles of the bands, in increasing order
+        country_name: Name of the country
+        compartment: Title of the banded compartment, e.g. "Active"
+
+    Returns:
+        fig: matplotlib.figure.Figure
+    """
+    median = bands[:, len(percentiles) // 2]
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.fill_between(
+        dates,
+        bands[:, 0],
+        bands[:, -1],
+        color="steelblue",
+        alpha=0.3,
+        label=f"{percentiles[0]}th to {percentiles[-1]}th percentile",
+    )
+    ax.plot(dates, median, color="steelblue", linewidth=2, label="Median")
+
+    ax.set_title(f"Scenario Ensemble of {compartment} in {country_name}")
+    ax.set_xlabel("Date")
+    ax.set_ylabel(compartment)
+    ax.legend()
+    ax.grid(True)
+    ax.tick_params(axis="x", rotation=45)
+
+    return fig
+
+
+@read_only_inputs
+def plot_forecast(dates, observed, forecast_df, unit_name, case_type):
+    """
+    Plots the recent cumulative counts of a unit followed by its forecasts,
+    with the prediction intervals shaded between the last observed date and
+    the forecast dates.
+
+    Parameters:
+        dates: DatetimeIndex of the observed counts
+        observed: Array of observed cumulative counts, one per date
+        forecast_df: DataFrame with the Date, Forecast, Lower and Upper columns
+            of the unit's forecasts, by Date
+        unit_name: Name of the country or region
+        case_type: Title of the counts, e.g. "Confirmed Cases"
+
+    Returns:
+        fig: matplotlib.figure.Figure
+    """
+    forecast_dates = dates[-1:].append(pd.DatetimeIndex(forecast_df["Date"]))
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.plot(dates, observed, color="steelblue", linewidth=2, label="Observed")
+    ax.fill_between(
+        forecast_dates,
+        [observed[-1], *forecast_df["Lower"]],
+        [observed[-1], *forecast_df["Upper"]],
+        color="darkorange",
+        alpha=0.3,
+        label="Prediction interval",
+    )
+    ax.plot(
+        forecast_dates,
+        [observed[-1], *forecast_df["Forecast"]],
+        color="darkorange",
+        linestyle="--",
+        marker="o",
+        label="Forecast",
+    )
+
+    ax.set_title(f"Forecast of {case_type} in {unit_name}")
+    ax.set_xlabel("Date")
+    ax.set_ylabel(f"Cumulative {case_type}")
+    ax.legend()
+    ax.grid(True)
+    ax.tick_params(axis="x", rotation=45)
+
+    return fig
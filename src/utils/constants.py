@@ -1,6 +1,21 @@
+import os
 from pathlib import Path
 
+from src.utils.enums import DatasetType
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 CONFIGS_DIR = BASE_DIR / "configs"
 DATASET_DIR = BASE_DIR / "dataset"
 OUTPUTS_DIR = BASE_DIR / "outputs"
+CACHE_DIR = OUTPUTS_DIR / "cache"
+
+DATASET_FILES = {
+    DatasetType.CONFIRMED_CASES: DATASET_DIR / "covid_19_confirmed_v1.csv",
+    DatasetType.DEATHS: DATASET_DIR / "covid_19_deaths_v1.csv",
+    DatasetType.RECOVERED: DATASET_DIR / "covid_19_recovered_v1.csv",
+}
+REGION_MAPPING_FILE = DATASET_DIR / "country_regions.csv"
+
+# Set COVID_DEBUG_MUTATIONS=1 to raise when an analyzer or a visualizer changes
+# a DataFrame, Series or array it was given
+DEBUG_MUTATIONS = os.environ.get("COVID_DEBUG_MUTATIONS", "0") == "1"
@@ -1,6 +1,9 @@
 import json
+import time
+import tracemalloc
 import atexit
 import logging.config
+from contextlib import contextmanager
 from pathlib import Path
 
 from src.utils.constants import CONFIGS_DIR
@@ -57,3 +60,53 @@ def setup_logging():
         ) from e
     except Exception as e:
         raise Exception(f"Unexpected error while handling queue_handler: {e}") from e
+
+
+@contextmanager
+def timer():
+    """
+    Measures the wall-clock time spent inside a `with` block.
+
+    Yields:
+        timing: Dict whose "seconds" key is filled in once the block exits
+    """
+    timing = {"seconds": None}
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing["seconds"] = time.perf_counter() - start
+
+
+@contextmanager
+def profile_stage(name, report=None):
+    """
+    Measures the wall-clock time and the peak memory allocated inside a
+    `with` block and passes them to report. Memory is traced with tracemalloc,
+    which numpy and pandas buffers report to, and tracing is started for the
+    block if it is not running yet. Without a report callback the block runs
+    untraced.
+
+    Parameters:
+        name: Name of the stage, passed on to report
+        report: Callable taking the stage name, the seconds spent and the peak
+            bytes allocated above what was allocated when the block started
+    """
+    if report is None:
+        yield
+        return
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    allocated_before, _ = tracemalloc.get_traced_memory()
+
+    try:
+        with timer() as timing:
+            yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+        report(name, timing["seconds"], peak - allocated_before)